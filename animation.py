@@ -0,0 +1,74 @@
+"""Animated GIF previews for kdx-pi-cam.
+
+This module turns an event window from the frame buffer into a small,
+downscaled and frame-decimated GIF that Telegram plays inline as an
+animation. It needs no FFmpeg process, so it is ready well before an
+H.264 clip of the same event. Frames share one palette, and the width is
+reduced until the result fits the size budget.
+"""
+
+import io
+import logging
+import math
+from typing import List
+
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Narrowest animation produced while shrinking to fit the size budget
+MIN_ANIMATION_WIDTH = 96
+
+# Encode attempts before the last result is returned over budget
+MAX_ENCODE_ATTEMPTS = 4
+
+
+def _encode(frames: List[np.ndarray], width: int, frame_ms: int) -> bytes:
+    """Encode BGR frames as a looping GIF of the given width."""
+    height, source_width = frames[0].shape[:2]
+    width = min(width, source_width)
+    size = (width, max(int(height * width / source_width) // 2 * 2, 2))
+    images = [
+        Image.fromarray(cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB))
+        for frame in frames
+    ]
+    # One palette from the middle frame keeps per-frame colour tables out of the file
+    palette = images[len(images) // 2].quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+    indexed = [image.quantize(palette=palette, dither=Image.Dither.NONE) for image in images]
+    output = io.BytesIO()
+    indexed[0].save(output, format='GIF', save_all=True, append_images=indexed[1:], duration=frame_ms, loop=0)
+    return output.getvalue()
+
+
+def encode_gif(frames: List[np.ndarray], source_fps: float, fps: float, width: int, max_bytes: int) -> bytes:
+    """Encode an event window as a GIF within a size budget.
+
+    Args:
+        frames: BGR frames in chronological order.
+        source_fps: Capture rate of the frames.
+        fps: Animation frame rate; frames are decimated to it.
+        width: Maximum animation width in pixels.
+        max_bytes: Size budget; the width is reduced until it fits.
+
+    Returns:
+        The GIF file contents; may exceed max_bytes at MIN_ANIMATION_WIDTH.
+
+    Raises:
+        ValueError: If there are no frames.
+    """
+    if not frames:
+        raise ValueError("No frames to encode")
+    step = max(1, round(source_fps / fps))
+    frames = frames[::step]
+    frame_ms = int(1000 * step / source_fps)
+    data = b""
+    for _ in range(MAX_ENCODE_ATTEMPTS):
+        data = _encode(frames, width, frame_ms)
+        if len(data) <= max_bytes or width <= MIN_ANIMATION_WIDTH:
+            break
+        # Size grows with the pixel count, so scale the width by the square root
+        width = max(MIN_ANIMATION_WIDTH, int(width * math.sqrt(max_bytes / len(data)) * 0.9))
+        logger.debug("Animation is %d bytes, retrying at width %d", len(data), width)
+    return data
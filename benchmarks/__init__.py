@@ -0,0 +1 @@
+"""Performance benchmarks for kdx-pi-cam."""
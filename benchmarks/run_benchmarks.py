@@ -0,0 +1,443 @@
+"""Benchmark runner for kdx-pi-cam.
+
+Measures motion detection, frame buffering, clip and snapshot encoding, cache
+eviction, event index lookups and startup imports on synthetic inputs and
+writes the results as JSON so runs can be compared across commits and
+hardware.
+
+Usage:
+    python -m benchmarks.run_benchmarks [--quick] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import MOTION_PATTERNS, RESOLUTIONS, build_cache_tree, generate_frames
+
+# Values used when the environment does not already provide them
+BENCHMARK_ENV = {
+    "RTSP_URL": "rtsp://benchmark",
+    "BOT_TOKEN": "benchmark",
+    "CHAT_ID": "0",
+    "MOTION_THRESHOLD": "30",
+    "MOTION_SENSITIVITY": "0.5",
+    "MOTION_MIN_AREA": "1000",
+    "CACHE_MAX_SIZE_MB": "500",
+    "CACHE_COMPRESSION_ENABLED": "false",
+    "CACHE_CLEANUP_INTERVAL": "3600",
+    "STORAGE_BACKEND": "local",
+    "VIDEO_BUFFER_SECONDS": "30",
+    "VIDEO_MAX_DURATION": "60",
+    "VIDEO_QUALITY": "medium",
+    "NOTIFICATION_COOLDOWN_SECONDS": "0",
+    "NOTIFICATION_QUIET_HOURS_START": "0",
+    "NOTIFICATION_QUIET_HOURS_END": "0",
+    "LOG_LEVEL": "WARNING",
+    "LOG_TO_FILE": "false",
+    "LOG_FILE_PATH": "./cache/logs/benchmark.log",
+    "LOG_ROTATION_ENABLED": "false",
+    "LOG_MAX_FILE_SIZE_MB": "10",
+    "LOG_BACKUP_COUNT": "1",
+}
+
+
+def prepare_environment(cache_dir: str) -> None:
+    """Point the application config at a scratch cache directory.
+
+    Args:
+        cache_dir: Directory used for generated clips, photos and cache trees.
+    """
+    for key, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ["CACHE_DIR"] = cache_dir
+
+    from config import reset_config
+    reset_config()
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summarize timing samples given in seconds.
+
+    Returns:
+        Dict with min/mean/median/p95 in milliseconds and operations per second.
+    """
+    ms = np.asarray(samples) * 1000.0
+    mean = float(ms.mean())
+    return {
+        "samples": len(samples),
+        "min_ms": float(ms.min()),
+        "mean_ms": mean,
+        "median_ms": float(np.median(ms)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "ops_per_sec": 1000.0 / mean if mean > 0 else 0.0,
+    }
+
+
+def time_call(func: Callable[[], Any], repeat: int, warmup: int = 1,
+              setup: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    """Time repeated calls of a function.
+
+    Args:
+        func: Function under test.
+        repeat: Number of timed calls.
+        warmup: Number of untimed calls before measuring.
+        setup: Optional untimed function run before every call.
+
+    Returns:
+        Summary statistics, see summarize().
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def bench_detect(resolutions: List[str], repeat: int) -> List[Dict[str, Any]]:
+    """Benchmark MotionDetector.detect on a frame pair per resolution and pattern.
+
+    Each case runs with and without illumination compensation and records
+    whether the pair was detected, so the cost and effect of suppression
+    are visible side by side.
+    """
+    from motion_detector import MotionDetector
+
+    detector = MotionDetector()
+    results = []
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        for pattern in MOTION_PATTERNS:
+            frames = generate_frames(width, height, 2, pattern)
+            for compensation in (False, True):
+                detector.illumination_compensation = compensation
+                stats = time_call(lambda: detector.detect(frames[0], frames[1]), repeat)
+                results.append({
+                    "benchmark": "detect", "resolution": name, "pattern": pattern,
+                    "illumination_compensation": compensation,
+                    "detected": detector.detect(frames[0], frames[1]), **stats,
+                })
+    return results
+
+
+def bench_detect_in_buffer(resolutions: List[str], repeat: int, buffer_len: int = 10) -> List[Dict[str, Any]]:
+    """Benchmark MotionDetector.detect_in_buffer over a window of frames."""
+    from motion_detector import MotionDetector
+
+    detector = MotionDetector()
+    detector.cooldown = 0
+
+    def reset() -> None:
+        detector.last_detection = 0.0
+
+    results = []
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        for pattern in MOTION_PATTERNS:
+            frames = generate_frames(width, height, buffer_len, pattern)
+            stats = time_call(lambda: detector.detect_in_buffer(frames), repeat, setup=reset)
+            results.append({
+                "benchmark": "detect_in_buffer", "resolution": name, "pattern": pattern,
+                "buffer_len": buffer_len, **stats,
+            })
+    return results
+
+
+def bench_frame_buffer(resolutions: List[str], repeat: int, appends: int = 100) -> List[Dict[str, Any]]:
+    """Benchmark appending frames to a full VideoProcessor buffer.
+
+    Compressed modes also report the memory held once the worker caught up
+    and the cost of decoding a 5-second clip's worth of frames.
+    """
+    from config import reset_config
+    from frame_buffer import COMPRESSION_MODES
+    from video_processor import VideoProcessor
+
+    results = []
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        frame = generate_frames(width, height, 1, "moving_box")[0]
+        for mode in COMPRESSION_MODES:
+            os.environ["VIDEO_BUFFER_COMPRESSION"] = mode
+            reset_config()
+            processor = VideoProcessor("rtsp://benchmark")
+            for _ in range(processor.buffer_size):
+                processor.feed_frame(frame)
+
+            def append_batch() -> None:
+                for _ in range(appends):
+                    processor.feed_frame(frame)
+
+            stats = time_call(append_batch, repeat)
+            processor.frame_buffer.shutdown(wait=True)
+            decode = time_call(lambda: processor.get_recent_frames(50), max(repeat // 5, 2))
+            results.append({
+                "benchmark": "frame_buffer_append", "resolution": name, "compression": mode,
+                "buffer_size": processor.buffer_size, "appends_per_sample": appends,
+                "buffer_bytes": processor.buffer_bytes, "decode_50_mean_ms": decode["mean_ms"], **stats,
+            })
+    os.environ.pop("VIDEO_BUFFER_COMPRESSION", None)
+    reset_config()
+    return results
+
+
+def bench_generate_clip(resolutions: List[str], repeat: int, duration: float = 5.0) -> List[Dict[str, Any]]:
+    """Benchmark VideoProcessor.generate_clip from a filled buffer."""
+    from video_processor import VideoProcessor
+
+    if shutil.which("ffmpeg") is None:
+        return [{"benchmark": "generate_clip", "skipped": "ffmpeg binary not found"}]
+
+    loop = asyncio.new_event_loop()
+    results = []
+    try:
+        for name in resolutions:
+            width, height = RESOLUTIONS[name]
+            processor = VideoProcessor("rtsp://benchmark")
+            processor.frame_buffer = generate_frames(width, height, int(duration * 10), "moving_box")
+
+            def encode() -> None:
+                path = loop.run_until_complete(processor.generate_clip(duration))
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+            stats = time_call(encode, repeat)
+            results.append({
+                "benchmark": "generate_clip", "resolution": name, "duration_s": duration, **stats,
+            })
+    finally:
+        loop.close()
+    return results
+
+
+def bench_generate_animation(resolutions: List[str], repeat: int, duration: float = 5.0) -> List[Dict[str, Any]]:
+    """Benchmark VideoProcessor.generate_animation, the GIF alternative to generate_clip."""
+    from video_processor import VideoProcessor
+
+    loop = asyncio.new_event_loop()
+    results = []
+    try:
+        for name in resolutions:
+            width, height = RESOLUTIONS[name]
+            processor = VideoProcessor("rtsp://benchmark")
+            processor.frame_buffer = generate_frames(width, height, int(duration * 10), "moving_box")
+            sizes = []
+
+            def encode() -> None:
+                path = loop.run_until_complete(processor.generate_animation(duration))
+                if path and os.path.exists(path):
+                    sizes.append(os.path.getsize(path))
+                    os.remove(path)
+
+            stats = time_call(encode, repeat)
+            results.append({
+                "benchmark": "generate_animation", "resolution": name, "duration_s": duration,
+                "bytes": sizes[-1] if sizes else 0, **stats,
+            })
+    finally:
+        loop.close()
+    return results
+
+
+def bench_snapshot_jpeg(resolutions: List[str], repeat: int) -> List[Dict[str, Any]]:
+    """Benchmark SnapshotCache.get_jpeg, the /photo and /stream encode path.
+
+    Misses use a new sequence number per call, so every call encodes in the
+    executor; hits repeat one sequence number and return the cached bytes.
+    """
+    from config import get_config
+    from snapshot_cache import SnapshotCache
+
+    quality = get_config().snapshot_jpeg_quality
+    loop = asyncio.new_event_loop()
+    results = []
+    try:
+        for name in resolutions:
+            width, height = RESOLUTIONS[name]
+            frame = generate_frames(width, height, 1, "moving_box")[0]
+            cache = SnapshotCache()
+            seqs = itertools.count(1)
+            sizes = []
+
+            def miss() -> None:
+                sizes.append(len(loop.run_until_complete(cache.get_jpeg(next(seqs), frame, 0, quality))))
+
+            def hit() -> None:
+                loop.run_until_complete(cache.get_jpeg(0, frame, 0, quality))
+
+            for case, call in (("miss", miss), ("hit", hit)):
+                stats = time_call(call, repeat)
+                results.append({
+                    "benchmark": "snapshot_jpeg", "resolution": name, "cache": case,
+                    "bytes": sizes[-1] if sizes else 0, **stats,
+                })
+    finally:
+        loop.close()
+    return results
+
+
+def bench_cache_cleanup(file_counts: List[int], repeat: int, scratch_dir: str) -> List[Dict[str, Any]]:
+    """Benchmark CacheManager._cleanup_old_files on synthetic cache trees.
+
+    Each tree holds twice the size limit so roughly half of the files are evicted.
+    """
+    from cache_manager import CacheManager
+
+    manager = CacheManager()
+    manager.max_size_mb = 1
+    results = []
+    for file_count in file_counts:
+        tree = os.path.join(scratch_dir, f"cache_tree_{file_count}")
+        file_size = max(2 * 1024 * 1024 // file_count, 1)
+
+        def rebuild() -> None:
+            shutil.rmtree(tree, ignore_errors=True)
+            build_cache_tree(tree, file_count, file_size)
+
+        manager.cache_dir = tree
+        stats = time_call(manager._cleanup_old_files, repeat, setup=rebuild)
+        results.append({
+            "benchmark": "cache_cleanup", "files": file_count, "file_size": file_size, **stats,
+        })
+        shutil.rmtree(tree, ignore_errors=True)
+    return results
+
+
+def bench_event_query(days: int, events_per_day: int, repeat: int, scratch_dir: str) -> List[Dict[str, Any]]:
+    """Benchmark /events and /event lookups on an index holding `days` of history."""
+    from event_store import EventStore
+
+    store = EventStore(os.path.join(scratch_dir, "events.db"))
+    now = time.time()
+    interval = 86400 / events_per_day
+    total = days * events_per_day
+    with store._lock:
+        store._conn.executemany(
+            "INSERT INTO events (camera, start_ts, end_ts, peak_score, boxes) VALUES (?, ?, ?, ?, ?)",
+            ((f"cam{i % 2}", now - i * interval, now - i * interval + 5, 0.1, "[]") for i in range(total)),
+        )
+        store._conn.commit()
+
+    results = []
+    for label, since in (("today", now - 86400), ("2h", now - 7200)):
+        stats = time_call(lambda: store.query(since, now, limit=20), repeat)
+        results.append({"benchmark": "event_query", "range": label, "events": total, **stats})
+    stats = time_call(lambda: store.count(now - 86400, now), repeat)
+    results.append({"benchmark": "event_count", "range": "today", "events": total, **stats})
+    stats = time_call(lambda: store.get_event(total // 2), repeat)
+    results.append({"benchmark": "event_get", "events": total, **stats})
+    store.close()
+    return results
+
+
+def bench_import(modules: List[str], repeat: int) -> List[Dict[str, Any]]:
+    """Benchmark cold imports in fresh interpreters, the main part of startup.
+
+    bot_handler is what the bot needs before it can poll; video_processor
+    pulls in the OpenCV stack that is loaded in the background afterwards.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for module in modules:
+        code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+        samples = [
+            float(subprocess.run(
+                [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=root
+            ).stdout)
+            for _ in range(repeat)
+        ]
+        results.append({"benchmark": "import", "module": module, **summarize(samples)})
+    return results
+
+
+def collect_metadata() -> Dict[str, Any]:
+    """Describe the code revision and host the benchmarks ran on."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def run(quick: bool = False) -> Dict[str, Any]:
+    """Run the full benchmark suite.
+
+    Args:
+        quick: Use fewer resolutions, files and repetitions for a smoke run.
+
+    Returns:
+        JSON-serializable results with metadata.
+    """
+    resolutions = ["240p", "480p"] if quick else list(RESOLUTIONS)
+    repeat = 5 if quick else 30
+    file_counts = [200] if quick else [1000, 5000]
+
+    with tempfile.TemporaryDirectory(prefix="kdx-bench-") as scratch_dir:
+        prepare_environment(scratch_dir)
+        results: List[Dict[str, Any]] = []
+        results += bench_detect(resolutions, repeat)
+        results += bench_detect_in_buffer(resolutions, repeat)
+        results += bench_frame_buffer(resolutions, repeat)
+        results += bench_generate_clip(resolutions, max(repeat // 5, 2))
+        results += bench_generate_animation(resolutions, max(repeat // 5, 2))
+        results += bench_snapshot_jpeg(resolutions, repeat)
+        results += bench_cache_cleanup(file_counts, max(repeat // 5, 2), scratch_dir)
+        results += bench_event_query(30 if quick else 365, 200, repeat, scratch_dir)
+        results += bench_import(["bot_handler", "video_processor"], 3 if quick else 10)
+
+    return {"metadata": collect_metadata(), "quick": quick, "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Run kdx-pi-cam performance benchmarks.")
+    parser.add_argument("--quick", action="store_true", help="Run a reduced suite")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(quick=args.quick)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
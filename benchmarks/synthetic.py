@@ -0,0 +1,87 @@
+"""Synthetic inputs for the kdx-pi-cam benchmarks.
+
+This module generates reproducible frame sequences with different motion
+patterns and synthetic cache trees for eviction benchmarks.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "240p": (320, 240),
+    "480p": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+}
+
+MOTION_PATTERNS = ("static", "noise", "moving_box", "global_flash")
+
+
+def generate_frames(
+    width: int,
+    height: int,
+    count: int,
+    pattern: str = "moving_box",
+    seed: int = 0,
+) -> List[np.ndarray]:
+    """Generate a sequence of BGR frames with a given motion pattern.
+
+    Args:
+        width: Frame width in pixels.
+        height: Frame height in pixels.
+        count: Number of frames.
+        pattern: One of MOTION_PATTERNS.
+        seed: Random seed so runs are reproducible.
+
+    Returns:
+        List of uint8 frames of shape (height, width, 3).
+    """
+    if pattern not in MOTION_PATTERNS:
+        raise ValueError(f"Unknown motion pattern: {pattern}")
+
+    rng = np.random.default_rng(seed)
+    background = rng.integers(40, 80, size=(height, width, 3), dtype=np.uint8)
+    frames = []
+    box_w, box_h = max(width // 8, 4), max(height // 6, 4)
+    for i in range(count):
+        frame = background.copy()
+        if pattern == "noise":
+            # Sensor noise well below the default threshold
+            noise = rng.integers(0, 8, size=(height, width, 3), dtype=np.uint8)
+            frame = np.add(frame, noise, dtype=np.uint8)
+        elif pattern == "moving_box":
+            x = (i * box_w // 2) % max(width - box_w, 1)
+            y = height // 2 - box_h // 2
+            frame[y:y + box_h, x:x + box_w] = 220
+        elif pattern == "global_flash":
+            # Whole-frame brightness change, e.g. IR-cut switching
+            if i % 2:
+                frame = np.add(frame, 90, dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def build_cache_tree(root: str, file_count: int, file_size: int = 4096, subdirs: int = 8) -> int:
+    """Create a synthetic cache directory with many files of staggered age.
+
+    Args:
+        root: Directory to populate.
+        file_count: Number of files to create.
+        file_size: Size of each file in bytes.
+        subdirs: Number of subdirectories to spread the files over.
+
+    Returns:
+        Total bytes written.
+    """
+    payload = b"\0" * file_size
+    base_time = 1_700_000_000
+    for i in range(file_count):
+        directory = os.path.join(root, f"dir{i % subdirs}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"clip_{i:06d}.mp4")
+        with open(path, "wb") as f:
+            f.write(payload)
+        os.utime(path, (base_time + i, base_time + i))
+    return file_count * file_size
@@ -1,22 +1,41 @@
 """Telegram bot handler for kdx-pi-cam.
 
 This module handles Telegram bot commands and integrates with video processing and motion detection.
+OpenCV-backed components are imported and created on first use, so the bot
+can start polling before they are loaded.
 """
 
 import asyncio
 import logging
+import os
+import threading
+import time
 from datetime import datetime
-from typing import Optional
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
 from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram.constants import MessageLimit
+from telegram.ext import Application, CommandHandler, ContextTypes, TypeHandler
 
-from config import get_config
-from motion_detector import MotionDetector
-from video_processor import VideoProcessor
+from config import AppConfig, ConfigError, get_config
+from event_store import get_event_store, parse_since
+from logging_utils import HOT_PATH
+from metrics import get_metrics, get_startup_timer
+from subscribers import get_subscriber_registry, parse_chat_ids
+
+if TYPE_CHECKING:
+    from motion_detector import MotionDetector
+    from object_classifier import ObjectClassifier
+    from preview_server import PreviewServer
+    from timelapse import TimelapseRecorder
+    from video_processor import VideoProcessor
 
 logger = logging.getLogger(__name__)
 
+# Reply to /quiet and /cameras from a chat that does not receive alerts
+NOT_SUBSCRIBED_MESSAGE = "This chat is not subscribed. Use /subscribe first."
+
 
 class BotHandler:
     """Handles Telegram bot interactions."""
@@ -25,30 +44,119 @@ class BotHandler:
         """Initialize the bot handler."""
         config = get_config()
         self.application: Optional[Application] = None
-        self.video_processor = VideoProcessor(config.rtsp_url)
-        self.motion_detector = MotionDetector()
+        self._video_processor: Optional["VideoProcessor"] = None
+        self._motion_detector: Optional["MotionDetector"] = None
+        self._classifier: Optional["ObjectClassifier"] = None
+        self._classifier_loaded = False
+        self._components_lock = threading.Lock()
+        self._components_future: Optional[asyncio.Future] = None
         self.monitoring_task: Optional[asyncio.Task] = None
         self.monitoring = False
-        self.chat_id: Optional[int] = None
-        self.quiet_start = config.notification_quiet_hours_start
-        self.quiet_end = config.notification_quiet_hours_end
-
-    def _is_quiet_hours(self) -> bool:
-        """Check if current time is in quiet hours."""
-        now = datetime.now().hour
-        if self.quiet_start < self.quiet_end:
-            return self.quiet_start <= now < self.quiet_end
-        else:
-            # Overnight quiet hours
-            return now >= self.quiet_start or now < self.quiet_end
+        self.subscribers = get_subscriber_registry()
+        self.send_interval = config.notification_send_interval
+        self.camera_name = config.camera_name
+        self.events_dir = os.path.join(config.cache_dir, 'events')
+        self.delivery = config.notification_delivery
+        self.snapshot_quality = config.snapshot_jpeg_quality
+        self.preview_server: Optional["PreviewServer"] = None
+        self.timelapse: Optional["TimelapseRecorder"] = None
+        self.admin_chat_ids = set(parse_chat_ids(config.admin_chat_ids))
+        self._profile_task: Optional[asyncio.Task] = None
+        self._frame_seq = 0
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._first_update_seen = False
+
+    @property
+    def video_processor(self) -> "VideoProcessor":
+        """RTSP capture, created on first use."""
+        if self._video_processor is not None:
+            return self._video_processor
+        with self._components_lock:
+            if self._video_processor is None:
+                from video_processor import VideoProcessor
+                self._video_processor = VideoProcessor(get_config().rtsp_url, error_callback=self._send_error_message)
+            return self._video_processor
+
+    @video_processor.setter
+    def video_processor(self, processor: "VideoProcessor") -> None:
+        self._video_processor = processor
+
+    @property
+    def motion_detector(self) -> "MotionDetector":
+        """Motion detector, created on first use."""
+        if self._motion_detector is not None:
+            return self._motion_detector
+        with self._components_lock:
+            if self._motion_detector is None:
+                from motion_detector import MotionDetector
+                self._motion_detector = MotionDetector()
+            return self._motion_detector
+
+    @motion_detector.setter
+    def motion_detector(self, detector: "MotionDetector") -> None:
+        self._motion_detector = detector
+
+    @property
+    def classifier(self) -> Optional["ObjectClassifier"]:
+        """Object classifier, created on first use; None if disabled."""
+        if self._classifier_loaded:
+            return self._classifier
+        with self._components_lock:
+            if not self._classifier_loaded:
+                from object_classifier import create_object_classifier
+                try:
+                    self._classifier = create_object_classifier()
+                except Exception as e:
+                    logger.error(f"Object classification unavailable, notifying every event: {e}")
+                self._classifier_loaded = True
+            return self._classifier
+
+    @classifier.setter
+    def classifier(self, classifier: Optional["ObjectClassifier"]) -> None:
+        self._classifier = classifier
+        self._classifier_loaded = True
+
+    def _load_components(self) -> None:
+        """Import and create the OpenCV-backed components."""
+        _ = self.video_processor, self.motion_detector, self.classifier
+
+    async def _ensure_components(self) -> None:
+        """Load the components in a worker thread, or wait for the load in progress.
+
+        Handlers call this before touching the components so the event loop
+        never blocks on imports or on the lock held by the warm-up.
+        """
+        if self._video_processor is not None and self._motion_detector is not None and self._classifier_loaded:
+            return
+        if self._components_future is None:
+            self._components_future = asyncio.get_running_loop().run_in_executor(None, self._load_components)
+        try:
+            await asyncio.shield(self._components_future)
+        except Exception:
+            self._components_future = None  # Retry on the next call
+            raise
+
+    def apply_config(self, config: AppConfig) -> None:
+        """Apply live-tunable notification and detection settings."""
+        self.delivery = config.notification_delivery
+        self.send_interval = config.notification_send_interval
+        self.subscribers.quiet_start = config.notification_quiet_hours_start
+        self.subscribers.quiet_end = config.notification_quiet_hours_end
+        if self._motion_detector is not None:
+            self._motion_detector.apply_config(config)
 
     async def _send_error_message(self, message: str) -> None:
-        """Send an error message to the chat."""
-        if self.chat_id and self.application:
-            try:
-                await self.application.bot.send_message(self.chat_id, message)
-            except Exception as e:
-                logger.error(f"Failed to send error message: {e}")
+        """Send an error message to the admin chats, or to every subscriber of this camera without admins."""
+        if not self.application:
+            return
+        chat_ids = sorted(self.admin_chat_ids) or [
+            subscriber.chat_id for subscriber in self.subscribers.all() if subscriber.wants(self.camera_name)
+        ]
+        await self._broadcast_text(chat_ids, message)
+
+    async def _update_subscribers(self, method: Callable[..., Any], *args, **changes) -> Any:
+        """Run a registry change in the default executor, since it saves the registry to disk."""
+        return await asyncio.get_running_loop().run_in_executor(None, partial(method, *args, **changes))
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /start command."""
@@ -56,8 +164,9 @@ class BotHandler:
             await update.message.reply_text("Monitoring is already running.")
             return
 
-        self.chat_id = update.effective_chat.id
+        await self._update_subscribers(self.subscribers.add, update.effective_chat.id)
         await update.message.reply_text("Attempting to start monitoring...")
+        await self._ensure_components()
 
         self.monitoring = True
         await self.video_processor.start_capture()
@@ -66,12 +175,12 @@ class BotHandler:
         await asyncio.sleep(2)
 
         if self.video_processor.is_connected:
-            self.monitoring_task = asyncio.create_task(self._monitor_motion(update.effective_chat.id))
+            self.monitoring_task = asyncio.create_task(self._monitor_motion())
             await update.message.reply_text("Monitoring started successfully.")
         else:
             await update.message.reply_text("Failed to connect to video stream. Monitoring started but may not work properly. Check RTSP URL.")
             # Still start monitoring task in case it connects later
-            self.monitoring_task = asyncio.create_task(self._monitor_motion(update.effective_chat.id))
+            self.monitoring_task = asyncio.create_task(self._monitor_motion())
 
     async def stop_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /stop command."""
@@ -79,15 +188,29 @@ class BotHandler:
             await update.message.reply_text("Monitoring is not running.")
             return
 
+        await self.stop_monitoring()
+        await update.message.reply_text("Monitoring stopped.")
+
+    async def stop_monitoring(self, drain_timeout: float = 0.0) -> None:
+        """Stop motion monitoring and capture.
+
+        Args:
+            drain_timeout: Seconds to let an alert in progress finish
+                before the monitoring task is cancelled.
+        """
         self.monitoring = False
-        if self.monitoring_task:
-            self.monitoring_task.cancel()
+        task = self.monitoring_task
+        if task and not task.done():
+            if drain_timeout > 0:
+                # The loop exits after the current alert once monitoring is False
+                await asyncio.wait({task}, timeout=drain_timeout)
+            task.cancel()
             try:
-                await self.monitoring_task
+                await task
             except asyncio.CancelledError:
                 pass
-        await self.video_processor.stop_capture()
-        await update.message.reply_text("Monitoring stopped.")
+        if self._video_processor is not None:
+            await self._video_processor.stop_capture()
 
     async def stream_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /stream command."""
@@ -95,19 +218,44 @@ class BotHandler:
             await update.message.reply_text("Monitoring is not running. Use /start first.")
             return
 
-        # Send a photo
-        frame = await self.video_processor.capture_photo()
-        if frame is not None:
-            photo_path = await self.motion_detector.generate_photo(frame)
-            if photo_path:
-                with open(photo_path, 'rb') as photo_file:
-                    await update.message.reply_photo(photo_file)
-                import os
-                os.remove(photo_path)
-            else:
-                await update.message.reply_text("Failed to capture photo.")
-        else:
+        # Send a photo, encoded and uploaded at most once per frame
+        seq, frame = self.video_processor.get_latest_frame()
+        if frame is None:
             await update.message.reply_text("No frames available.")
+            return
+
+        from snapshot_cache import get_snapshot_cache
+        cache = get_snapshot_cache()
+        artifact = cache.snapshot_artifact(seq, quality=self.snapshot_quality)
+        file_id = cache.get_file_id(artifact)
+        if file_id:
+            await update.message.reply_photo(file_id)
+            return
+
+        try:
+            jpeg = await cache.get_jpeg(seq, frame, quality=self.snapshot_quality)
+        except Exception as e:
+            logger.error(f"Failed to encode photo: {e}")
+            await update.message.reply_text("Failed to capture photo.")
+            return
+        with get_metrics().timer('telegram_upload'):
+            message = await update.message.reply_photo(jpeg)
+        self._remember_upload(artifact, message)
+
+    def _remember_upload(self, artifact: str, message) -> Optional[str]:
+        """Memoize the file_id of an uploaded photo, video or animation.
+
+        Returns:
+            The file_id, or None if the message carries no media.
+        """
+        if message is None:
+            return None
+        media = message.photo[-1] if message.photo else (message.video or message.animation)
+        if media is not None and isinstance(getattr(media, 'file_id', None), str):
+            from snapshot_cache import get_snapshot_cache
+            get_snapshot_cache().remember_file_id(artifact, media.file_id)
+            return media.file_id
+        return None
 
     async def photo_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /photo command."""
@@ -122,62 +270,587 @@ class BotHandler:
         await update.message.reply_text("Generating 5-second clip...")
         clip_path = await self.video_processor.generate_clip(5.0)
         if clip_path:
-            with open(clip_path, 'rb') as clip_file:
+            with open(clip_path, 'rb') as clip_file, get_metrics().timer('telegram_upload'):
                 await update.message.reply_video(clip_file, caption="5-second clip")
-            import os
             os.remove(clip_path)
         else:
             await update.message.reply_text("Failed to generate clip. No frames available.")
 
+    async def preview_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /preview command: send a short GIF of the last 5 seconds."""
+        if not self.monitoring:
+            await update.message.reply_text("Monitoring is not running. Use /start first.")
+            return
+
+        animation_path = await self.video_processor.generate_animation(5.0)
+        if animation_path:
+            with open(animation_path, 'rb') as animation_file, get_metrics().timer('telegram_upload'):
+                await update.message.reply_animation(animation_file, caption="5-second preview")
+            os.remove(animation_path)
+        else:
+            await update.message.reply_text("Failed to generate preview. No frames available.")
+
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /status command."""
+        await self._ensure_components()
         status = f"Monitoring: {'Running' if self.monitoring else 'Stopped'}\n"
         status += f"RTSP Connected: {'Yes' if self.video_processor.is_connected else 'No'}\n"
-        status += f"Frames in buffer: {len(self.video_processor.frame_buffer)}"
+        status += f"Stream health: {self.video_processor.connection.health:.0%}\n"
+        status += f"Frames in buffer: {len(self.video_processor.frame_buffer)}\n"
+        status += f"Buffer memory: {self.video_processor.buffer_bytes / (1024 * 1024):.1f} MB"
+        if self.video_processor.frame_buffer.compression != "none":
+            status += f" ({self.video_processor.frame_buffer.compression})"
         await update.message.reply_text(status)
 
-    async def _monitor_motion(self, chat_id: int) -> None:
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /stats command."""
+        text = get_metrics().summary()
+        startup = get_startup_timer().summary()
+        if startup:
+            text += f"\nStartup: {startup}"
+        await update.message.reply_text(text)
+
+    async def timelapse_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /timelapse command: finish today's time-lapse so far and send it."""
+        if self.timelapse is None:
+            await update.message.reply_text("Time-lapse is disabled. Set TIMELAPSE_ENABLED=true.")
+            return
+        await update.message.reply_text("Finishing time-lapse...")
+        path = await self.timelapse.finalize_now() or self.timelapse.latest_file()
+        if not path:
+            await update.message.reply_text("No time-lapse recorded yet.")
+            return
+        from encoder import TELEGRAM_MAX_UPLOAD_BYTES
+        if os.path.getsize(path) > TELEGRAM_MAX_UPLOAD_BYTES:
+            await update.message.reply_text(f"Time-lapse is too large to send: {path}")
+            return
+        with open(path, 'rb') as video_file, get_metrics().timer('telegram_upload'):
+            await update.message.reply_video(video_file, caption=f"Time-lapse {os.path.basename(path)}")
+
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /profile [seconds] [sample|cprofile] command (admin only)."""
+        from profiler import MAX_PROFILE_SECONDS, PROFILE_MODES
+
+        if update.effective_chat.id not in self.admin_chat_ids:
+            await update.message.reply_text("Not allowed. Add this chat to ADMIN_CHAT_IDS.")
+            return
+        args = context.args or []
+        try:
+            seconds = int(args[0]) if args else 30
+            mode = args[1] if len(args) > 1 else "sample"
+            if not 1 <= seconds <= MAX_PROFILE_SECONDS or mode not in PROFILE_MODES:
+                raise ValueError(mode)
+        except ValueError:
+            await update.message.reply_text(f"Usage: /profile [1-{MAX_PROFILE_SECONDS}] [{'|'.join(PROFILE_MODES)}]")
+            return
+        if self._profile_task and not self._profile_task.done():
+            await update.message.reply_text("A profile is already running.")
+            return
+        await update.message.reply_text(f"Profiling ({mode}) for {seconds}s...")
+        # Run in the background so other commands are answered while profiling
+        self._profile_task = asyncio.create_task(self._run_profile(update.effective_chat.id, seconds, mode))
+
+    async def _run_profile(self, chat_id: int, seconds: int, mode: str) -> None:
+        """Profile the process and send the summary and report files to a chat."""
+        from profiler import Profiler
+
+        bot = self.application.bot
+        try:
+            profiler = Profiler(mode, get_config().profile_block_threshold_ms / 1000)
+            report = await profiler.run(seconds)
+            await bot.send_message(chat_id, report.summary[:MessageLimit.MAX_TEXT_LENGTH])
+            for filename, data in report.files.items():
+                await bot.send_document(chat_id, data, filename=filename)
+        except Exception as e:
+            logger.error(f"Profiling failed: {e}")
+            await bot.send_message(chat_id, f"Profiling failed: {e}")
+
+    async def set_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /set [setting value] command (admin only): change a setting without restarting."""
+        from config_reload import TUNABLE_FIELDS, get_config_reloader
+
+        if update.effective_chat.id not in self.admin_chat_ids:
+            await update.message.reply_text("Not allowed. Add this chat to ADMIN_CHAT_IDS.")
+            return
+        reloader = get_config_reloader()
+        args = context.args or []
+        if not args:
+            config = get_config()
+            lines = [f"{key} = {getattr(config, key)}" for key in TUNABLE_FIELDS]
+            history = reloader.describe_history()
+            if history:
+                lines += ["", "Recent changes:"] + history
+            await update.message.reply_text("\n".join(lines))
+            return
+        if len(args) != 2:
+            await update.message.reply_text("Usage: /set <setting> <value>, or /set to list settings")
+            return
+        try:
+            changes = reloader.apply({args[0]: args[1]}, "/set")
+        except ConfigError as e:
+            await update.message.reply_text(str(e))
+            return
+        if not changes:
+            await update.message.reply_text("No change.")
+            return
+        (key, (old, new)), = changes.items()
+        await update.message.reply_text(f"{key}: {old} -> {new} (not saved to .env)")
+
+    async def subscribe_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /subscribe command."""
+        await self._update_subscribers(self.subscribers.add, update.effective_chat.id)
+        await update.message.reply_text("This chat will receive motion alerts.")
+
+    async def unsubscribe_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /unsubscribe command."""
+        if await self._update_subscribers(self.subscribers.remove, update.effective_chat.id):
+            await update.message.reply_text("This chat will no longer receive motion alerts.")
+        else:
+            await update.message.reply_text("This chat is not subscribed.")
+
+    async def quiet_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /quiet <start> <end> or /quiet default for this chat's quiet hours."""
+        args = context.args or []
+        chat_id = update.effective_chat.id
+        if args == ["default"]:
+            reset = await self._update_subscribers(self.subscribers.update, chat_id, quiet_start=None, quiet_end=None)
+            if reset is None:
+                await update.message.reply_text(NOT_SUBSCRIBED_MESSAGE)
+            else:
+                await update.message.reply_text("Quiet hours reset to the default.")
+            return
+        if len(args) != 2 or not all(arg.isdigit() and int(arg) < 24 for arg in args):
+            await update.message.reply_text("Usage: /quiet <start hour> <end hour> | /quiet default")
+            return
+        start, end = int(args[0]), int(args[1])
+        if await self._update_subscribers(self.subscribers.update, chat_id, quiet_start=start, quiet_end=end) is None:
+            await update.message.reply_text(NOT_SUBSCRIBED_MESSAGE)
+            return
+        await update.message.reply_text(f"Quiet hours set to {start}:00-{end}:00.")
+
+    async def cameras_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /cameras <name...> or /cameras all to filter this chat's alerts."""
+        args = context.args or []
+        if not args:
+            subscriber = self.subscribers.get(update.effective_chat.id)
+            cameras = subscriber.cameras if subscriber else []
+            await update.message.reply_text(f"Cameras: {', '.join(cameras) if cameras else 'all'}")
+            return
+        cameras = [] if args == ["all"] else args
+        if await self._update_subscribers(self.subscribers.update, update.effective_chat.id, cameras=cameras) is None:
+            await update.message.reply_text(NOT_SUBSCRIBED_MESSAGE)
+            return
+        await update.message.reply_text(f"Alerts limited to: {', '.join(cameras) if cameras else 'all cameras'}")
+
+    async def heatmap_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /heatmap command, or /heatmap reset to clear it."""
+        await self._ensure_components()
+        heatmap = self.motion_detector.heatmap
+        if heatmap is None:
+            await update.message.reply_text("Heatmap is disabled. Set HEATMAP_ENABLED=true.")
+            return
+        if context.args and context.args[0] == "reset":
+            heatmap.reset()
+            await asyncio.get_running_loop().run_in_executor(None, heatmap.save)
+            await update.message.reply_text("Heatmap cleared.")
+            return
+
+        _, frame = self.video_processor.get_latest_frame()
+        if frame is None:
+            await update.message.reply_text("No frames available.")
+            return
+        from snapshot_cache import encode_jpeg
+
+        def render() -> Optional[bytes]:
+            overlay = heatmap.render(frame)
+            return None if overlay is None else encode_jpeg(overlay, 0, self.snapshot_quality)
+
+        jpeg = await asyncio.get_event_loop().run_in_executor(None, render)
+        if jpeg is None:
+            await update.message.reply_text("No motion recorded yet.")
+            return
+        since = datetime.fromtimestamp(heatmap.started_at).strftime('%Y-%m-%d %H:%M')
+        with get_metrics().timer('telegram_upload'):
+            await update.message.reply_photo(jpeg, caption=f"Motion heatmap since {since}")
+
+    async def events_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /events command, e.g. /events today or /events 2h."""
+        arg = context.args[0] if context.args else None
+        try:
+            since = parse_since(arg)
+        except ValueError:
+            await update.message.reply_text("Usage: /events [today|30m|2h|7d]")
+            return
+
+        store = get_event_store()
+        events = store.query(since, limit=20)
+        if not events:
+            await update.message.reply_text("No motion events in that range.")
+            return
+
+        total = store.count(since)
+        lines = [f"{total} event(s), newest first:"]
+        for event in events:
+            when = datetime.fromtimestamp(event.start_ts).strftime('%m-%d %H:%M:%S')
+            lines.append(f"#{event.id} {when} {event.camera} score={event.peak_score:.3f}")
+        if total > len(events):
+            lines.append(f"... and {total - len(events)} more")
+        await update.message.reply_text("\n".join(lines))
+
+    async def event_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /event <id> command."""
+        if not context.args or not context.args[0].isdigit():
+            await update.message.reply_text("Usage: /event <id>")
+            return
+
+        event = get_event_store().get_event(int(context.args[0]))
+        if event is None:
+            await update.message.reply_text("Event not found.")
+            return
+
+        start = datetime.fromtimestamp(event.start_ts).strftime('%Y-%m-%d %H:%M:%S')
+        caption = (
+            f"Event #{event.id} on {event.camera}\n"
+            f"Start: {start} ({event.end_ts - event.start_ts:.0f}s)\n"
+            f"Peak score: {event.peak_score:.3f}, regions: {len(event.boxes)}"
+        )
+        if len(event.trajectory) > 1:
+            (t0, x0, y0), (t1, x1, y1) = event.trajectory[0], event.trajectory[-1]
+            caption += f"\nTrack: ({x0}, {y0}) -> ({x1}, {y1}) over {t1 - t0:.1f}s"
+        if event.labels:
+            caption += "\nObjects: " + ", ".join(f"{label} ({conf:.2f})" for label, conf in event.labels.items())
+        from snapshot_cache import get_snapshot_cache
+        cache = get_snapshot_cache()
+        if event.clip_path and os.path.exists(event.clip_path):
+            artifact = f"file:{event.clip_path}"
+            file_id = cache.get_file_id(artifact)
+            if file_id:
+                await update.message.reply_video(file_id, caption=caption)
+                return
+            with open(event.clip_path, 'rb') as clip_file, get_metrics().timer('telegram_upload'):
+                message = await update.message.reply_video(clip_file, caption=caption)
+            self._remember_upload(artifact, message)
+        elif event.thumbnail_path and os.path.exists(event.thumbnail_path):
+            artifact = f"file:{event.thumbnail_path}"
+            file_id = cache.get_file_id(artifact)
+            if file_id:
+                await update.message.reply_photo(file_id, caption=caption)
+                return
+            with open(event.thumbnail_path, 'rb') as photo_file, get_metrics().timer('telegram_upload'):
+                message = await update.message.reply_photo(photo_file, caption=caption)
+            self._remember_upload(artifact, message)
+        else:
+            await update.message.reply_text(caption + "\nMedia no longer in cache.")
+
+    async def _record_event(self, clip_duration: float, now: Optional[float] = None) -> Tuple[int, Optional[str]]:
+        """Record the latest detection in the event index with a contact sheet.
+
+        With tracking, every object confirmed by the detection gets its own
+        event row, starting when the object first appeared and holding its
+        box and trajectory. All rows share the contact sheet.
+
+        Args:
+            clip_duration: Length of the event window in seconds.
+            now: Detection time, defaults to wall-clock time.
+
+        Returns:
+            Tuple of the first new event id and the contact sheet path (or None).
+        """
+        result = self.motion_detector.last_result
+        store = get_event_store()
+        event_ids = []
+        for track in self.motion_detector.last_tracks:
+            track.event_id = store.add_event(
+                self.camera_name, track.first_seen, track.first_seen + clip_duration, result.score, [track.box]
+            )
+            store.update_trajectory(track.event_id, track.trajectory)
+            event_ids.append(track.event_id)
+        if not event_ids:
+            start_ts = time.time() if now is None else now
+            event_ids.append(store.add_event(
+                self.camera_name, start_ts, start_ts + clip_duration, result.score, result.boxes
+            ))
+        event_id = event_ids[0]
+
+        # Compressed buffer frames are decoded here, so keep it off the event loop
+        frames = await asyncio.get_running_loop().run_in_executor(
+            None, self.video_processor.get_recent_frames, int(clip_duration * 10)  # Assuming 10 FPS
+        )
+        sheet_path = await self.motion_detector.generate_contact_sheet(frames)
+        if sheet_path:
+            os.makedirs(self.events_dir, exist_ok=True)
+            thumbnail_path = os.path.join(self.events_dir, f"{event_id}.jpg")
+            os.replace(sheet_path, thumbnail_path)
+            for recorded_id in event_ids:
+                store.update_paths(recorded_id, thumbnail_path=thumbnail_path)
+            return event_id, thumbnail_path
+        return event_id, None
+
+    def _recorded_ids(self, event_id: int) -> List[int]:
+        """Ids of every event row recorded for the latest detection, event_id first."""
+        return [track.event_id for track in self.motion_detector.last_tracks] or [event_id]
+
+    async def _classify_event(self, event_id: int) -> Tuple[bool, Dict[str, float]]:
+        """Classify the motion boxes of the latest detection.
+
+        Returns:
+            Tuple of whether the event should be notified and the labels found.
+            Without a classifier, or if classification fails, every event is notified.
+        """
+        if self.classifier is None:
+            return True, {}
+        result = self.motion_detector.last_result
+        try:
+            detections = await self.classifier.classify_event(event_id, self.motion_detector.last_frame, result.boxes)
+        except Exception as e:
+            logger.error(f"Object classification of event #{event_id} failed, notifying anyway: {e}")
+            return True, {}
+        from object_classifier import summarize_labels
+        labels = summarize_labels(detections)
+        for recorded_id in self._recorded_ids(event_id):
+            get_event_store().update_labels(recorded_id, labels)
+        if self.classifier.matches(detections):
+            return True, labels
+        get_metrics().inc('classifier_rejected_total')
+        return False, labels
+
+    def _recipients(self) -> List[int]:
+        """Chat ids that should be alerted for this camera right now."""
+        hour = datetime.now().hour
+        return [subscriber.chat_id for subscriber in self.subscribers.recipients(self.camera_name, hour)]
+
+    async def _broadcast(self, chat_ids: List[int], kind: str, path: str, caption: str) -> None:
+        """Send a photo, video or animation to several chats, uploading it only once.
+
+        The first successful upload yields a Telegram file_id that every
+        other recipient receives instead of the bytes. Sends are spaced by
+        the configured interval to stay under Telegram's rate limits.
+
+        Args:
+            chat_ids: Recipients.
+            kind: 'photo', 'video' or 'animation'.
+            path: File to send.
+            caption: Message caption.
+        """
+        send = {
+            "photo": self.application.bot.send_photo,
+            "video": self.application.bot.send_video,
+            "animation": self.application.bot.send_animation,
+        }[kind]
+        metrics = get_metrics()
+        artifact = f"file:{path}"
+        file_id: Optional[str] = None
+        for index, chat_id in enumerate(chat_ids):
+            if index:
+                await asyncio.sleep(self.send_interval)
+            try:
+                if file_id:
+                    await send(chat_id, file_id, caption=caption)
+                    metrics.inc('upload_reuse_total')
+                    continue
+                with open(path, 'rb') as media_file, metrics.timer('telegram_upload'):
+                    message = await send(chat_id, media_file, caption=caption)
+                metrics.inc('upload_bytes_total', os.path.getsize(path))
+                file_id = self._remember_upload(artifact, message)
+            except Exception as e:
+                logger.error(f"Failed to send {kind} to chat {chat_id}: {e}")
+
+    async def _broadcast_text(self, chat_ids: List[int], text: str) -> None:
+        """Send a text message to several chats."""
+        for index, chat_id in enumerate(chat_ids):
+            if index:
+                await asyncio.sleep(self.send_interval)
+            try:
+                await self.application.bot.send_message(chat_id, text)
+            except Exception as e:
+                logger.error(f"Failed to send message to chat {chat_id}: {e}")
+
+    async def _handle_motion(self, now: Optional[float] = None) -> int:
+        """Record a motion event and notify subscribers according to the delivery policy.
+
+        Args:
+            now: Detection time, defaults to wall-clock time; replay passes video time.
+
+        Returns:
+            The id of the recorded event.
+        """
+        event_id, sheet_path = await self._record_event(5.0, now)
+        notify, labels = await self._classify_event(event_id)
+        if not notify:
+            logger.info(f"Motion event #{event_id} has no configured object classes ({labels}), skipping notification")
+            return event_id
+        chat_ids = self._recipients()
+        if not chat_ids:
+            logger.info(f"Motion event #{event_id} has no recipients (quiet hours), skipping notification")
+            return event_id
+
+        caption = f"Motion detected! (event #{event_id})"
+        if labels:
+            caption = f"Motion detected: {', '.join(labels)} (event #{event_id})"
+        preview_sent = False
+        if sheet_path and self.delivery in ("sheet", "sheet_then_clip"):
+            await self._broadcast(chat_ids, "photo", sheet_path, caption)
+            preview_sent = True
+        elif self.delivery in ("animation", "animation_then_clip"):
+            animation_path = await self.video_processor.generate_animation(5.0)
+            if animation_path:
+                await self._broadcast(chat_ids, "animation", animation_path, caption)
+                os.remove(animation_path)
+                preview_sent = True
+        if preview_sent:
+            if self.delivery in ("sheet", "animation"):
+                return event_id
+            caption = f"Event #{event_id} clip"
+
+        clip_path = await self.video_processor.generate_clip(5.0)
+        if clip_path:
+            # Keep the clip for /event retrieval; the cache manager bounds its lifetime
+            os.makedirs(self.events_dir, exist_ok=True)
+            event_clip_path = os.path.join(self.events_dir, f"{event_id}.mp4")
+            os.replace(clip_path, event_clip_path)
+            for recorded_id in self._recorded_ids(event_id):
+                get_event_store().update_paths(recorded_id, clip_path=event_clip_path)
+            await self._broadcast(chat_ids, "video", event_clip_path, caption)
+        elif not preview_sent:
+            await self._broadcast_text(chat_ids, caption)
+        return event_id
+
+    def _store_trajectories(self) -> None:
+        """Save the full paths of tracked objects that left the frame."""
+        for track in self.motion_detector.tracker.pop_finished():
+            if track.event_id is not None:
+                get_event_store().update_trajectory(track.event_id, track.trajectory, end_ts=track.last_seen)
+
+    def _detect(self, now: Optional[float] = None) -> bool:
+        """Run detection on the capture buffer.
+
+        With tracking, only frames captured since the previous check are
+        processed; otherwise the last 10 frames are scanned.
+
+        Args:
+            now: Detection time, defaults to wall-clock time; replay passes video time.
+        """
+        if self.motion_detector.tracker is None:
+            frames = self.video_processor.get_recent_frames(10)  # Last 10 frames
+            return self.motion_detector.detect_in_buffer(frames, now=now)
+        self._frame_seq, frames = self.video_processor.get_frames_since(self._frame_seq)
+        detected = self.motion_detector.process_frames(frames, now=now, fps=self.video_processor.fps or 10.0)
+        self._store_trajectories()
+        return detected
+
+    async def _monitor_motion(self) -> None:
         """Monitor for motion and send notifications."""
+        self._frame_seq = self.video_processor.frame_seq
+        self.motion_detector.reset_tracking()
         while self.monitoring:
             try:
-                frames = self.video_processor.get_recent_frames(10)  # Last 10 frames
-                if self.motion_detector.detect_in_buffer(frames):
-                    if self._is_quiet_hours():
-                        logger.info("Motion detected but in quiet hours, skipping notification")
-                        continue
-                    # Send notification
-                    clip_path = await self.video_processor.generate_clip(5.0)
-                    if clip_path:
-                        with open(clip_path, 'rb') as clip_file:
-                            await self.application.bot.send_video(chat_id, clip_file, caption="Motion detected!")
-                        import os
-                        os.remove(clip_path)
-                    else:
-                        await self.application.bot.send_message(chat_id, "Motion detected!")
+                if self._detect():
+                    await self._handle_motion()
                 await asyncio.sleep(1)  # Check every second
             except Exception as e:
-                logger.error(f"Error in motion monitoring: {e}")
+                logger.error("Error in motion monitoring: %s", e, extra=HOT_PATH)
                 await asyncio.sleep(5)
 
+    async def _warm_up(self) -> None:
+        """Load the OpenCV-backed components in the background and start the preview server."""
+        try:
+            await self._ensure_components()
+            get_startup_timer().mark('components')
+            from preview_server import create_preview_server
+            self.preview_server = create_preview_server(self.video_processor)
+            if self.preview_server:
+                await self.preview_server.start()
+            from timelapse import create_timelapse_recorder
+            self.timelapse = create_timelapse_recorder()
+            if self.timelapse:
+                self.timelapse.start(self.video_processor.get_latest_frame)
+        except Exception as e:
+            logger.error(f"Failed to load camera components: {e}")
+        logger.info(f"Startup timings: {get_startup_timer().summary()}")
+
+    async def _on_update(self, update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Record when the first update arrives after startup."""
+        if not self._first_update_seen:
+            self._first_update_seen = True
+            elapsed = get_startup_timer().mark('first_update')
+            logger.info(f"First update received {elapsed:.2f}s after start")
+
+    async def _post_init(self, application: Application) -> None:
+        """Start loading components; polling starts right after this returns."""
+        get_startup_timer().mark('polling')
+        self._warmup_task = asyncio.create_task(self._warm_up())
+
+    async def _post_shutdown(self, application: Application) -> None:
+        """Stop services started in _post_init."""
+        for task in (self._warmup_task, self._profile_task):
+            if task and not task.done():
+                task.cancel()
+        if self.preview_server:
+            await self.preview_server.stop()
+        if self.timelapse:
+            await self.timelapse.stop()
+        if self._classifier:
+            self._classifier.shutdown()
+        if self._motion_detector and self._motion_detector.heatmap:
+            await asyncio.get_running_loop().run_in_executor(None, self._motion_detector.heatmap.save)
+
     def setup_application(self) -> Application:
         """Set up the Telegram application."""
         config = get_config()
-        self.application = Application.builder().token(config.bot_token).build()
+        self.application = (
+            Application.builder()
+            .token(config.bot_token)
+            .build()
+        )
 
+        self.application.add_handler(TypeHandler(Update, self._on_update), group=-1)
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("stop", self.stop_command))
         self.application.add_handler(CommandHandler("stream", self.stream_command))
         self.application.add_handler(CommandHandler("photo", self.photo_command))
         self.application.add_handler(CommandHandler("clip5", self.clip5_command))
+        self.application.add_handler(CommandHandler("preview", self.preview_command))
         self.application.add_handler(CommandHandler("status", self.status_command))
-
-        # Set error callback now that application is available
-        self.video_processor.error_callback = self._send_error_message
+        self.application.add_handler(CommandHandler("stats", self.stats_command))
+        self.application.add_handler(CommandHandler("timelapse", self.timelapse_command))
+        self.application.add_handler(CommandHandler("profile", self.profile_command))
+        self.application.add_handler(CommandHandler("set", self.set_command))
+        self.application.add_handler(CommandHandler("subscribe", self.subscribe_command))
+        self.application.add_handler(CommandHandler("unsubscribe", self.unsubscribe_command))
+        self.application.add_handler(CommandHandler("quiet", self.quiet_command))
+        self.application.add_handler(CommandHandler("cameras", self.cameras_command))
+        self.application.add_handler(CommandHandler("heatmap", self.heatmap_command))
+        self.application.add_handler(CommandHandler("events", self.events_command))
+        self.application.add_handler(CommandHandler("event", self.event_command))
 
         return self.application
 
-    async def run(self) -> None:
-        """Run the bot."""
+    async def start(self) -> None:
+        """Start polling on the running event loop.
+
+        Follows the order of Application.run_polling: initialize, post_init,
+        polling, then update processing.
+        """
         if not self.application:
             self.setup_application()
-        await self.application.run_polling(close_loop=False)
\ No newline at end of file
+        await self.application.initialize()
+        await self._post_init(self.application)
+        await self.application.updater.start_polling()
+        await self.application.start()
+
+    async def stop(self, drain_timeout: float = 0.0) -> None:
+        """Stop polling, let a pending alert finish, then shut the bot down.
+
+        Args:
+            drain_timeout: Seconds an alert in progress may take to finish.
+        """
+        if not self.application:
+            await self.stop_monitoring(drain_timeout)
+            return
+        if self.application.updater and self.application.updater.running:
+            await self.application.updater.stop()
+        await self.stop_monitoring(drain_timeout)
+        if self.application.running:
+            await self.application.stop()
+        await self.application.shutdown()
+        await self._post_shutdown(self.application)
\ No newline at end of file
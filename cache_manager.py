@@ -11,7 +11,8 @@ import shutil
 import time
 from typing import List
 
-from config import get_config
+from config import AppConfig, get_config
+from metrics import get_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +36,11 @@ class CacheManager:
         self.cleanup_task: asyncio.Task = None
         self.running = False
 
+    def apply_config(self, config: AppConfig) -> None:
+        """Apply live-tunable cache settings; the next cleanup uses them."""
+        self.max_size_mb = config.cache_max_size_mb
+        self.cleanup_interval = config.cache_cleanup_interval
+
     async def start_cleanup(self):
         """Start the periodic cleanup task."""
         if self.running:
@@ -64,31 +70,36 @@ class CacheManager:
 
     def _cleanup_old_files(self):
         """Remove old files if cache size exceeds limit."""
+        metrics = get_metrics()
         try:
-            # Get all files in cache
-            files = []
-            for root, dirs, filenames in os.walk(self.cache_dir):
-                for filename in filenames:
-                    filepath = os.path.join(root, filename)
-                    files.append((filepath, os.path.getmtime(filepath)))
-
-            # Sort by modification time (oldest first)
-            files.sort(key=lambda x: x[1])
-
-            # Calculate total size
-            total_size = sum(os.path.getsize(f[0]) for f in files)
-
-            # Remove oldest files until under limit
-            max_size_bytes = self.max_size_mb * 1024 * 1024
-            while total_size > max_size_bytes and files:
-                filepath, _ = files.pop(0)
-                size = os.path.getsize(filepath)
-                try:
-                    os.remove(filepath)
-                    total_size -= size
-                    logger.info(f"Removed old cache file: {filepath}")
-                except OSError as e:
-                    logger.error(f"Failed to remove cache file {filepath}: {e}")
+            with metrics.timer('cache_eviction'):
+                # Get all files in cache
+                files = []
+                for root, dirs, filenames in os.walk(self.cache_dir):
+                    for filename in filenames:
+                        filepath = os.path.join(root, filename)
+                        files.append((filepath, os.path.getmtime(filepath)))
+
+                # Sort by modification time (oldest first)
+                files.sort(key=lambda x: x[1])
+
+                # Calculate total size
+                total_size = sum(os.path.getsize(f[0]) for f in files)
+
+                # Remove oldest files until under limit
+                max_size_bytes = self.max_size_mb * 1024 * 1024
+                while total_size > max_size_bytes and files:
+                    filepath, _ = files.pop(0)
+                    size = os.path.getsize(filepath)
+                    try:
+                        os.remove(filepath)
+                        total_size -= size
+                        metrics.inc('cache_files_evicted_total')
+                        logger.info(f"Removed old cache file: {filepath}")
+                    except OSError as e:
+                        logger.error(f"Failed to remove cache file {filepath}: {e}")
+
+                metrics.set_gauge('cache_bytes', total_size)
 
         except Exception as e:
             logger.error(f"Error during cache cleanup: {e}")
@@ -4,7 +4,7 @@ This module handles loading and validating environment variables using Pydantic.
 """
 
 import os
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field, ValidationError
 from pydantic_settings import BaseSettings
@@ -20,13 +20,22 @@ class AppConfig(BaseSettings):
 
     # Core settings
     rtsp_url: str = Field(..., description="RTSP stream URL")
+    rtsp_open_timeout: float = Field(10.0, description="Seconds allowed for opening the RTSP stream")
+    rtsp_read_timeout: float = Field(5.0, description="Seconds a frame read may take before the stream counts as stalled")
+    rtsp_backoff_initial: float = Field(1.0, description="First reconnect backoff delay in seconds, doubled per failure")
+    rtsp_backoff_max: float = Field(30.0, description="Maximum reconnect backoff delay in seconds")
+    rtsp_stall_seconds: float = Field(3.0, description="Seconds without a frame before the stream is reconnected")
+    rtsp_standby: bool = Field(False, description="Pre-open a standby capture when reads start failing, swapped in on a stall")
     bot_token: str = Field(..., description="Telegram bot token")
-    chat_id: str = Field(..., description="Telegram chat ID for notifications")
+    chat_id: str = Field(..., description="Telegram chat ID(s) for notifications, comma-separated")
+    admin_chat_ids: str = Field("", description="Comma-separated chat IDs allowed to run admin commands such as /profile; they also receive error messages")
 
     # Motion detection settings
     motion_threshold: int = Field(..., description="Motion detection threshold (pixel difference)")
     motion_sensitivity: float = Field(..., description="Motion sensitivity (0.0 to 1.0)")
     motion_min_area: int = Field(..., description="Minimum area for motion detection (pixels)")
+    motion_illumination_compensation: bool = Field(False, description="Normalise global brightness/contrast changes before differencing")
+    motion_global_change_ratio: float = Field(0.6, description="Changed-pixel ratio above which a frame pair is treated as a lighting change")
 
     # Cache settings
     cache_dir: str = Field(..., description="Cache directory path")
@@ -40,12 +49,33 @@ class AppConfig(BaseSettings):
     # Video settings
     video_buffer_seconds: int = Field(..., description="Video buffer duration in seconds")
     video_max_duration: int = Field(..., description="Maximum video clip duration in seconds")
+    video_buffer_max_mb: float = Field(0, description="Frame buffer memory budget in MB (0 = 25% of physical RAM)")
+    video_buffer_compression: str = Field("none", description="In-memory frame buffer compression (none, jpeg, zlib)")
+    video_buffer_raw_seconds: float = Field(2.0, description="Newest seconds of frames kept uncompressed")
+    video_buffer_jpeg_quality: int = Field(90, description="JPEG quality of compressed buffered frames")
+    video_buffer_dedup_threshold: float = Field(0, description="Thumbnail grey-level change below which a frame is stored as a duplicate (0 = off)")
     video_quality: str = Field(..., description="Video quality (low, medium, high)")
+    video_max_clip_mb: float = Field(0, description="Clip size budget in MB (0 = Telegram upload limit only)")
+    animation_width: int = Field(320, description="Maximum GIF preview width in pixels")
+    animation_fps: float = Field(5.0, description="GIF preview frame rate")
+    animation_max_kb: int = Field(1024, description="GIF preview size budget in KB")
+    snapshot_jpeg_quality: int = Field(85, description="JPEG quality of /photo and /stream snapshots")
+    snapshot_cache_entries: int = Field(16, description="Encoded snapshots kept in the in-memory LRU cache")
+    encoder_workers: int = Field(1, description="Warm FFmpeg encoder processes kept per clip format (0 = spawn per clip)")
 
     # Notification settings
     notification_cooldown_seconds: int = Field(..., description="Notification cooldown in seconds")
     notification_quiet_hours_start: int = Field(..., description="Quiet hours start time (24-hour format)")
     notification_quiet_hours_end: int = Field(..., description="Quiet hours end time (24-hour format)")
+    notification_delivery: Literal["sheet", "sheet_then_clip", "animation", "animation_then_clip", "clip"] = Field(
+        "clip", description="Motion alert delivery (sheet, sheet_then_clip, animation, animation_then_clip, clip)"
+    )
+    shutdown_drain_timeout: float = Field(10.0, description="Seconds an alert in progress may take to finish on shutdown")
+    notification_send_interval: float = Field(0.05, description="Seconds between alert sends to different chats")
+    subscribers_path: str = Field("./data/subscribers.json", description="Alert subscriber registry file")
+    contact_sheet_frames: int = Field(6, description="Number of peak-motion frames in a contact sheet")
+    contact_sheet_columns: int = Field(3, description="Contact sheet grid columns")
+    contact_sheet_tile_width: int = Field(320, description="Contact sheet tile width in pixels")
 
     # Logging settings
     log_level: str = Field(..., description="Logging level (DEBUG, INFO, WARNING, ERROR)")
@@ -54,6 +84,56 @@ class AppConfig(BaseSettings):
     log_rotation_enabled: bool = Field(..., description="Enable log rotation")
     log_max_file_size_mb: int = Field(..., description="Maximum log file size in MB")
     log_backup_count: int = Field(..., description="Number of log backup files to keep")
+    log_rate_limit_seconds: float = Field(60.0, description="Interval within which repeats of a hot-path log message are dropped and summarised (0 = off)")
+
+    # Event settings
+    camera_name: str = Field("default", description="Camera name recorded with motion events")
+    event_db_path: str = Field("./data/events.db", description="SQLite motion event index path")
+
+    # Heatmap settings
+    heatmap_enabled: bool = Field(False, description="Accumulate a decaying motion heatmap")
+    heatmap_width: int = Field(160, description="Motion heatmap width in cells")
+    heatmap_half_life_hours: float = Field(24.0, description="Hours after which past motion counts half")
+    heatmap_save_interval: int = Field(300, description="Seconds between heatmap saves to the cache directory")
+
+    # Tracking settings
+    tracking_enabled: bool = Field(False, description="Track motion boxes across frames before firing events")
+    tracking_min_hits: int = Field(3, description="Frames an object must persist before an event fires")
+    tracking_max_misses: int = Field(5, description="Frames an object may be missing before its track ends")
+    tracking_iou_threshold: float = Field(0.1, description="Minimum box overlap to continue a track")
+    tracking_max_distance: float = Field(100.0, description="Maximum centroid distance in pixels to continue a track")
+
+    # Object classification settings
+    classifier_enabled: bool = Field(False, description="Classify motion boxes before notifying")
+    classifier_backend: str = Field("hog", description="Object classifier backend (hog, dnn)")
+    classifier_classes: str = Field("person", description="Comma-separated labels that trigger notifications")
+    classifier_confidence: float = Field(0.5, description="Minimum object detection confidence")
+    classifier_workers: int = Field(1, description="Object classifier worker threads")
+    classifier_model_path: str = Field("", description="DNN model weights file (dnn backend)")
+    classifier_config_path: str = Field("", description="DNN model configuration file (dnn backend)")
+    classifier_labels_path: str = Field("", description="DNN class labels file, one per line (dnn backend)")
+
+    # Live preview settings
+    preview_enabled: bool = Field(False, description="Enable the local MJPEG live preview server")
+    preview_host: str = Field("127.0.0.1", description="Live preview bind address")
+    preview_port: int = Field(8081, description="Live preview port")
+    preview_fps: float = Field(5.0, description="Maximum live preview frame rate")
+    preview_width: int = Field(640, description="Live preview frame width in pixels")
+    preview_jpeg_quality: int = Field(70, description="Live preview JPEG quality")
+
+    # Time-lapse settings
+    timelapse_enabled: bool = Field(False, description="Record a daily time-lapse of sampled frames")
+    timelapse_interval: float = Field(10.0, description="Seconds between time-lapse frames")
+    timelapse_fps: int = Field(25, description="Time-lapse playback frame rate")
+    timelapse_width: int = Field(1280, description="Maximum time-lapse frame width in pixels")
+    timelapse_crf: int = Field(30, description="Time-lapse x264 quality (lower is better)")
+
+    # Metrics settings
+    metrics_enabled: bool = Field(False, description="Enable the local Prometheus /metrics endpoint")
+    metrics_host: str = Field("127.0.0.1", description="Metrics endpoint bind address")
+    metrics_port: int = Field(9108, description="Metrics endpoint port")
+    profile_block_threshold_ms: float = Field(100.0, description="Event loop stall in ms reported as a blocking event by /profile")
+    config_watch_interval: float = Field(0.0, description="Seconds between checks of .env for live setting changes (0 = off)")
 
     model_config = ConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -80,6 +160,12 @@ def get_config() -> AppConfig:
     return _config
 
 
+def set_config(config: AppConfig) -> None:
+    """Replace the global configuration instance, e.g. after a live change."""
+    global _config
+    _config = config
+
+
 def load_config() -> AppConfig:
     """Load and validate configuration from environment.
 
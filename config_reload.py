@@ -0,0 +1,234 @@
+"""Live configuration changes for kdx-pi-cam.
+
+This module applies detection, notification and cache settings to the
+running components without a restart, so the frame buffer and the RTSP
+session survive tuning. Changes come from the /set bot command or from
+edits to the .env file, which is polled for changes. Every change is
+validated as a whole, swapped in as a new AppConfig and pushed to the
+registered components in one step on the event loop, between two
+detection passes. Each change is recorded with the motion trigger rate
+before and after it.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from config import AppConfig, ConfigError, get_config, set_config
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Settings that can change while running; everything else needs a restart
+TUNABLE_FIELDS = (
+    "motion_threshold",
+    "motion_sensitivity",
+    "motion_min_area",
+    "motion_illumination_compensation",
+    "motion_global_change_ratio",
+    "tracking_min_hits",
+    "tracking_max_misses",
+    "tracking_iou_threshold",
+    "tracking_max_distance",
+    "notification_cooldown_seconds",
+    "notification_quiet_hours_start",
+    "notification_quiet_hours_end",
+    "notification_delivery",
+    "notification_send_interval",
+    "cache_max_size_mb",
+    "cache_cleanup_interval",
+)
+
+# Changes kept for /set
+MAX_HISTORY = 20
+
+
+@dataclass
+class ConfigChange:
+    """One applied change with the motion event count at the time."""
+
+    changed_at: float
+    source: str
+    changes: Dict[str, Tuple[Any, Any]]
+    events: float  # motion_events_total when the change was applied
+
+
+def _rate_per_hour(events: float, seconds: float) -> float:
+    return events * 3600 / seconds if seconds > 0 else 0.0
+
+
+def _read_env_file(path: str) -> Dict[str, Optional[str]]:
+    """Settings in an env file, keyed by lower-case field name."""
+    from dotenv import dotenv_values
+    return {key.lower(): value for key, value in dotenv_values(path).items()}
+
+
+class ConfigReloader:
+    """Validates configuration changes and applies them to running components."""
+
+    def __init__(self, env_file: str = ".env", watch_interval: float = 0.0):
+        """Initialize the reloader.
+
+        Args:
+            env_file: Env file watched for changes.
+            watch_interval: Seconds between checks of the env file, 0 to
+                only accept changes from /set.
+        """
+        self.env_file = env_file
+        self.watch_interval = watch_interval
+        self.history: List[ConfigChange] = []
+        self._listeners: List[Callable[[AppConfig], None]] = []
+        self._started_at = time.time()
+        self._file_mtime: Optional[float] = None
+        self._file_values: Dict[str, Optional[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, listener: Callable[[AppConfig], None]) -> None:
+        """Register a callback that applies a new configuration to a component."""
+        self._listeners.append(listener)
+
+    def apply(self, updates: Dict[str, Any], source: str) -> Dict[str, Tuple[Any, Any]]:
+        """Validate and apply new setting values.
+
+        Args:
+            updates: New values by field name (any case), as strings or typed values.
+            source: Where the change came from, e.g. '/set' or '.env'.
+
+        Returns:
+            The settings that changed, mapped to (old, new) values.
+
+        Raises:
+            ConfigError: If a setting cannot change at runtime or a value is invalid.
+        """
+        updates = {key.lower(): value for key, value in updates.items()}
+        fixed = sorted(key for key in updates if key not in TUNABLE_FIELDS)
+        if fixed:
+            raise ConfigError(f"Cannot change at runtime: {', '.join(fixed)}")
+        current = get_config()
+        try:
+            new = AppConfig.model_validate({**current.model_dump(), **updates})
+        except ValidationError as e:
+            raise ConfigError(f"Invalid value: {e}")
+        changes = {
+            key: (getattr(current, key), getattr(new, key))
+            for key in updates if getattr(current, key) != getattr(new, key)
+        }
+        if not changes:
+            return {}
+
+        set_config(new)
+        for listener in self._listeners:
+            try:
+                listener(new)
+            except Exception as e:
+                logger.error(f"Failed to apply configuration change: {e}")
+        self._record(source, changes)
+        return changes
+
+    def _record(self, source: str, changes: Dict[str, Tuple[Any, Any]]) -> None:
+        """Keep the change and log the trigger rate under the previous settings."""
+        now = time.time()
+        events = get_metrics().get_counter('motion_events_total')
+        since, base = (self.history[-1].changed_at, self.history[-1].events) if self.history else (self._started_at, 0.0)
+        summary = ", ".join(f"{key} {old} -> {new}" for key, (old, new) in changes.items())
+        logger.info(
+            f"Configuration changed via {source}: {summary} "
+            f"(trigger rate before: {_rate_per_hour(events - base, now - since):.1f}/h)"
+        )
+        self.history.append(ConfigChange(now, source, changes, events))
+        del self.history[:-MAX_HISTORY]
+        get_metrics().inc('config_changes_total')
+
+    def describe_history(self, limit: int = 5) -> List[str]:
+        """Recent changes with the motion trigger rate before and after each."""
+        now = time.time()
+        events_now = get_metrics().get_counter('motion_events_total')
+        start = max(len(self.history) - limit, 0)
+        lines = []
+        for index in range(start, len(self.history)):
+            change = self.history[index]
+            previous = self.history[index - 1] if index else None
+            following = self.history[index + 1] if index + 1 < len(self.history) else None
+            before_since, before_base = (previous.changed_at, previous.events) if previous else (self._started_at, 0.0)
+            after_until, after_events = (following.changed_at, following.events) if following else (now, events_now)
+            rate_before = _rate_per_hour(change.events - before_base, change.changed_at - before_since)
+            rate_after = _rate_per_hour(after_events - change.events, after_until - change.changed_at)
+            when = time.strftime('%m-%d %H:%M', time.localtime(change.changed_at))
+            summary = ", ".join(f"{key} {old} -> {new}" for key, (old, new) in change.changes.items())
+            lines.append(f"{when} ({change.source}) {summary}: triggers {rate_before:.1f}/h -> {rate_after:.1f}/h")
+        return lines
+
+    def check_file(self) -> Dict[str, Tuple[Any, Any]]:
+        """Apply settings edited in the env file since the last check.
+
+        Only lines that changed in the file are applied, so values set with
+        /set stay until the file itself changes them.
+
+        Returns:
+            The settings that changed, mapped to (old, new) values.
+        """
+        try:
+            mtime = os.path.getmtime(self.env_file)
+        except OSError:
+            return {}
+        if mtime == self._file_mtime:
+            return {}
+        self._file_mtime = mtime
+        values = _read_env_file(self.env_file)
+        edited = {key: value for key, value in values.items() if self._file_values.get(key) != value}
+        self._file_values = values
+        restart = sorted(key.upper() for key in edited if key not in TUNABLE_FIELDS)
+        if restart:
+            logger.warning(f"Restart needed to apply {', '.join(restart)}")
+        tunable = {key: value for key, value in edited.items() if key in TUNABLE_FIELDS}
+        if not tunable:
+            return {}
+        try:
+            return self.apply(tunable, self.env_file)
+        except ConfigError as e:
+            logger.error(f"Ignoring {self.env_file} change: {e}")
+            return {}
+
+    async def _watch(self) -> None:
+        """Poll the env file for changes."""
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            self.check_file()
+
+    async def start(self) -> None:
+        """Start watching the env file if a watch interval is set."""
+        if self.watch_interval <= 0 or self._task:
+            return
+        # Baseline: only later edits are applied
+        self._file_mtime = os.path.getmtime(self.env_file) if os.path.exists(self.env_file) else None
+        self._file_values = _read_env_file(self.env_file) if self._file_mtime is not None else {}
+        self._task = asyncio.create_task(self._watch())
+        logger.info(f"Watching {self.env_file} for configuration changes every {self.watch_interval:.0f}s")
+
+    async def stop(self) -> None:
+        """Stop watching the env file."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global reloader instance
+_config_reloader: Optional[ConfigReloader] = None
+
+
+def get_config_reloader() -> ConfigReloader:
+    """Get the global configuration reloader."""
+    global _config_reloader
+    if _config_reloader is None:
+        env_file = AppConfig.model_config.get("env_file") or ".env"
+        _config_reloader = ConfigReloader(env_file, get_config().config_watch_interval)
+    return _config_reloader
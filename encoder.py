@@ -0,0 +1,330 @@
+"""Clip encoding for kdx-pi-cam.
+
+This module maps VIDEO_QUALITY to x264 encoder profiles (preset, CRF,
+output resolution and frame rate), computes bitrate caps so clips stay
+under a byte budget and Telegram's upload limit, and keeps a pool of warm
+FFmpeg processes so clips do not pay process startup.
+"""
+
+import logging
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import ffmpeg
+
+from config import get_config
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Telegram Bot API upload limit for videos
+TELEGRAM_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# Share of the byte budget spent on video; the rest covers container overhead
+BUDGET_VIDEO_SHARE = 0.92
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """x264 settings for one quality level."""
+
+    name: str
+    preset: str
+    crf: int
+    max_height: int  # 0 keeps the source resolution
+    fps: int
+
+
+ENCODER_PROFILES: Dict[str, EncoderProfile] = {
+    "low": EncoderProfile("low", preset="ultrafast", crf=32, max_height=360, fps=5),
+    "medium": EncoderProfile("medium", preset="veryfast", crf=27, max_height=720, fps=10),
+    "high": EncoderProfile("high", preset="faster", crf=22, max_height=0, fps=10),
+}
+
+
+def get_encoder_profile(quality: str) -> EncoderProfile:
+    """Get the encoder profile for a VIDEO_QUALITY value.
+
+    Args:
+        quality: 'low', 'medium' or 'high'.
+
+    Returns:
+        The matching profile, or the medium profile for unknown values.
+    """
+    profile = ENCODER_PROFILES.get(quality.lower())
+    if profile is None:
+        logger.warning(f"Unknown video quality '{quality}', using medium")
+        profile = ENCODER_PROFILES["medium"]
+    return profile
+
+
+def output_size(width: int, height: int, profile: EncoderProfile) -> Tuple[int, int]:
+    """Compute the encoded frame size for a profile.
+
+    The source is only ever downscaled and both sides are kept even, as
+    required by yuv420p.
+
+    Returns:
+        Tuple of (width, height).
+    """
+    if profile.max_height and height > profile.max_height:
+        width = width * profile.max_height / height
+        height = profile.max_height
+    return max(int(width) // 2 * 2, 2), max(int(height) // 2 * 2, 2)
+
+
+def frame_step(input_fps: float, profile: EncoderProfile) -> int:
+    """Number of buffered frames per encoded frame when decimating to the profile rate."""
+    return max(int(round(input_fps / profile.fps)), 1)
+
+
+def max_clip_bytes(budget_mb: float) -> int:
+    """Resolve the clip byte budget.
+
+    Args:
+        budget_mb: Configured budget in MB; 0 means only Telegram's limit applies.
+
+    Returns:
+        Budget in bytes, never above Telegram's upload limit.
+    """
+    if budget_mb and budget_mb > 0:
+        return min(int(budget_mb * 1024 * 1024), TELEGRAM_MAX_UPLOAD_BYTES)
+    return TELEGRAM_MAX_UPLOAD_BYTES
+
+
+def target_bitrate(max_bytes: int, duration: float) -> int:
+    """Video bitrate in bits per second that fits a clip into max_bytes."""
+    return max(int(max_bytes * 8 * BUDGET_VIDEO_SHARE / max(duration, 0.1)), 50_000)
+
+
+def ffmpeg_output_args(profile: EncoderProfile, width: int, height: int,
+                       duration: float, max_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """Build ffmpeg-python output keyword arguments for a clip.
+
+    Quality is CRF-driven; when a byte budget is given the bitrate is capped
+    with maxrate/bufsize so the clip stays under it.
+
+    Args:
+        profile: Encoder profile.
+        width: Source frame width.
+        height: Source frame height.
+        duration: Clip duration in seconds.
+        max_bytes: Optional byte budget.
+
+    Returns:
+        Keyword arguments for ffmpeg.output().
+    """
+    out_width, out_height = output_size(width, height, profile)
+    args: Dict[str, Any] = {
+        'vcodec': 'libx264',
+        'pix_fmt': 'yuv420p',
+        'preset': profile.preset,
+        'crf': profile.crf,
+        'r': profile.fps,
+        'movflags': '+faststart',
+    }
+    if (out_width, out_height) != (width, height):
+        args['vf'] = f'scale={out_width}:{out_height}'
+    if max_bytes:
+        bitrate = target_bitrate(max_bytes, duration)
+        args['maxrate'] = bitrate
+        args['bufsize'] = bitrate
+    return args
+
+
+# Encoder jobs are keyed by frame size, frame rate and output arguments;
+# callers keep the arguments independent of the clip length so keys match
+EncoderKey = Tuple[int, int, int, Tuple[Tuple[str, Any], ...]]
+
+
+def encoder_key(width: int, height: int, fps: int, output_args: Dict[str, Any]) -> EncoderKey:
+    """Build the key identifying interchangeable encoder workers."""
+    return width, height, fps, tuple(sorted(output_args.items()))
+
+
+class EncoderWorker:
+    """A single FFmpeg process waiting for raw frames on stdin.
+
+    Output is a fragmented MP4 written to stdout, so the process can be
+    started before the destination of the clip is known.
+    """
+
+    def __init__(self, key: EncoderKey):
+        """Spawn the FFmpeg process.
+
+        Args:
+            key: Frame size, frame rate and output arguments of the job.
+        """
+        width, height, fps, output_items = key
+        output_args = dict(output_items)
+        output_args['movflags'] = 'frag_keyframe+empty_moov'
+        self.key = key
+        self.command = (
+            ffmpeg
+            .input('pipe:', format='rawvideo', pix_fmt='bgr24', s=f'{width}x{height}', framerate=fps)
+            .output('pipe:', format='mp4', **output_args)
+            .global_args('-loglevel', 'error')
+            .compile()
+        )
+        self.started_at = time.perf_counter()
+        self.warm = False  # Set by the pool once the worker waited for a job
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+
+    @property
+    def alive(self) -> bool:
+        """Whether the process is still waiting for input."""
+        return self.process.poll() is None
+
+    def _drain(self, chunks: List[bytes], job_started: float) -> None:
+        """Read the encoded output, recording the time to its first bytes.
+
+        The encoder_startup stage runs from the start of the job, or from
+        process spawn for a cold worker, to the first encoded bytes, so it
+        covers process, codec and muxer startup.
+        """
+        stdout = self.process.stdout
+        while True:
+            chunk = stdout.read1(65536)
+            if not chunk:
+                return
+            if not chunks:
+                get_metrics().observe('encoder_startup', time.perf_counter() - job_started)
+            chunks.append(chunk)
+
+    def run(self, frames: Sequence[Any], timeout: float = 120.0) -> bytes:
+        """Feed frames to the encoder and collect the encoded clip.
+
+        Args:
+            frames: BGR frames matching the worker's frame size.
+            timeout: Seconds to wait for FFmpeg to finish.
+
+        Returns:
+            The encoded MP4 bytes.
+
+        Raises:
+            RuntimeError: If FFmpeg fails or produces no output.
+        """
+        chunks: List[bytes] = []
+        job_started = time.perf_counter() if self.warm else self.started_at
+        # Drain stdout concurrently so a full pipe never stalls the encoder
+        reader = threading.Thread(target=self._drain, args=(chunks, job_started), daemon=True)
+        reader.start()
+        try:
+            for frame in frames:
+                self.process.stdin.write(frame.tobytes())
+            self.process.stdin.close()
+            returncode = self.process.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self.kill()
+            raise RuntimeError(f"Encoder failed: {e}")
+        reader.join(timeout=5)
+        data = b''.join(chunks)
+        if returncode != 0 or not data:
+            raise RuntimeError(f"ffmpeg exited with code {returncode}")
+        return data
+
+    def kill(self) -> None:
+        """Terminate the process."""
+        if self.alive:
+            self.process.kill()
+        self.process.wait()
+
+
+class EncoderPool:
+    """Keeps warm encoder workers per job key and replaces them after use."""
+
+    def __init__(self, size: int):
+        """Initialize the pool.
+
+        Args:
+            size: Warm workers kept per key; 0 starts a fresh process per clip.
+        """
+        self.size = size
+        self._idle: Dict[EncoderKey, List[EncoderWorker]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def prewarm(self, key: EncoderKey) -> None:
+        """Start warm workers for a key up to the pool size."""
+        while True:
+            with self._lock:
+                if self._closed or len(self._idle.get(key, [])) >= self.size:
+                    return
+            try:
+                worker = EncoderWorker(key)
+            except OSError as e:
+                logger.warning(f"Failed to start encoder worker: {e}")
+                return
+            with self._lock:
+                if self._closed:
+                    worker.kill()
+                    return
+                worker.warm = True
+                self._idle.setdefault(key, []).append(worker)
+
+    def _acquire(self, key: EncoderKey) -> EncoderWorker:
+        """Take a warm worker for the key, or start a cold one."""
+        metrics = get_metrics()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                worker = idle.pop()
+                if worker.alive:
+                    metrics.inc('encoder_warm_hits_total')
+                    return worker
+                metrics.inc('encoder_restarts_total')
+        metrics.inc('encoder_cold_starts_total')
+        return EncoderWorker(key)
+
+    def encode(self, frames: Sequence[Any], fps: int, output_args: Dict[str, Any]) -> bytes:
+        """Encode frames into an MP4 clip, blocking until done.
+
+        A failed worker is discarded and the job retried once on a fresh one.
+        A replacement worker is started in the background after every job.
+
+        Args:
+            frames: BGR frames of equal size.
+            fps: Frame rate of the frames.
+            output_args: ffmpeg-python output arguments, see ffmpeg_output_args().
+
+        Returns:
+            The encoded MP4 bytes.
+        """
+        height, width = frames[0].shape[:2]
+        key = encoder_key(width, height, fps, output_args)
+        try:
+            try:
+                return self._acquire(key).run(frames)
+            except RuntimeError as e:
+                logger.warning(f"Encoder worker failed, restarting: {e}")
+                get_metrics().inc('encoder_restarts_total')
+                return EncoderWorker(key).run(frames)
+        finally:
+            if self.size > 0:
+                threading.Thread(target=self.prewarm, args=(key,), daemon=True).start()
+
+    def shutdown(self) -> None:
+        """Kill all idle workers."""
+        with self._lock:
+            self._closed = True
+            workers = [worker for idle in self._idle.values() for worker in idle]
+            self._idle.clear()
+        for worker in workers:
+            worker.kill()
+
+
+# Global encoder pool instance
+_encoder_pool: EncoderPool = None
+
+
+def get_encoder_pool() -> EncoderPool:
+    """Get the global encoder pool instance."""
+    global _encoder_pool
+    if _encoder_pool is None:
+        _encoder_pool = EncoderPool(get_config().encoder_workers)
+    return _encoder_pool
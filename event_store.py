@@ -0,0 +1,246 @@
+"""Motion event index for kdx-pi-cam.
+
+This module records every motion detection in a local SQLite database with
+a time index, so events can be listed and retrieved after their clips have
+been delivered.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    peak_score REAL NOT NULL,
+    boxes TEXT NOT NULL,
+    thumbnail_path TEXT,
+    clip_path TEXT,
+    labels TEXT NOT NULL DEFAULT '{}',
+    trajectory TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_events_start ON events(start_ts);
+CREATE INDEX IF NOT EXISTS idx_events_camera_start ON events(camera, start_ts);
+"""
+
+# Columns added after the first release, created on databases that lack them
+MIGRATIONS = {
+    "labels": "ALTER TABLE events ADD COLUMN labels TEXT NOT NULL DEFAULT '{}'",
+    "trajectory": "ALTER TABLE events ADD COLUMN trajectory TEXT NOT NULL DEFAULT '[]'",
+}
+
+COLUMNS = "id, camera, start_ts, end_ts, peak_score, boxes, thumbnail_path, clip_path, labels, trajectory"
+
+DURATION_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+@dataclass
+class EventRecord:
+    """A stored motion event."""
+
+    id: int
+    camera: str
+    start_ts: float
+    end_ts: float
+    peak_score: float
+    boxes: List[Tuple[int, int, int, int]] = field(default_factory=list)
+    thumbnail_path: Optional[str] = None
+    clip_path: Optional[str] = None
+    labels: Dict[str, float] = field(default_factory=dict)
+    trajectory: List[Tuple[float, int, int]] = field(default_factory=list)  # (timestamp, x, y)
+
+
+class EventStore:
+    """SQLite-backed index of motion events."""
+
+    def __init__(self, db_path: str):
+        """Open or create the event database.
+
+        Args:
+            db_path: Path to the SQLite file.
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        """Add columns missing from databases created by older versions."""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(events)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in existing:
+                logger.info(f"Adding column {column} to {self.db_path}")
+                self._conn.execute(statement)
+
+    def add_event(
+        self,
+        camera: str,
+        start_ts: float,
+        end_ts: float,
+        peak_score: float,
+        boxes: List[Tuple[int, int, int, int]],
+        thumbnail_path: Optional[str] = None,
+        clip_path: Optional[str] = None,
+    ) -> int:
+        """Insert a new event.
+
+        Returns:
+            The new event id.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO events (camera, start_ts, end_ts, peak_score, boxes, thumbnail_path, clip_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (camera, start_ts, end_ts, peak_score, json.dumps(boxes), thumbnail_path, clip_path),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def update_paths(self, event_id: int, thumbnail_path: Optional[str] = None,
+                     clip_path: Optional[str] = None) -> None:
+        """Set the thumbnail and/or clip path of an event."""
+        with self._lock:
+            if thumbnail_path is not None:
+                self._conn.execute("UPDATE events SET thumbnail_path = ? WHERE id = ?", (thumbnail_path, event_id))
+            if clip_path is not None:
+                self._conn.execute("UPDATE events SET clip_path = ? WHERE id = ?", (clip_path, event_id))
+            self._conn.commit()
+
+    def update_labels(self, event_id: int, labels: Dict[str, float]) -> None:
+        """Store the object classes found in an event with their peak confidence."""
+        with self._lock:
+            self._conn.execute("UPDATE events SET labels = ? WHERE id = ?", (json.dumps(labels), event_id))
+            self._conn.commit()
+
+    def update_trajectory(self, event_id: int, trajectory: List[Tuple[float, int, int]],
+                          end_ts: Optional[float] = None) -> None:
+        """Store the tracked path of the object behind an event.
+
+        Args:
+            event_id: Event to update.
+            trajectory: (timestamp, centre x, centre y) points.
+            end_ts: Optional new event end, e.g. when the object left the frame.
+        """
+        with self._lock:
+            self._conn.execute("UPDATE events SET trajectory = ? WHERE id = ?", (json.dumps(trajectory), event_id))
+            if end_ts is not None:
+                self._conn.execute("UPDATE events SET end_ts = MAX(end_ts, ?) WHERE id = ?", (end_ts, event_id))
+            self._conn.commit()
+
+    def get_event(self, event_id: int) -> Optional[EventRecord]:
+        """Fetch a single event by id."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {COLUMNS} FROM events WHERE id = ?", (event_id,)).fetchone()
+        return self._to_record(row) if row else None
+
+    def query(self, since: float, until: Optional[float] = None, camera: Optional[str] = None,
+              limit: int = 50) -> List[EventRecord]:
+        """List events that started in a time range, newest first.
+
+        Args:
+            since: Range start as a Unix timestamp.
+            until: Range end as a Unix timestamp, defaults to now.
+            camera: Only return events from this camera.
+            limit: Maximum number of events.
+
+        Returns:
+            Matching events.
+        """
+        until = time.time() if until is None else until
+        sql = f"SELECT {COLUMNS} FROM events WHERE start_ts >= ? AND start_ts < ?"
+        params: list = [since, until]
+        if camera is not None:
+            sql += " AND camera = ?"
+            params.append(camera)
+        sql += " ORDER BY start_ts DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def count(self, since: float, until: Optional[float] = None) -> int:
+        """Count events that started in a time range."""
+        until = time.time() if until is None else until
+        with self._lock:
+            (total,) = self._conn.execute(
+                "SELECT COUNT(*) FROM events WHERE start_ts >= ? AND start_ts < ?", (since, until)
+            ).fetchone()
+        return total
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_record(row: tuple) -> EventRecord:
+        """Convert a database row into an EventRecord."""
+        event_id, camera, start_ts, end_ts, peak_score, boxes, thumbnail_path, clip_path, labels, trajectory = row
+        return EventRecord(
+            id=event_id,
+            camera=camera,
+            start_ts=start_ts,
+            end_ts=end_ts,
+            peak_score=peak_score,
+            boxes=[tuple(box) for box in json.loads(boxes)],
+            thumbnail_path=thumbnail_path,
+            clip_path=clip_path,
+            labels=json.loads(labels),
+            trajectory=[tuple(point) for point in json.loads(trajectory)],
+        )
+
+
+def parse_since(arg: Optional[str], now: Optional[float] = None) -> float:
+    """Parse an /events range argument into a start timestamp.
+
+    Args:
+        arg: 'today', or a duration like '30m', '2h' or '7d'. Defaults to 'today'.
+        now: Reference time, defaults to now.
+
+    Returns:
+        Unix timestamp of the range start.
+
+    Raises:
+        ValueError: If the argument is not understood.
+    """
+    now = time.time() if now is None else now
+    if not arg or arg.lower() == "today":
+        midnight = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        return midnight.timestamp()
+    match = re.fullmatch(r"(\d+)([mhd])", arg.lower())
+    if not match:
+        raise ValueError(f"Invalid time range: {arg}")
+    return now - int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+# Global event store instance
+_event_store: EventStore = None
+
+
+def get_event_store() -> EventStore:
+    """Get the global event store instance."""
+    global _event_store
+    if _event_store is None:
+        _event_store = EventStore(get_config().event_db_path)
+    return _event_store
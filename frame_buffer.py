@@ -0,0 +1,265 @@
+"""Memory-budgeted frame buffer for kdx-pi-cam.
+
+This module holds the pre-roll of captured frames. The buffer is bounded by
+a frame count and by a byte budget, so its RAM use does not grow with camera
+resolution. Optionally, frames older than a short raw window are compressed
+in memory by a worker thread and only decoded when a clip or photo needs
+them, which fits a much longer pre-roll in the same RAM. Frames that are
+near-duplicates of their predecessor can be stored as references to it, so
+static scenes cost almost nothing.
+"""
+
+import logging
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Iterable, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+import psutil
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MODES = ("none", "jpeg", "zlib")
+
+# Share of physical memory used when no explicit byte budget is configured
+AUTO_BUDGET_SHARE = 0.25
+
+# Size (width, height) of the grayscale thumbnail compared for deduplication
+SIGNATURE_SIZE = (64, 48)
+
+# Placeholder for a frame that repeats the previous buffered frame
+_DUPLICATE = object()
+
+
+def auto_budget_bytes() -> int:
+    """Default byte budget derived from the machine's physical memory."""
+    return int(psutil.virtual_memory().total * AUTO_BUDGET_SHARE)
+
+
+class _ColdFrame:
+    """A frame waiting for or holding its compressed form."""
+
+    __slots__ = ('frame', 'data', 'shape', 'nbytes', 'evicted')
+
+    def __init__(self, frame: np.ndarray):
+        self.frame: Optional[np.ndarray] = frame
+        self.data: Optional[bytes] = None
+        self.shape: Tuple[int, ...] = frame.shape
+        self.nbytes = frame.nbytes
+        self.evicted = False
+
+
+class FrameBuffer:
+    """Bounded buffer of captured frames with optional in-RAM compression."""
+
+    def __init__(self, max_frames: int, max_bytes: int = 0, compression: str = "none",
+                 raw_frames: int = 20, jpeg_quality: int = 90, dedup_threshold: float = 0.0):
+        """Initialize the buffer.
+
+        Args:
+            max_frames: Maximum number of frames kept.
+            max_bytes: Maximum bytes held by frames, 0 for no byte limit.
+            compression: 'none', 'jpeg' (lossy, smallest) or 'zlib' (lossless).
+            raw_frames: Newest frames kept uncompressed for detection and previews.
+            jpeg_quality: JPEG quality of compressed frames.
+            dedup_threshold: Largest grey-level change of any thumbnail cell
+                for a frame to be stored as a duplicate of the previous one,
+                0 to store every frame.
+        """
+        if compression not in COMPRESSION_MODES:
+            raise ValueError(f"Unknown buffer compression: {compression}")
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.raw_frames = max(raw_frames, 1)
+        self.jpeg_quality = jpeg_quality
+        self.dedup_threshold = dedup_threshold
+        self._signature: Optional[np.ndarray] = None
+        self._signature_shape: Optional[Tuple[int, ...]] = None
+        self._hot: Deque[np.ndarray] = deque()
+        self._cold: Deque[_ColdFrame] = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Compression worker, started on first use and again after shutdown()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __len__(self) -> int:
+        return len(self._cold) + len(self._hot)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes currently held by buffered frames."""
+        return self._bytes
+
+    def _is_duplicate(self, frame: np.ndarray) -> bool:
+        """Check a frame against the last stored frame's signature.
+
+        The signature is an area-averaged grayscale thumbnail, so sensor noise
+        averages out while any object larger than a cell still changes it.
+        Comparing with the last stored frame rather than the previous one
+        means slow drift eventually stores a new frame.
+        """
+        if self.dedup_threshold <= 0:
+            return False
+        small = cv2.resize(frame, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+        signature = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        if (self._signature is not None and self._signature_shape == frame.shape
+                and cv2.absdiff(signature, self._signature).max() <= self.dedup_threshold):
+            return True
+        self._signature = signature
+        self._signature_shape = frame.shape
+        return False
+
+    def append(self, frame: np.ndarray) -> bool:
+        """Add the newest frame, evicting the oldest ones over the limits.
+
+        Returns:
+            True if the frame was stored as a reference to its predecessor.
+        """
+        duplicate = self._is_duplicate(frame)
+        with self._lock:
+            duplicate = duplicate and len(self) > 0
+            if duplicate:
+                self._hot.append(_DUPLICATE)
+            else:
+                self._hot.append(frame)
+                self._bytes += frame.nbytes
+            if self.compression != "none" and len(self._hot) > self.raw_frames:
+                entry = self._hot.popleft()
+                if entry is _DUPLICATE:
+                    self._cold.append(entry)
+                else:
+                    entry = _ColdFrame(entry)
+                    self._cold.append(entry)
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-compress")
+                    self._executor.submit(self._compress, entry)
+            while len(self) > 1 and (
+                len(self) > self.max_frames or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                self._evict_oldest()
+        return duplicate
+
+    def extend(self, frames: Iterable[np.ndarray]) -> None:
+        """Append several frames in order."""
+        for frame in frames:
+            self.append(frame)
+
+    def _evict_oldest(self) -> None:
+        """Drop the oldest frame; the caller holds the lock.
+
+        A duplicate never becomes the oldest frame: if the next frame repeats
+        the evicted one, it takes over the evicted frame's data instead.
+        """
+        entry = (self._cold or self._hot).popleft()
+        following = self._cold or self._hot
+        if entry is _DUPLICATE:
+            return
+        if following and following[0] is _DUPLICATE:
+            if following is self._cold or isinstance(entry, np.ndarray):
+                following[0] = entry
+            else:
+                # The duplicate is the oldest raw-window slot: move the
+                # compressed entry into its place rather than decode it here
+                following.popleft()
+                self._cold.append(entry)
+            return
+        if isinstance(entry, _ColdFrame):
+            entry.evicted = True
+        self._bytes -= entry.nbytes
+
+    def _compress(self, entry: _ColdFrame) -> None:
+        """Compress a frame in the worker thread and swap it in."""
+        frame = entry.frame
+        if frame is None or entry.evicted:
+            return
+        try:
+            if self.compression == "jpeg":
+                ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if not ok:
+                    return
+                data = encoded.tobytes()
+            else:
+                data = zlib.compress(np.ascontiguousarray(frame).data, 1)
+        except Exception as e:
+            logger.error(f"Failed to compress buffered frame: {e}")
+            return
+        with self._lock:
+            if entry.evicted:
+                return
+            self._bytes += len(data) - entry.nbytes
+            entry.data = data
+            entry.nbytes = len(data)
+            entry.frame = None
+
+    def _decode(self, entry: Union[np.ndarray, _ColdFrame]) -> np.ndarray:
+        """Get the frame stored in a buffer entry."""
+        if isinstance(entry, np.ndarray):
+            return entry
+        frame, data = entry.frame, entry.data
+        if frame is not None:
+            return frame
+        if self.compression == "jpeg":
+            return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        return np.frombuffer(zlib.decompress(data), np.uint8).reshape(entry.shape)
+
+    def recent(self, count: int) -> List[np.ndarray]:
+        """Get up to count newest frames in chronological order, decoded."""
+        if count <= 0:
+            return []
+        with self._lock:
+            entries = list(self._cold) + list(self._hot)
+        start = max(len(entries) - count, 0)
+        # Start from the frame the first requested duplicate repeats
+        source = start
+        while source > 0 and entries[source] is _DUPLICATE:
+            source -= 1
+        # Decode outside the lock so capture is never blocked by a clip;
+        # duplicates expand to the same array object as their predecessor
+        frames: List[np.ndarray] = []
+        for entry in entries[source:]:
+            frames.append(frames[-1] if entry is _DUPLICATE else self._decode(entry))
+        return frames[start - source:]
+
+    def latest(self) -> Optional[np.ndarray]:
+        """Get the newest frame, or None if the buffer is empty."""
+        with self._lock:
+            for entry in reversed(self._hot):
+                if entry is not _DUPLICATE:
+                    return entry
+            if not self._cold:
+                return None
+        frames = self.recent(1)
+        return frames[-1] if frames else None
+
+    def __getitem__(self, index):
+        """Index or slice the buffer like a list of decoded frames."""
+        frames = self.recent(len(self))
+        return frames[index]
+
+    def __iter__(self):
+        return iter(self.recent(len(self)))
+
+    def clear(self) -> None:
+        """Drop all frames."""
+        with self._lock:
+            for entry in self._cold:
+                if entry is not _DUPLICATE:
+                    entry.evicted = True
+            self._cold.clear()
+            self._hot.clear()
+            self._bytes = 0
+            self._signature = None
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the compression worker; the next compressed frame starts a new one.
+
+        Args:
+            wait: Finish compressing queued frames first.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,177 @@
+"""Motion heatmap for kdx-pi-cam.
+
+This module accumulates downscaled foreground masks from the motion detector
+into a decaying float32 heatmap showing where motion happens over days. The
+heatmap is updated in place once per detection pass, saved periodically to
+the cache directory by a worker thread and rendered over a camera frame for
+the /heatmap command.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+HEATMAP_FILENAME = "heatmap.npz"
+
+
+class MotionHeatmap:
+    """Exponentially decaying map of how often each area is in motion."""
+
+    def __init__(self, width: int = 160, half_life_hours: float = 24.0, path: Optional[str] = None,
+                 save_interval: float = 300.0):
+        """Initialize the heatmap, restoring a saved one if present.
+
+        Args:
+            width: Heatmap width in cells; height follows the frame aspect ratio.
+            half_life_hours: Time after which past motion counts half as much.
+            path: File the heatmap is saved to, None to keep it in memory only.
+            save_interval: Minimum seconds between saves.
+        """
+        self.width = width
+        self.half_life = half_life_hours * 3600
+        self.path = path
+        self.save_interval = save_interval
+        self.heat: Optional[np.ndarray] = None
+        self.started_at = time.time()
+        self._small: Optional[np.ndarray] = None
+        self._last_update: Optional[float] = None
+        self._last_save = time.monotonic()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending_save: Optional[Future] = None
+        if path and os.path.exists(path):
+            self.load()
+
+    def _allocate(self, height: int, width: int) -> None:
+        """Allocate the heatmap and scratch buffer for a frame size."""
+        rows = max(int(round(height * self.width / width)), 1)
+        self.heat = np.zeros((rows, self.width), dtype=np.float32)
+        self._small = np.zeros((rows, self.width), dtype=np.uint8)
+
+    def accumulate(self, mask: np.ndarray, now: Optional[float] = None) -> None:
+        """Add a foreground mask to the heatmap.
+
+        Call once per detection pass with the pass's combined mask. Older
+        motion decays according to the time since the previous update, so
+        the result does not depend on how often passes run. No arrays are
+        allocated once the buffers exist.
+
+        Args:
+            mask: Binary uint8 mask (0/255) at frame resolution.
+            now: Update time, defaults to wall-clock time.
+        """
+        now = time.time() if now is None else now
+        if self.heat is None:
+            self._allocate(*mask.shape[:2])
+        elapsed = 0.1 if self._last_update is None else max(now - self._last_update, 0.0)
+        self._last_update = now
+
+        cv2.resize(mask, (self._small.shape[1], self._small.shape[0]), dst=self._small, interpolation=cv2.INTER_AREA)
+        alpha = 1.0 - 0.5 ** (elapsed / self.half_life)
+        cv2.accumulateWeighted(self._small, self.heat, alpha)
+        self.maybe_save()
+
+    def maybe_save(self) -> None:
+        """Save a copy of the heatmap on a worker thread if the save interval has passed.
+
+        A save still running is not queued behind; the next interval catches up.
+        """
+        if not self.path or time.monotonic() - self._last_save < self.save_interval:
+            return
+        self._last_save = time.monotonic()
+        if self.heat is None or (self._pending_save is not None and not self._pending_save.done()):
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="heatmap")
+        self._pending_save = self._executor.submit(
+            self._write, self.heat.copy(), self.started_at, self._last_update or 0.0
+        )
+
+    def save(self) -> None:
+        """Write the heatmap to its file now, after any background save; blocking."""
+        self._last_save = time.monotonic()
+        pending, self._pending_save = self._pending_save, None
+        if pending is not None:
+            pending.result()
+        if not self.path or self.heat is None:
+            return
+        self._write(self.heat, self.started_at, self._last_update or 0.0)
+
+    def _write(self, heat: np.ndarray, started_at: float, updated_at: float) -> None:
+        """Write heatmap data to the file atomically."""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp.npz"
+            np.savez(tmp_path, heat=heat, started_at=started_at, updated_at=updated_at)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to save heatmap: {e}")
+
+    def load(self) -> None:
+        """Restore the heatmap from its file."""
+        try:
+            with np.load(self.path) as data:
+                self.heat = data['heat'].astype(np.float32)
+                self.started_at = float(data['started_at'])
+                self._last_update = float(data['updated_at']) or None
+            self._small = np.zeros(self.heat.shape, dtype=np.uint8)
+        except (OSError, KeyError, ValueError) as e:
+            logger.error(f"Failed to load heatmap from {self.path}: {e}")
+
+    def normalized(self) -> Optional[np.ndarray]:
+        """Heatmap scaled to 0..1 by its maximum, or None if empty."""
+        if self.heat is None:
+            return None
+        peak = float(self.heat.max())
+        if peak <= 0:
+            return None
+        return self.heat / peak
+
+    def render(self, frame: np.ndarray, opacity: float = 0.6) -> Optional[np.ndarray]:
+        """Draw the heatmap over a frame.
+
+        Args:
+            frame: BGR frame to draw on.
+            opacity: Weight of the heatmap colours at the hottest cells.
+
+        Returns:
+            The overlaid BGR image, or None if no motion was recorded.
+        """
+        heat = self.normalized()
+        if heat is None:
+            return None
+        height, width = frame.shape[:2]
+        heat = cv2.resize(heat, (width, height), interpolation=cv2.INTER_LINEAR)
+        colors = cv2.applyColorMap((heat * 255).astype(np.uint8), cv2.COLORMAP_JET)
+        # Blend per pixel so areas without motion keep the original frame
+        weight = (heat * opacity)[..., None]
+        return (frame * (1.0 - weight) + colors * weight).astype(np.uint8)
+
+    def reset(self) -> None:
+        """Clear the heatmap."""
+        if self.heat is not None:
+            self.heat.fill(0)
+        self.started_at = time.time()
+
+
+def create_heatmap() -> Optional[MotionHeatmap]:
+    """Create the motion heatmap if enabled in configuration."""
+    config = get_config()
+    if not config.heatmap_enabled:
+        return None
+    return MotionHeatmap(
+        width=config.heatmap_width,
+        half_life_hours=config.heatmap_half_life_hours,
+        path=os.path.join(config.cache_dir, HEATMAP_FILENAME),
+        save_interval=config.heatmap_save_interval,
+    )
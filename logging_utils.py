@@ -0,0 +1,175 @@
+"""Non-blocking logging for kdx-pi-cam.
+
+This module routes log records through a queue to a listener thread that
+owns the console and file handlers, so log calls from the event loop never
+wait for the SD card. Hot-path messages, such as a warning for every failed
+frame read while the stream is down, are logged with extra=HOT_PATH; their
+identical repeats are collapsed, and a summary with the number of repeats
+is logged once per interval while they continue and once after they stop.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Pass as extra= to rate limit a message logged from a hot path
+HOT_PATH = {"rate_limited": True}
+
+# Number of distinct messages whose repeats are tracked
+MAX_TRACKED_MESSAGES = 256
+
+
+class RateLimitFilter(logging.Filter):
+    """Let a repeated hot-path message through at most once per interval.
+
+    Only records logged with extra=HOT_PATH are limited; every other record
+    passes. Messages are identified by logger, level and unformatted
+    message, so hot paths log with %-style arguments rather than f-strings.
+    Dropped repeats are reported by flush(), which the queue listener calls
+    on a timer.
+    """
+
+    def __init__(self, interval: float = 60.0):
+        """Initialize the filter.
+
+        Args:
+            interval: Seconds during which repeats of a message are dropped.
+        """
+        super().__init__()
+        self.interval = interval
+        # Key -> [time of the last message or summary let through, repeats dropped since, last dropped record]
+        self._seen: "OrderedDict[Tuple[str, int, str], list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Decide whether a record is emitted."""
+        if self.interval <= 0 or not getattr(record, "rate_limited", False):
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                entry[2] = record
+                return False
+            suppressed = entry[1] if entry else 0
+            self._seen[key] = [now, 0, None]
+            self._seen.move_to_end(key)
+            while len(self._seen) > MAX_TRACKED_MESSAGES:
+                self._seen.popitem(last=False)
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = None
+        return True
+
+    def flush(self, force: bool = False) -> List[logging.LogRecord]:
+        """Summaries of messages whose repeats were dropped.
+
+        Args:
+            force: Report every pending count, not only those whose interval
+                has passed, e.g. at shutdown.
+
+        Returns:
+            One record per message, carrying the last dropped repeat and the
+            number of repeats; they are not rate limited themselves.
+        """
+        now = time.monotonic()
+        summaries = []
+        with self._lock:
+            for key, entry in list(self._seen.items()):
+                if not force and now - entry[0] < self.interval:
+                    continue
+                if not entry[1]:
+                    del self._seen[key]  # Quiet for a whole interval
+                    continue
+                summary = logging.makeLogRecord(entry[2].__dict__)
+                summary.msg = f"{entry[2].getMessage()} ({entry[1]} similar messages in the last {self.interval:.0f}s)"
+                summary.args = None
+                summary.rate_limited = False
+                summary.created = time.time()
+                summaries.append(summary)
+                entry[:] = [now, 0, None]
+        return summaries
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    """Queue listener that also logs rate limit summaries on a timer.
+
+    stop() may be called more than once.
+    """
+
+    def __init__(self, log_queue, *handlers, queue_handler: logging.Handler,
+                 rate_filter: Optional[RateLimitFilter] = None, respect_handler_level: bool = False):
+        super().__init__(log_queue, *handlers, respect_handler_level=respect_handler_level)
+        self.queue_handler = queue_handler
+        self.rate_filter = rate_filter
+        self._flush_stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def _flush(self, force: bool = False) -> None:
+        for record in self.rate_filter.flush(force):
+            self.queue_handler.handle(record)
+
+    def _flush_loop(self) -> None:
+        while not self._flush_stop.wait(self.rate_filter.interval):
+            self._flush()
+
+    def start(self) -> None:
+        super().start()
+        if self.rate_filter is not None and self.rate_filter.interval > 0:
+            self._flush_stop.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name="log-summary", daemon=True)
+            self._flusher.start()
+
+    def stop(self) -> None:
+        if self._flusher is not None:
+            self._flush_stop.set()
+            self._flusher.join()
+            self._flusher = None
+            self._flush(force=True)
+        if self._thread is not None:
+            super().stop()
+
+
+def start_queue_logging(handlers: List[logging.Handler], level: int, fmt: str,
+                        rate_limit_seconds: float = 60.0) -> logging.handlers.QueueListener:
+    """Install a queue handler on the root logger feeding the given handlers.
+
+    Records are formatted by the calling thread and written by a listener
+    thread. The queue is unbounded, so logging never blocks the caller.
+
+    Args:
+        handlers: Handlers that write the records, e.g. console and file.
+        level: Root logger level.
+        fmt: Log line format.
+        rate_limit_seconds: Interval of RateLimitFilter and of its summaries,
+            0 to emit every repeat of hot-path messages.
+
+    Returns:
+        The running listener; it is stopped at exit, logging pending
+        summaries and flushing the queue.
+    """
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter(fmt))
+    rate_filter = RateLimitFilter(rate_limit_seconds)
+    queue_handler.addFilter(rate_filter)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = _QueueListener(
+        log_queue, *handlers, queue_handler=queue_handler, rate_filter=rate_filter, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
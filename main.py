@@ -1,6 +1,8 @@
 """Main entry point for kdx-pi-cam.
 
-This script initializes the application and runs the Telegram bot.
+This script initializes the application and runs the Telegram bot and all
+other services on a single event loop. The bot starts polling first; camera
+components and other services load afterwards.
 """
 
 import asyncio
@@ -8,11 +10,16 @@ import logging
 import logging.handlers
 import os
 import sys
-import threading
+import time
+
+# Taken before the project imports below so that they count towards startup
+STARTED_AT = time.perf_counter()
 
 from bot_handler import BotHandler
-from cache_manager import get_cache_manager
 from config import load_config
+from logging_utils import start_queue_logging
+from metrics import get_startup_timer
+from runtime import create_runtime
 
 PID_FILE = "bot.pid"
 
@@ -35,10 +42,12 @@ def setup_logging():
             handler = logging.FileHandler(config.log_file_path)
         handlers.append(handler)
 
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=handlers
+    # Handlers run on a listener thread so logging never blocks the event loop
+    start_queue_logging(
+        handlers,
+        level,
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        rate_limit_seconds=config.log_rate_limit_seconds,
     )
 
 
@@ -74,15 +83,10 @@ def remove_pid_file():
         os.remove(PID_FILE)
 
 
-def run_bot_sync(bot_handler: BotHandler):
-    """Run the bot synchronously in a thread."""
-    asyncio.set_event_loop(asyncio.new_event_loop())
-    bot_handler.setup_application()
-    bot_handler.application.run_polling()
-
-
 async def main():
     """Main application entry point."""
+    startup = get_startup_timer(STARTED_AT)
+    startup.mark('imports')
     setup_logging()
     logger = logging.getLogger(__name__)
 
@@ -97,35 +101,27 @@ async def main():
     try:
         # Load configuration
         config = load_config()
+        startup.mark('config')
         logger.info(f"Configuration loaded successfully. Process PID: {os.getpid()}")
         logger.info(f"Starting bot instance with token ending in ...{config.bot_token[-10:]}")
 
-        # Initialize cache manager
-        cache_manager = get_cache_manager()
-        await cache_manager.start_cleanup()
-        logger.info("Cache manager started")
-
-        # Initialize bot handler
-        bot_handler = BotHandler()
-
-        # Run the bot in a thread
-        logger.info("Starting Telegram bot...")
-        bot_thread = threading.Thread(target=run_bot_sync, args=(bot_handler,))
-        bot_thread.start()
-
-        # Keep running
-        await asyncio.sleep(float('inf'))
+        # Everything runs on this loop until SIGINT/SIGTERM, then stops in order
+        await create_runtime(BotHandler()).run()
 
     except Exception as e:
         logger.error(f"Application error: {e}")
-        await cache_manager.stop_cleanup()
         sys.exit(1)
-    except KeyboardInterrupt:
-        logger.info("Received keyboard interrupt, shutting down...")
     finally:
-        await cache_manager.stop_cleanup()
         remove_pid_file()
 
 
+def run():
+    """Console script entry point."""
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass  # Signal handlers stop the runtime; this covers Ctrl+C during startup
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run()
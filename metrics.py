@@ -0,0 +1,322 @@
+"""Runtime metrics for kdx-pi-cam.
+
+This module collects counters, gauges and per-stage latency histograms and
+exports them in Prometheus text format over a small local HTTP endpoint. It
+also records startup milestones.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "kdx"
+
+# Latency buckets in seconds, from a fast frame read up to a slow upload
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets and a +Inf overflow bucket."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """Initialize the histogram.
+
+        Args:
+            buckets: Sorted upper bounds of the buckets in seconds.
+        """
+        self.buckets = buckets
+        self.counts: List[int] = [0] * len(buckets)
+        self.overflow = 0  # Observations above the last bound (the +Inf bucket)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a single observation."""
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.overflow += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile from the bucket counts.
+
+        Args:
+            q: Quantile between 0.0 and 1.0.
+
+        Returns:
+            Upper bound of the bucket holding the quantile, the largest
+            observed value if it falls in the overflow bucket, or 0.0 if empty.
+        """
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        """Average observed value."""
+        return self.sum / self.count if self.count else 0.0
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and stage histograms."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1.0) -> None:
+        """Increment a counter.
+
+        Args:
+            name: Counter name without prefix, e.g. 'frames_captured_total'.
+            value: Amount to add.
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0.0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to the given value."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record the latency of a pipeline stage.
+
+        Args:
+            stage: Stage name, e.g. 'detection' or 'clip_encode'.
+            seconds: Elapsed time in seconds.
+        """
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Time a block of code and record it under the given stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def get_counter(self, name: str) -> float:
+        """Get the current value of a counter."""
+        with self._lock:
+            return self.counters.get(name, 0.0)
+
+    def get_gauge(self, name: str) -> Optional[float]:
+        """Get the current value of a gauge, or None if never set."""
+        with self._lock:
+            return self.gauges.get(name)
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self.counters):
+                metric = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {self.counters[name]:g}")
+            for name in sorted(self.gauges):
+                metric = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {self.gauges[name]:g}")
+
+            metric = f"{METRIC_PREFIX}_stage_duration_seconds"
+            if self.histograms:
+                lines.append(f"# TYPE {metric} histogram")
+            for stage in sorted(self.histograms):
+                histogram = self.histograms[stage]
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {cumulative + histogram.overflow}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.sum:g}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+
+            metric = f"{METRIC_PREFIX}_uptime_seconds"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {time.time() - self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Build a short human-readable summary for the /stats command."""
+        with self._lock:
+            uptime = int(time.time() - self.started_at)
+            text = f"Uptime: {uptime // 3600}h {uptime % 3600 // 60}m\n"
+            text += f"Frames captured: {int(self.counters.get('frames_captured_total', 0))}\n"
+            text += f"Frames dropped: {int(self.counters.get('frames_dropped_total', 0))}\n"
+            text += f"Frames deduplicated: {int(self.counters.get('frames_deduplicated_total', 0))}\n"
+            text += f"Reconnects: {int(self.counters.get('reconnects_total', 0))}\n"
+            text += f"Effective FPS: {self.gauges.get('capture_fps', 0.0):.1f}\n"
+            text += f"Buffer memory: {self.gauges.get('buffer_bytes', 0.0) / (1024 * 1024):.1f} MB\n"
+            text += f"Motion events: {int(self.counters.get('motion_events_total', 0))}\n"
+            text += f"Lighting changes suppressed: {int(self.counters.get('illumination_suppressed_total', 0))}"
+            for stage in sorted(self.histograms):
+                histogram = self.histograms[stage]
+                text += (
+                    f"\n{stage}: n={histogram.count} avg={histogram.mean * 1000:.1f}ms "
+                    f"p95<={histogram.quantile(0.95) * 1000:g}ms"
+                )
+                if histogram.overflow:
+                    text += f" ({histogram.overflow} over {histogram.buckets[-1]:g}s)"
+        return text
+
+    def reset(self) -> None:
+        """Clear all collected metrics."""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started_at = time.time()
+
+
+class StartupTimer:
+    """Records how long after process start each startup milestone was reached."""
+
+    def __init__(self, started_at: Optional[float] = None):
+        """Initialize the timer.
+
+        Args:
+            started_at: time.perf_counter() value at process start, defaults to now.
+        """
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.milestones: Dict[str, float] = {}
+
+    def mark(self, milestone: str) -> float:
+        """Record a milestone and export it as the startup_<milestone>_seconds gauge.
+
+        Returns:
+            Seconds since process start.
+        """
+        elapsed = time.perf_counter() - self.started_at
+        self.milestones[milestone] = elapsed
+        get_metrics().set_gauge(f'startup_{milestone}_seconds', elapsed)
+        return elapsed
+
+    def summary(self) -> str:
+        """Milestones in the order reached, e.g. 'config 0.21s, polling 0.64s'."""
+        return ", ".join(
+            f"{name} {elapsed:.2f}s" for name, elapsed in sorted(self.milestones.items(), key=lambda item: item[1])
+        )
+
+
+class MetricsServer:
+    """Minimal HTTP server exposing the registry at /metrics."""
+
+    def __init__(self, registry: "MetricsRegistry", host: str, port: int):
+        """Initialize the metrics server.
+
+        Args:
+            registry: Registry to export.
+            host: Interface to bind to.
+            port: TCP port to listen on.
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        """Start listening for scrape requests."""
+        if self.server:
+            return
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve a single HTTP request."""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Drain headers
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else ""
+            if path.split("?")[0] == "/metrics":
+                body = self.registry.render_prometheus().encode()
+                status = "200 OK"
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                body = b"Not Found\n"
+                status = "404 Not Found"
+                content_type = "text/plain; charset=utf-8"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+
+# Global metrics registry instance
+_metrics: MetricsRegistry = None
+_startup_timer: Optional[StartupTimer] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get the global metrics registry instance."""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
+
+
+def get_startup_timer(started_at: Optional[float] = None) -> StartupTimer:
+    """Get the global startup timer, created with started_at on first call."""
+    global _startup_timer
+    if _startup_timer is None:
+        _startup_timer = StartupTimer(started_at)
+    return _startup_timer
+
+
+def create_metrics_server() -> Optional[MetricsServer]:
+    """Create the metrics server if enabled in configuration.
+
+    Returns:
+        The server, or None if the endpoint is disabled.
+    """
+    config = get_config()
+    if not config.metrics_enabled:
+        return None
+    return MetricsServer(get_metrics(), config.metrics_host, config.metrics_port)
@@ -8,18 +8,32 @@ import asyncio
 import logging
 import tempfile
 import time
+from dataclasses import dataclass, field
 from typing import List, Optional, Tuple
 
 import cv2
 import numpy as np
-from PIL import Image
 
-from config import get_config
+from config import AppConfig, get_config
 from cache_manager import get_cache_manager
+from encoder import frame_step, get_encoder_profile, output_size
+from heatmap import create_heatmap
+from metrics import get_metrics
+from tracker import CentroidTracker, Track
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class MotionResult:
+    """Outcome of comparing two frames."""
+
+    detected: bool = False
+    score: float = 0.0
+    boxes: List[Tuple[int, int, int, int]] = field(default_factory=list)
+    suppressed: bool = False  # Rejected as a global lighting change
+
+
 class MotionDetector:
     """Detects motion in video frames."""
 
@@ -31,44 +45,166 @@ class MotionDetector:
         self.cooldown = config.notification_cooldown_seconds
         self.sensitivity = config.motion_sensitivity
         self.last_detection = 0.0
+        self.last_result = MotionResult()
+        self.last_frame: Optional[np.ndarray] = None
+        self.sheet_frames = config.contact_sheet_frames
+        self.sheet_columns = config.contact_sheet_columns
+        self.sheet_tile_width = config.contact_sheet_tile_width
+        self.encoder_profile = get_encoder_profile(config.video_quality)
+        self.tracker: Optional[CentroidTracker] = None
+        if config.tracking_enabled:
+            self.tracker = CentroidTracker(
+                min_hits=config.tracking_min_hits,
+                max_misses=config.tracking_max_misses,
+                iou_threshold=config.tracking_iou_threshold,
+                max_distance=config.tracking_max_distance,
+            )
+        self.illumination_compensation = config.motion_illumination_compensation
+        self.global_change_ratio = config.motion_global_change_ratio
+        self.heatmap = create_heatmap()
+        # Foreground masks of the current detection pass, OR-ed into one heatmap update
+        self._heat_mask: Optional[np.ndarray] = None
+        self._heat_pending = False
+        self.last_tracks: List[Track] = []
+        self._prev_frame: Optional[np.ndarray] = None
 
-    def detect(self, frame1: np.ndarray, frame2: np.ndarray) -> bool:
-        """Detect motion between two frames.
+    def apply_config(self, config: AppConfig) -> None:
+        """Apply live-tunable detection settings without losing detector state."""
+        self.threshold = config.motion_threshold
+        self.min_area = config.motion_min_area
+        self.cooldown = config.notification_cooldown_seconds
+        self.sensitivity = config.motion_sensitivity
+        self.illumination_compensation = config.motion_illumination_compensation
+        self.global_change_ratio = config.motion_global_change_ratio
+        if self.tracker is not None:
+            self.tracker.min_hits = config.tracking_min_hits
+            self.tracker.max_misses = config.tracking_max_misses
+            self.tracker.iou_threshold = config.tracking_iou_threshold
+            self.tracker.max_distance = config.tracking_max_distance
+
+    @staticmethod
+    def match_illumination(gray: np.ndarray, reference: np.ndarray) -> np.ndarray:
+        """Map a grayscale frame onto the brightness and contrast of another.
+
+        The global shift is modelled as a linear gain and offset estimated
+        from the mean and standard deviation of both frames, and applied in
+        a single saturating pass.
+
+        Args:
+            gray: Grayscale frame to correct.
+            reference: Grayscale frame whose lighting is matched.
+
+        Returns:
+            The corrected frame.
+        """
+        mean, std = cv2.meanStdDev(gray)
+        ref_mean, ref_std = cv2.meanStdDev(reference)
+        gain = float(ref_std[0, 0] / std[0, 0]) if std[0, 0] > 1.0 else 1.0
+        offset = float(ref_mean[0, 0] - mean[0, 0] * gain)
+        return cv2.convertScaleAbs(gray, alpha=gain, beta=offset)
+
+    def analyze(self, frame1: np.ndarray, frame2: np.ndarray) -> MotionResult:
+        """Compare two frames and describe the motion between them.
+
+        With illumination compensation, global brightness and contrast
+        shifts are normalised out first, and pairs that still change more
+        than global_change_ratio of the frame are rejected as lighting
+        changes.
 
         Args:
             frame1: First frame.
             frame2: Second frame.
 
         Returns:
-            True if motion detected, False otherwise.
+            MotionResult with the changed-pixel ratio as score and the
+            bounding boxes (x, y, w, h) of contours larger than min_area.
         """
         if frame1 is None or frame2 is None or frame1.shape != frame2.shape:
-            return False
+            return MotionResult()
 
         # Convert to grayscale
         gray1 = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY)
         gray2 = cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY)
 
+        raw_score = 0.0
+        if self.illumination_compensation:
+            _, raw = cv2.threshold(cv2.absdiff(gray1, gray2), self.threshold, 255, cv2.THRESH_BINARY)
+            raw_score = cv2.countNonZero(raw) / raw.size
+            gray1 = self.match_illumination(gray1, gray2)
+
         # Compute absolute difference
         diff = cv2.absdiff(gray1, gray2)
 
         # Apply threshold
         _, thresh = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        score = cv2.countNonZero(thresh) / thresh.size
+
+        if self.illumination_compensation and score >= self.global_change_ratio:
+            # Most of the frame changed even after normalisation: a lighting switch, not an object
+            return MotionResult(score=score, suppressed=True)
+
+        if self.heatmap is not None:
+            self._merge_heat(thresh)
 
         # Find contours
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-        # Check for significant motion
-        for contour in contours:
-            if cv2.contourArea(contour) > self.min_area:
-                return True
-        return False
+        # Keep significant motion
+        boxes = [
+            tuple(int(v) for v in cv2.boundingRect(contour))
+            for contour in contours
+            if cv2.contourArea(contour) > self.min_area
+        ]
+        # A global change that normalisation removed entirely counts as suppressed too
+        suppressed = not boxes and raw_score >= self.global_change_ratio
+        return MotionResult(detected=bool(boxes), score=score, boxes=boxes, suppressed=suppressed)
+
+    def _merge_heat(self, mask: np.ndarray) -> None:
+        """Combine a foreground mask into the current pass's heatmap mask."""
+        if not self._heat_pending:
+            if self._heat_mask is None or self._heat_mask.shape != mask.shape:
+                self._heat_mask = mask.copy()
+            else:
+                np.copyto(self._heat_mask, mask)
+            self._heat_pending = True
+        elif self._heat_mask.shape == mask.shape:
+            cv2.bitwise_or(self._heat_mask, mask, dst=self._heat_mask)
+
+    def _flush_heat(self, now: Optional[float] = None) -> None:
+        """Add the pass's combined mask to the heatmap, once per detection pass.
 
-    def detect_in_buffer(self, frames: List[np.ndarray]) -> bool:
+        Weighting each frame pair by the time since the previous update would
+        give every pair after the first a weight of almost zero, because a
+        pass analyses its pairs back to back.
+        """
+        if self._heat_pending:
+            self._heat_pending = False
+            self.heatmap.accumulate(self._heat_mask, now)
+
+    def detect(self, frame1: np.ndarray, frame2: np.ndarray) -> bool:
+        """Detect motion between two frames.
+
+        Args:
+            frame1: First frame.
+            frame2: Second frame.
+
+        Returns:
+            True if motion detected, False otherwise.
+        """
+        result = self.analyze(frame1, frame2)
+        self._flush_heat()
+        return result.detected
+
+    def detect_in_buffer(self, frames: List[np.ndarray], now: Optional[float] = None) -> bool:
         """Detect motion in a buffer of frames.
 
+        When motion is found, last_result holds the peak-score frame pair of
+        the window for event recording and last_frame the newer frame of it.
+
         Args:
             frames: List of frames.
+            now: Timestamp used for the cooldown check. Defaults to wall-clock
+                time; offline replay passes the video timestamp instead.
 
         Returns:
             True if motion detected, False otherwise.
@@ -77,42 +213,223 @@ class MotionDetector:
             return False
 
         # Check cooldown
-        current_time = time.time()
+        current_time = time.time() if now is None else now
         if current_time - self.last_detection < self.cooldown:
             return False
 
         # Detect motion between consecutive frames
-        for i in range(1, len(frames)):
-            if self.detect(frames[i-1], frames[i]):
-                self.last_detection = current_time
-                return True
-        return False
+        metrics = get_metrics()
+        peak: Optional[MotionResult] = None
+        peak_index = 0
+        suppressed = False
+        with metrics.timer('detection'):
+            for i in range(1, len(frames)):
+                if frames[i] is frames[i-1]:
+                    # Deduplicated frame, identical to its predecessor
+                    continue
+                result = self.analyze(frames[i-1], frames[i])
+                suppressed = suppressed or result.suppressed
+                if result.detected and (peak is None or result.score > peak.score):
+                    peak = result
+                    peak_index = i
+        self._flush_heat(current_time)
+        if peak is None:
+            if suppressed:
+                metrics.inc('illumination_suppressed_total')
+            return False
+
+        self.last_detection = current_time
+        self.last_result = peak
+        self.last_frame = frames[peak_index]
+        self.last_tracks = []
+        metrics.inc('motion_events_total')
+        return True
+
+    def process_frames(self, frames: List[np.ndarray], now: Optional[float] = None, fps: float = 10.0) -> bool:
+        """Track motion over newly captured frames.
+
+        Unlike detect_in_buffer, every frame must be passed exactly once, in
+        order; the last frame is kept to diff against the next call. Motion
+        boxes feed the tracker and an event fires when a track has persisted
+        for min_hits frames, so each object causes one event.
 
-    async def generate_photo(self, frame: np.ndarray) -> Optional[str]:
-        """Generate a photo from a frame.
+        Args:
+            frames: Frames captured since the previous call.
+            now: Time of the last frame. Defaults to wall-clock time; offline
+                replay passes the video timestamp instead.
+            fps: Capture rate, used to timestamp earlier frames.
+
+        Returns:
+            True if a track was confirmed outside the cooldown. last_result,
+            last_frame and last_tracks then describe the event.
+        """
+        if self.tracker is None:
+            raise RuntimeError("Tracking is disabled")
+        if not frames:
+            return False
+        current_time = time.time() if now is None else now
+        metrics = get_metrics()
+        if self._prev_frame is not None:
+            frames = [self._prev_frame] + list(frames)
+        self._prev_frame = frames[-1]
+
+        confirmed: List[Track] = []
+        peak: Optional[MotionResult] = None
+        peak_frame: Optional[np.ndarray] = None
+        suppressed = False
+        with metrics.timer('detection'):
+            for i in range(1, len(frames)):
+                timestamp = current_time - (len(frames) - 1 - i) / fps
+                if frames[i] is frames[i-1]:
+                    # A deduplicated frame has no motion, but tracks still age
+                    result = MotionResult()
+                else:
+                    result = self.analyze(frames[i-1], frames[i])
+                suppressed = suppressed or result.suppressed
+                new_tracks = self.tracker.update(result.boxes, timestamp)
+                if new_tracks:
+                    confirmed.extend(new_tracks)
+                    if peak is None or result.score > peak.score:
+                        peak, peak_frame = result, frames[i]
+        self._flush_heat(current_time)
+        if not confirmed:
+            if suppressed:
+                metrics.inc('illumination_suppressed_total')
+            return False
+
+        metrics.inc('tracks_confirmed_total', len(confirmed))
+        if current_time - self.last_detection < self.cooldown:
+            return False
+        self.last_detection = current_time
+        self.last_result = peak
+        self.last_frame = peak_frame
+        self.last_tracks = confirmed
+        metrics.inc('motion_events_total')
+        return True
+
+    def reset_tracking(self) -> None:
+        """Drop tracks and the previous frame, e.g. when monitoring restarts."""
+        if self.tracker is not None:
+            self.tracker.reset()
+        self._prev_frame = None
+
+    def frame_scores(self, frames: List[np.ndarray], width: int = 160) -> np.ndarray:
+        """Score every frame by how much it changed from its predecessor.
+
+        Frames are downscaled to grayscale and differenced in one vectorised
+        pass, so scoring a whole event window costs about one detect() call.
 
         Args:
-            frame: The frame to save as photo.
+            frames: List of frames with equal shape.
+            width: Width the frames are downscaled to before differencing.
 
         Returns:
-            Path to the photo file, or None if failed.
+            Array of changed-pixel ratios, one per frame (the first is 0).
+        """
+        if len(frames) < 2:
+            return np.zeros(len(frames), dtype=np.float32)
+        height = max(int(frames[0].shape[0] * width / frames[0].shape[1]), 1)
+        small = np.stack([
+            cv2.cvtColor(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            for frame in frames
+        ]).astype(np.int16)
+        changed = np.abs(np.diff(small, axis=0)) > self.threshold
+        scores = np.zeros(len(frames), dtype=np.float32)
+        scores[1:] = changed.mean(axis=(1, 2))
+        return scores
+
+    def build_contact_sheet(self, frames: List[np.ndarray], count: Optional[int] = None,
+                            columns: Optional[int] = None, tile_width: Optional[int] = None) -> Optional[np.ndarray]:
+        """Tile the peak-motion frames of an event into a single image.
+
+        Args:
+            frames: Event frames in chronological order.
+            count: Number of frames to include, defaults to CONTACT_SHEET_FRAMES.
+            columns: Grid columns, defaults to CONTACT_SHEET_COLUMNS.
+            tile_width: Width of each tile, defaults to CONTACT_SHEET_TILE_WIDTH.
+
+        Returns:
+            The contact sheet as a BGR image, or None if there are no frames.
+        """
+        if not frames:
+            return None
+        count = min(count or self.sheet_frames, len(frames))
+        columns = min(columns or self.sheet_columns, count)
+        tile_width = tile_width or self.sheet_tile_width
+
+        # Highest-scoring frames, shown in chronological order
+        scores = self.frame_scores(frames)
+        picked = np.sort(np.argsort(scores, kind='stable')[::-1][:count])
+
+        tile_height = max(int(frames[0].shape[0] * tile_width / frames[0].shape[1]), 1)
+        rows = -(-count // columns)
+        tiles = np.zeros((rows * columns, tile_height, tile_width, 3), dtype=np.uint8)
+        for slot, index in enumerate(picked):
+            cv2.resize(frames[index], (tile_width, tile_height), dst=tiles[slot], interpolation=cv2.INTER_AREA)
+
+        # (rows*cols, h, w, 3) -> (rows*h, cols*w, 3) without per-tile copies
+        return (
+            tiles.reshape(rows, columns, tile_height, tile_width, 3)
+            .transpose(0, 2, 1, 3, 4)
+            .reshape(rows * tile_height, columns * tile_width, 3)
+        )
+
+    def encode_contact_sheet(self, frames: List[np.ndarray], quality: int = 80) -> Optional[bytes]:
+        """Build a contact sheet and encode it as JPEG; CPU-bound, run in a worker thread.
+
+        Args:
+            frames: Event frames in chronological order.
+            quality: JPEG quality.
+
+        Returns:
+            The JPEG bytes, or None if there are no frames.
+
+        Raises:
+            ValueError: If encoding fails.
+        """
+        sheet = self.build_contact_sheet(frames)
+        if sheet is None:
+            return None
+        ok, encoded = cv2.imencode('.jpg', sheet, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return encoded.tobytes()
+
+    async def generate_contact_sheet(self, frames: List[np.ndarray], quality: int = 80) -> Optional[str]:
+        """Build a contact sheet for an event and encode it once as JPEG.
+
+        Building and encoding run in the default executor, off the event loop.
+
+        Args:
+            frames: Event frames in chronological order.
+            quality: JPEG quality.
+
+        Returns:
+            Path to the JPEG file, or None if failed.
         """
         try:
+            with get_metrics().timer('sheet_encode'):
+                data = await asyncio.get_event_loop().run_in_executor(
+                    None, self.encode_contact_sheet, frames, quality,
+                )
+            if data is None:
+                return None
             cache_manager = get_cache_manager()
-            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
             with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False, dir=cache_manager.cache_dir) as tmp_file:
-                img.save(tmp_file.name)
+                tmp_file.write(data)
                 return tmp_file.name
         except Exception as e:
-            logger.error(f"Failed to generate photo: {e}")
+            logger.error(f"Failed to generate contact sheet: {e}")
             return None
 
     async def generate_clip(self, frames: List[np.ndarray], fps: int = 10) -> Optional[str]:
         """Generate a video clip from frames using OpenCV.
 
+        Frame rate and resolution follow the VIDEO_QUALITY encoder profile.
+
         Args:
             frames: List of frames.
-            fps: Frames per second.
+            fps: Frame rate the frames were captured at.
 
         Returns:
             Path to the clip file, or None if failed.
@@ -122,18 +439,23 @@ class MotionDetector:
 
         try:
             cache_manager = get_cache_manager()
+            frames = frames[::frame_step(fps, self.encoder_profile)]
             height, width = frames[0].shape[:2]
+            out_size = output_size(width, height, self.encoder_profile)
             with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False, dir=cache_manager.cache_dir) as tmp_file:
                 output_path = tmp_file.name
 
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+            with get_metrics().timer('clip_encode'):
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                out = cv2.VideoWriter(output_path, fourcc, self.encoder_profile.fps, out_size)
 
-            for frame in frames:
-                out.write(frame)
-            out.release()
+                for frame in frames:
+                    if out_size != (width, height):
+                        frame = cv2.resize(frame, out_size, interpolation=cv2.INTER_AREA)
+                    out.write(frame)
+                out.release()
 
             return output_path
         except Exception as e:
             logger.error(f"Failed to generate clip: {e}")
-            return None
\ No newline at end of file
+            return None
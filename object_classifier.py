@@ -0,0 +1,262 @@
+"""Object classification of motion candidates for kdx-pi-cam.
+
+This module runs a CPU-only detector on the motion boxes of an event to
+decide whether it is worth a notification. Two backends are supported: the
+OpenCV HOG person detector, which needs no model files, and an OpenCV DNN
+SSD-style model (e.g. MobileNet-SSD) loaded from local files.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from config import get_config
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]
+
+# Context added around each motion box so partly moving objects are seen whole
+CROP_PADDING = 0.25
+
+# Crops are downscaled so their longest side is at most this many pixels
+MAX_CROP_SIDE = 480
+
+# HOG people detector window
+HOG_WINDOW = (64, 128)
+
+# MobileNet-SSD style input preprocessing
+DNN_INPUT_SIZE = (300, 300)
+DNN_SCALE = 1 / 127.5
+DNN_MEAN = 127.5
+
+# Events whose classification is remembered
+EVENT_CACHE_SIZE = 256
+
+
+@dataclass
+class Detection:
+    """An object found in a frame."""
+
+    label: str
+    confidence: float
+    box: Box
+
+
+def crop_box(frame: np.ndarray, box: Box, padding: float = CROP_PADDING) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Crop a padded motion box out of a frame.
+
+    Args:
+        frame: BGR frame.
+        box: Motion box (x, y, w, h).
+        padding: Fraction of the box size added on each side.
+
+    Returns:
+        Tuple of the crop and the (x, y) offset of the crop in the frame.
+    """
+    x, y, w, h = box
+    pad_x, pad_y = int(w * padding), int(h * padding)
+    x0, y0 = max(x - pad_x, 0), max(y - pad_y, 0)
+    x1, y1 = min(x + w + pad_x, frame.shape[1]), min(y + h + pad_y, frame.shape[0])
+    return frame[y0:y1, x0:x1], (x0, y0)
+
+
+class ObjectClassifier:
+    """Classifies motion boxes with a CPU detector in a worker pool."""
+
+    def __init__(self, backend: str = "hog", classes: Sequence[str] = ("person",), confidence: float = 0.5,
+                 workers: int = 1, model_path: str = "", config_path: str = "", labels_path: str = ""):
+        """Initialize the classifier.
+
+        Args:
+            backend: 'hog' or 'dnn'.
+            classes: Labels that make an event worth notifying.
+            confidence: Minimum detection confidence.
+            workers: Worker threads running the detector.
+            model_path: DNN model weights (dnn backend).
+            config_path: Optional DNN model configuration (dnn backend).
+            labels_path: Text file with one DNN class label per line.
+        """
+        self.backend = backend.lower()
+        if self.backend not in ("hog", "dnn"):
+            raise ValueError(f"Unknown classifier backend: {backend}")
+        if self.backend == "dnn" and not model_path:
+            raise ValueError("The dnn classifier backend needs CLASSIFIER_MODEL_PATH")
+        if self.backend == "hog" and not hasattr(cv2, 'HOGDescriptor'):
+            # OpenCV 5 moved the HOG detector out of the main package
+            raise ValueError("This OpenCV build has no HOG person detector, use the dnn backend")
+        self.classes = {name.strip().lower() for name in classes if name.strip()}
+        self.confidence = confidence
+        self.model_path = model_path
+        self.config_path = config_path
+        self.labels = self._load_labels(labels_path)
+        self.executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="classifier")
+        # OpenCV detectors are not safe to share between threads
+        self._local = threading.local()
+        self._events: "OrderedDict[int, List[Detection]]" = OrderedDict()
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    @staticmethod
+    def _load_labels(labels_path: str) -> List[str]:
+        """Read DNN class labels, one per line."""
+        if not labels_path:
+            return []
+        with open(labels_path, 'r') as f:
+            return [line.strip().lower() for line in f if line.strip()]
+
+    def _detector(self):
+        """Get the detector of the current worker thread, creating it on first use."""
+        detector = getattr(self._local, 'detector', None)
+        if detector is None:
+            if self.backend == "hog":
+                detector = cv2.HOGDescriptor()
+                detector.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+            else:
+                detector = cv2.dnn.readNet(self.model_path, self.config_path)
+            self._local.detector = detector
+        return detector
+
+    def _label(self, class_id: int) -> str:
+        """Map a DNN class id to its label."""
+        if 0 <= class_id < len(self.labels):
+            return self.labels[class_id]
+        return str(class_id)
+
+    def classify_crop(self, frame: np.ndarray, box: Box) -> List[Detection]:
+        """Run the detector on one motion box.
+
+        Args:
+            frame: BGR frame.
+            box: Motion box (x, y, w, h).
+
+        Returns:
+            Detections above the confidence threshold, in frame coordinates.
+        """
+        crop, (off_x, off_y) = crop_box(frame, box)
+        if crop.size == 0:
+            return []
+
+        # Bound the work per crop; HOG also needs at least one full window
+        scale = min(MAX_CROP_SIDE / max(crop.shape[:2]), 1.0)
+        if self.backend == "hog":
+            scale = max(scale, HOG_WINDOW[0] / crop.shape[1], HOG_WINDOW[1] / crop.shape[0])
+        if scale != 1.0:
+            crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        def to_frame(x: float, y: float, w: float, h: float) -> Box:
+            return (int(off_x + x / scale), int(off_y + y / scale), int(w / scale), int(h / scale))
+
+        detections = []
+        if self.backend == "hog":
+            rects, weights = self._detector().detectMultiScale(crop, winStride=(8, 8), padding=(8, 8), scale=1.05)
+            for rect, weight in zip(rects, np.ravel(weights)):
+                if weight >= self.confidence:
+                    detections.append(Detection("person", float(weight), to_frame(*rect)))
+        else:
+            net = self._detector()
+            net.setInput(cv2.dnn.blobFromImage(crop, DNN_SCALE, DNN_INPUT_SIZE, DNN_MEAN))
+            height, width = crop.shape[:2]
+            # SSD output rows: [image_id, class_id, confidence, x1, y1, x2, y2] with relative coordinates
+            for row in net.forward().reshape(-1, 7):
+                if row[2] < self.confidence:
+                    continue
+                x1, y1, x2, y2 = row[3] * width, row[4] * height, row[5] * width, row[6] * height
+                detections.append(Detection(self._label(int(row[1])), float(row[2]), to_frame(x1, y1, x2 - x1, y2 - y1)))
+        return detections
+
+    def classify(self, frame: np.ndarray, boxes: Sequence[Box]) -> List[Detection]:
+        """Classify all motion boxes of a frame across the worker pool, blocking until done."""
+        with get_metrics().timer('classification'):
+            futures = [self.executor.submit(self.classify_crop, frame, box) for box in boxes]
+            return [detection for future in futures for detection in future.result()]
+
+    async def classify_event(self, event_id: int, frame: Optional[np.ndarray], boxes: Sequence[Box]) -> List[Detection]:
+        """Classify an event's peak frame once and remember the result.
+
+        Concurrent and repeated calls for the same event reuse the first
+        classification.
+
+        Args:
+            event_id: Event the frame belongs to.
+            frame: Peak-motion frame of the event.
+            boxes: Motion boxes in that frame.
+
+        Returns:
+            Detections above the confidence threshold.
+        """
+        cached = self._events.get(event_id)
+        if cached is not None:
+            self._events.move_to_end(event_id)
+            return cached
+        pending = self._pending.get(event_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        if frame is None or not boxes:
+            return []
+
+        future = asyncio.get_event_loop().create_future()
+        self._pending[event_id] = future
+        try:
+            detections = await asyncio.get_event_loop().run_in_executor(None, self.classify, frame, boxes)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure without waiters is not reported as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._pending[event_id]
+
+        future.set_result(detections)
+        self._events[event_id] = detections
+        while len(self._events) > EVENT_CACHE_SIZE:
+            self._events.popitem(last=False)
+        get_metrics().inc('objects_detected_total', len(detections))
+        return detections
+
+    def matches(self, detections: Sequence[Detection]) -> bool:
+        """Whether any detection is of a configured class."""
+        return any(detection.label in self.classes for detection in detections)
+
+    def shutdown(self) -> None:
+        """Stop the worker pool."""
+        self.executor.shutdown(wait=False)
+
+
+def summarize_labels(detections: Sequence[Detection]) -> Dict[str, float]:
+    """Reduce detections to the highest confidence per label."""
+    labels: Dict[str, float] = {}
+    for detection in detections:
+        labels[detection.label] = max(labels.get(detection.label, 0.0), round(detection.confidence, 3))
+    return labels
+
+
+def create_object_classifier() -> Optional[ObjectClassifier]:
+    """Create the object classifier if enabled in configuration.
+
+    Returns:
+        The classifier, or None if classification is disabled or cannot be loaded.
+    """
+    config = get_config()
+    if not config.classifier_enabled:
+        return None
+    try:
+        return ObjectClassifier(
+            backend=config.classifier_backend,
+            classes=config.classifier_classes.split(','),
+            confidence=config.classifier_confidence,
+            workers=config.classifier_workers,
+            model_path=config.classifier_model_path,
+            config_path=config.classifier_config_path,
+            labels_path=config.classifier_labels_path,
+        )
+    except (ValueError, OSError) as e:
+        logger.error(f"Object classification disabled: {e}")
+        return None
@@ -0,0 +1,197 @@
+"""Local live preview server for kdx-pi-cam.
+
+This module serves an MJPEG stream built from frames already captured by
+VideoProcessor. Each frame is JPEG-encoded at most once by a single producer
+and the bytes are fanned out to every viewer, so viewers never open another
+RTSP session and add almost no CPU.
+"""
+
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+from config import get_config
+from logging_utils import HOT_PATH
+from metrics import get_metrics
+from snapshot_cache import get_snapshot_cache
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = "kdxframe"
+
+INDEX_HTML = b"""<!doctype html>
+<html><head><title>kdx-pi-cam</title></head>
+<body style="margin:0;background:#000"><img src="/mjpeg" style="width:100%"></body></html>
+"""
+
+
+class PreviewServer:
+    """HTTP server streaming the capture buffer as MJPEG."""
+
+    def __init__(self, video_processor, host: str, port: int, fps: float = 5.0,
+                 width: int = 640, quality: int = 70):
+        """Initialize the preview server.
+
+        Args:
+            video_processor: Source of captured frames.
+            host: Interface to bind to.
+            port: TCP port to listen on.
+            fps: Maximum frames per second sent to viewers.
+            width: Width preview frames are downscaled to.
+            quality: JPEG quality of preview frames.
+        """
+        self.video_processor = video_processor
+        self.host = host
+        self.port = port
+        self.interval = 1.0 / fps
+        self.width = width
+        self.quality = quality
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.viewers = 0
+        self._latest: Optional[Tuple[int, bytes]] = None
+        self._new_frame = asyncio.Condition()
+        self._producer: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def start(self) -> None:
+        """Start listening for viewers."""
+        if self.server:
+            return
+        self._closing = False
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Live preview listening on http://{self.host}:{self.port}/")
+
+    async def stop(self) -> None:
+        """Stop the server, the frame producer and all viewer streams."""
+        self._closing = True
+        async with self._new_frame:
+            self._new_frame.notify_all()
+        if self._producer:
+            self._producer.cancel()
+            try:
+                await self._producer
+            except asyncio.CancelledError:
+                pass
+            self._producer = None
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _encode_latest(self) -> Optional[Tuple[int, bytes]]:
+        """Encode the newest buffered frame, reusing the shared snapshot cache."""
+        seq, frame = self.video_processor.get_latest_frame()
+        if frame is None:
+            return None
+        if self._latest and self._latest[0] == seq:
+            return self._latest
+        jpeg = await get_snapshot_cache().get_jpeg(seq, frame, self.width, self.quality)
+        return seq, jpeg
+
+    async def _produce(self) -> None:
+        """Encode new frames while there are viewers and wake them up."""
+        try:
+            while self.viewers > 0:
+                try:
+                    latest = await self._encode_latest()
+                    if latest and (self._latest is None or latest[0] != self._latest[0]):
+                        self._latest = latest
+                        async with self._new_frame:
+                            self._new_frame.notify_all()
+                except Exception as e:
+                    logger.error("Error encoding preview frame: %s", e, extra=HOT_PATH)
+                await asyncio.sleep(self.interval)
+        finally:
+            self._producer = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve a single HTTP request."""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?")[0] if len(parts) > 1 else ""
+
+            if path == "/mjpeg":
+                await self._stream(writer)
+            elif path == "/snapshot.jpg":
+                latest = await self._encode_latest()
+                if latest:
+                    self._respond(writer, "200 OK", "image/jpeg", latest[1])
+                else:
+                    self._respond(writer, "503 Service Unavailable", "text/plain", b"No frames available\n")
+            elif path == "/":
+                self._respond(writer, "200 OK", "text/html; charset=utf-8", INDEX_HTML)
+            else:
+                self._respond(writer, "404 Not Found", "text/plain", b"Not Found\n")
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug(f"Preview connection closed: {e}")
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: str, content_type: str, body: bytes) -> None:
+        """Write a complete HTTP response."""
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+
+    async def _stream(self, writer: asyncio.StreamWriter) -> None:
+        """Send frames to one viewer until it disconnects."""
+        metrics = get_metrics()
+        writer.write(
+            f"HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary={BOUNDARY}\r\n"
+            f"Cache-Control: no-cache\r\nConnection: close\r\n\r\n".encode()
+        )
+        self.viewers += 1
+        metrics.set_gauge('preview_viewers', self.viewers)
+        if self._producer is None:
+            self._producer = asyncio.create_task(self._produce())
+        sent_seq = None
+        try:
+            while not self._closing:
+                if self._latest is None or self._latest[0] == sent_seq:
+                    async with self._new_frame:
+                        await self._new_frame.wait()
+                    if self._closing:
+                        break
+                seq, jpeg = self._latest
+                writer.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode()
+                    + jpeg + b"\r\n"
+                )
+                # A slow viewer only delays itself; it skips to the newest frame
+                await writer.drain()
+                sent_seq = seq
+                metrics.inc('preview_bytes_sent_total', len(jpeg))
+        finally:
+            self.viewers -= 1
+            metrics.set_gauge('preview_viewers', self.viewers)
+
+
+def create_preview_server(video_processor) -> Optional[PreviewServer]:
+    """Create the preview server if enabled in configuration.
+
+    Args:
+        video_processor: Source of captured frames.
+
+    Returns:
+        The server, or None if the preview is disabled.
+    """
+    config = get_config()
+    if not config.preview_enabled:
+        return None
+    return PreviewServer(
+        video_processor,
+        config.preview_host,
+        config.preview_port,
+        fps=config.preview_fps,
+        width=config.preview_width,
+        quality=config.preview_jpeg_quality,
+    )
@@ -0,0 +1,286 @@
+"""On-demand runtime profiling for kdx-pi-cam.
+
+This module profiles the running process for a fixed number of seconds
+without a restart. A background thread samples the Python stack of every
+thread at a fixed interval (or cProfile instruments the event loop
+thread), and a heartbeat task measures how long the event loop is blocked
+and which task was running at the time. The result is a short text summary
+plus report files that can be downloaded and inspected offline.
+"""
+
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+
+# Longest profile a single command may request
+MAX_PROFILE_SECONDS = 300
+
+# Seconds between stack samples; 100 Hz keeps the overhead around 1% of a core
+SAMPLE_INTERVAL = 0.01
+
+# Seconds between event loop heartbeats
+HEARTBEAT_INTERVAL = 0.01
+
+# Deepest stack recorded per sample
+MAX_STACK_DEPTH = 64
+
+# Leaf functions of threads that are waiting rather than running
+IDLE_FUNCTIONS = frozenset({
+    "select", "poll", "wait", "_wait_for_tstate_lock", "get", "sleep", "accept", "readinto",
+})
+
+# Rows shown in the chat summary
+SUMMARY_ROWS = 10
+
+
+@dataclass
+class BlockingEvent:
+    """A stretch of time the event loop did not run its heartbeat."""
+
+    started_at: float
+    duration: float
+    task: str
+    stack: List[str]
+
+
+@dataclass
+class ProfileReport:
+    """Result of a profiling run."""
+
+    summary: str
+    files: Dict[str, bytes] = field(default_factory=dict)
+
+
+def _frame_key(code) -> str:
+    """Readable identity of a function."""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack_keys(frame) -> List[str]:
+    """Function keys of a stack, outermost first."""
+    keys = []
+    while frame is not None and len(keys) < MAX_STACK_DEPTH:
+        keys.append(_frame_key(frame.f_code))
+        frame = frame.f_back
+    keys.reverse()
+    return keys
+
+
+def _describe_task(task: Optional[asyncio.Task]) -> str:
+    """Task name with its coroutine, or a note that a plain callback ran."""
+    if task is None:
+        return "(callback)"
+    coro = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+
+def format_thread_stacks() -> str:
+    """Current stack of every thread, like a faulthandler dump."""
+    frames = sys._current_frames()
+    lines = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        if frame is None:
+            continue
+        lines.append(f'Thread "{thread.name}" (daemon={thread.daemon}):')
+        lines.extend(line.rstrip("\n") for line in traceback.format_stack(frame))
+        lines.append("")
+    return "\n".join(lines)
+
+
+class Profiler:
+    """Profiles the process while run() is awaited."""
+
+    def __init__(self, mode: str = "sample", block_threshold: float = 0.1,
+                 sample_interval: float = SAMPLE_INTERVAL):
+        """Initialize the profiler.
+
+        Args:
+            mode: 'sample' to sample all threads, 'cprofile' to instrument
+                every function call on the event loop thread.
+            block_threshold: Seconds without a heartbeat reported as a
+                blocking event.
+            sample_interval: Seconds between stack samples.
+
+        Raises:
+            ValueError: If the mode is unknown.
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.block_threshold = block_threshold
+        self.sample_interval = sample_interval
+        self.samples = 0
+        self.idle_samples = 0
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.folded: Counter = Counter()
+        self.blocking: List[BlockingEvent] = []
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread = 0
+        self._beat = 0.0
+        # Heartbeat time -> (task, stack) seen by the sampler while the loop was stuck after it
+        self._culprits: Dict[float, Tuple[str, List[str]]] = {}
+        self._stop = threading.Event()
+
+    def _sample(self) -> None:
+        """Record one stack sample of every thread except the sampler."""
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = _stack_keys(frame)
+            if not stack:
+                continue
+            self.samples += 1
+            if frame.f_code.co_name in IDLE_FUNCTIONS:
+                self.idle_samples += 1
+                continue
+            self.self_counts[stack[-1]] += 1
+            self.total_counts.update(set(stack))
+            self.folded[";".join([names.get(ident, str(ident))] + stack)] += 1
+
+    def _watch_loop(self) -> None:
+        """Note what the event loop runs while its heartbeat is overdue."""
+        beat = self._beat
+        if beat in self._culprits or time.monotonic() - beat < self.block_threshold:
+            return
+        frame = sys._current_frames().get(self._loop_thread)
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        self._culprits[beat] = (_describe_task(task), _stack_keys(frame) if frame is not None else [])
+
+    def _sampler(self) -> None:
+        """Sampler thread body."""
+        while not self._stop.wait(self.sample_interval):
+            try:
+                self._watch_loop()
+                if self.mode == "sample":
+                    self._sample()
+            except Exception as e:
+                logger.debug(f"Profile sample failed: {e}")
+
+    async def _heartbeat(self) -> None:
+        """Record event loop lag and blocking events."""
+        while True:
+            previous = self._beat
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            self._beat = now
+            gap = now - previous
+            self.max_lag = max(self.max_lag, gap - HEARTBEAT_INTERVAL)
+            culprit = self._culprits.pop(previous, None)
+            if gap >= self.block_threshold:
+                task, stack = culprit or ("(unknown)", [])
+                self.blocking.append(BlockingEvent(previous, gap, task, stack))
+
+    async def run(self, seconds: float) -> ProfileReport:
+        """Profile the process for a number of seconds.
+
+        Args:
+            seconds: Profiling duration.
+
+        Returns:
+            The summary and report files.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        started = datetime.now()
+        profile = cProfile.Profile() if self.mode == "cprofile" else None
+        sampler = threading.Thread(target=self._sampler, name="profiler", daemon=True)
+        heartbeat = asyncio.create_task(self._heartbeat())
+        sampler.start()
+        if profile:
+            profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            if profile:
+                profile.disable()
+            heartbeat.cancel()
+            self._stop.set()
+            sampler.join()
+        logger.info(f"Profiled {self.mode} for {seconds:.0f}s, {len(self.blocking)} blocking events")
+        return self._report(seconds, started, profile)
+
+    def _top_functions(self, profile: Optional[cProfile.Profile], rows: int) -> List[str]:
+        """Busiest functions, by samples or by cProfile time."""
+        if profile is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(profile, stream=stream)
+            stats.sort_stats(pstats.SortKey.TIME)
+            lines = []
+            for func in stats.fcn_list[:rows]:
+                _, calls, tottime, cumtime, _ = stats.stats[func]
+                filename, line, name = func
+                lines.append(
+                    f"{tottime:7.3f}s {cumtime:7.3f}s {calls:>7} {name} ({os.path.basename(filename)}:{line})"
+                )
+            return ["   self    total   calls function"] + lines
+        busy = max(self.samples - self.idle_samples, 1)
+        lines = [
+            f"{count / busy:6.1%} {self.total_counts[key] / busy:6.1%} {key}"
+            for key, count in self.self_counts.most_common(rows)
+        ]
+        return ["  self  total function (share of busy samples)"] + lines
+
+    def _blocking_by_task(self) -> List[str]:
+        """Blocking events grouped by task."""
+        by_task: Dict[str, List[float]] = {}
+        for event in self.blocking:
+            by_task.setdefault(event.task, []).append(event.duration)
+        rows = sorted(by_task.items(), key=lambda item: -sum(item[1]))
+        return [
+            f"{len(durations):>4} x, max {max(durations) * 1000:.0f} ms, total {sum(durations) * 1000:.0f} ms: {task}"
+            for task, durations in rows
+        ]
+
+    def _report(self, seconds: float, started: datetime, profile: Optional[cProfile.Profile]) -> ProfileReport:
+        """Build the chat summary and the report files."""
+        threshold_ms = self.block_threshold * 1000
+        header = [f"Profile ({self.mode}, {seconds:.0f}s)"]
+        if self.mode == "sample":
+            header.append(f"Samples: {self.samples} ({self.idle_samples} idle)")
+        header.append(f"Max loop lag: {self.max_lag * 1000:.0f} ms")
+        header.append(f"Loop blocked over {threshold_ms:.0f} ms: {len(self.blocking)} time(s)")
+
+        summary = header + [""] + self._top_functions(profile, SUMMARY_ROWS)
+        if self.blocking:
+            summary += ["", "Blocking by task:"] + self._blocking_by_task()[:SUMMARY_ROWS]
+
+        details = header + [""] + self._top_functions(profile, 50) + ["", "Blocking events:"]
+        for event in self.blocking:
+            details.append(f"{event.duration * 1000:.0f} ms in {event.task}")
+            details.extend(f"    {key}" for key in event.stack[-8:])
+        details += ["", "Thread stacks at end:", format_thread_stacks()]
+        if self.folded:
+            details += ["Folded stacks (flamegraph.pl input):"]
+            details += [f"{stack} {count}" for stack, count in self.folded.most_common()]
+
+        stamp = started.strftime('%Y%m%d-%H%M%S')
+        files = {f"profile-{stamp}.txt": "\n".join(details).encode("utf-8")}
+        if profile is not None:
+            # Load with pstats.Stats(path) or snakeviz
+            files[f"profile-{stamp}.prof"] = marshal.dumps(pstats.Stats(profile).stats)
+        return ProfileReport("\n".join(summary), files)
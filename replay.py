@@ -0,0 +1,388 @@
+"""Offline replay of recorded video through the motion pipeline.
+
+This module feeds a local video file or a directory of segments through the
+same VideoProcessor buffer, MotionDetector and BotHandler event path used for
+the live stream, as fast as the CPU allows and without any network access.
+Events are recorded, classified and delivered exactly as in production, to a
+stubbed Telegram bot and into a scratch cache directory, on a clock that
+follows the video. It is used to tune MOTION_THRESHOLD and MOTION_MIN_AREA
+and as a throughput benchmark.
+
+Usage:
+    python replay.py recording.mp4 [--threshold 25] [--min-area 800] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import cv2
+
+from config import AppConfig, ConfigError, get_config, reset_config, set_config
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.ts', '.m4v')
+
+# The live pipeline buffers at ~10 FPS and checks for motion every second
+CAPTURE_FPS = 10.0
+CHECK_INTERVAL = 1.0
+
+# Placeholders so replay does not require live stream or Telegram credentials
+OFFLINE_ENV = {
+    "RTSP_URL": "rtsp://replay",
+    "BOT_TOKEN": "replay",
+    "CHAT_ID": "0",
+}
+
+@dataclass
+class ReplayEvent:
+    """A motion event found during replay."""
+
+    index: int
+    source: str
+    offset: float
+    timestamp: str
+    event_id: Optional[int] = None
+    labels: Dict[str, float] = field(default_factory=dict)
+    sheet_path: Optional[str] = None
+    clip_path: Optional[str] = None
+
+
+@dataclass
+class ReplayReport:
+    """Summary of a replay run."""
+
+    sources: List[str]
+    frames_decoded: int = 0
+    frames_buffered: int = 0
+    video_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    events: List[ReplayEvent] = field(default_factory=list)
+    sent: List[str] = field(default_factory=list)
+    stages: dict = field(default_factory=dict)
+
+    @property
+    def fps(self) -> float:
+        """Decoded frames per wall-clock second."""
+        return self.frames_decoded / self.wall_seconds if self.wall_seconds else 0.0
+
+    @property
+    def speedup(self) -> float:
+        """How many times faster than real time the replay ran."""
+        return self.video_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+
+class StubBot:
+    """Stands in for the Telegram bot and records what would be sent.
+
+    Sends return a message carrying a fake file_id, so the upload reuse path
+    of BotHandler runs as it does against Telegram.
+    """
+
+    def __init__(self):
+        """Initialize the stub bot."""
+        self.sent: List[str] = []
+
+    def _record(self, kind: str, chat_id: int, media: Any, caption: str) -> SimpleNamespace:
+        name = media if isinstance(media, str) else os.path.basename(getattr(media, 'name', ''))
+        self.sent.append(f"{kind} to {chat_id}: {caption}")
+        logger.debug(f"[stub] would send {kind} {name} to {chat_id}: {caption}")
+        file = SimpleNamespace(file_id=f"replay-{kind}-{len(self.sent)}")
+        return SimpleNamespace(
+            photo=[file] if kind == "photo" else [],
+            video=file if kind == "video" else None,
+            animation=file if kind == "animation" else None,
+        )
+
+    async def send_photo(self, chat_id: int, photo: Any, caption: str = "") -> SimpleNamespace:
+        """Record a photo instead of uploading it."""
+        return self._record("photo", chat_id, photo, caption)
+
+    async def send_video(self, chat_id: int, video: Any, caption: str = "") -> SimpleNamespace:
+        """Record a video instead of uploading it."""
+        return self._record("video", chat_id, video, caption)
+
+    async def send_animation(self, chat_id: int, animation: Any, caption: str = "") -> SimpleNamespace:
+        """Record an animation instead of uploading it."""
+        return self._record("animation", chat_id, animation, caption)
+
+    async def send_message(self, chat_id: int, text: str) -> SimpleNamespace:
+        """Record a text message instead of sending it."""
+        return self._record("message", chat_id, text, text)
+
+
+def format_offset(seconds: float) -> str:
+    """Format a video offset as HH:MM:SS.mmm."""
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def find_sources(path: str) -> List[str]:
+    """Resolve a file or directory of segments into an ordered list of videos.
+
+    Args:
+        path: Video file or directory containing segments.
+
+    Returns:
+        Sorted list of video file paths.
+    """
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(VIDEO_EXTENSIONS)
+        )
+    if os.path.isfile(path):
+        return [path]
+    raise FileNotFoundError(f"No such video file or directory: {path}")
+
+
+@contextmanager
+def scratch_environment(cache_dir: str, **overrides: Any) -> Iterator[AppConfig]:
+    """Point the configuration and the global stores at a scratch cache directory.
+
+    The event index, subscriber list, sheets and clips of the replay go to
+    cache_dir, so the live cache is never touched. The heatmap is disabled,
+    and quiet hours are off because the wall-clock hour means nothing for a
+    recording. Everything is restored on exit.
+
+    Args:
+        cache_dir: Scratch directory.
+        overrides: Further settings to change, by field name.
+
+    Yields:
+        The replay configuration.
+    """
+    import cache_manager
+    import event_store
+    import snapshot_cache
+    import subscribers
+
+    # Global instances that write to the cache directory
+    singletons = (
+        (cache_manager, "_cache_manager"),
+        (event_store, "_event_store"),
+        (snapshot_cache, "_snapshot_cache"),
+        (subscribers, "_subscriber_registry"),
+    )
+    previous = get_config()
+    config = previous.model_copy(update={
+        "cache_dir": cache_dir,
+        "event_db_path": os.path.join(cache_dir, "events.db"),
+        "subscribers_path": os.path.join(cache_dir, "subscribers.json"),
+        "heatmap_enabled": False,
+        "notification_quiet_hours_start": 0,
+        "notification_quiet_hours_end": 0,
+        **overrides,
+    })
+    saved = [getattr(module, name) for module, name in singletons]
+    for module, name in singletons:
+        setattr(module, name, None)
+    set_config(config)
+    try:
+        yield config
+    finally:
+        if event_store._event_store is not None:
+            event_store._event_store.close()
+        for (module, name), value in zip(singletons, saved):
+            setattr(module, name, value)
+        set_config(previous)
+
+
+async def replay(
+    sources: List[str],
+    threshold: Optional[int] = None,
+    min_area: Optional[int] = None,
+    cooldown: Optional[float] = None,
+    encode_clips: bool = False,
+    cache_dir: Optional[str] = None,
+) -> ReplayReport:
+    """Run recorded video through the capture buffer, detector and bot event path.
+
+    Detection and BotHandler._handle_motion run as in the monitoring loop,
+    with time taken from the video so cooldowns and tracks follow it.
+
+    Args:
+        sources: Ordered video files; offsets continue across segments.
+        threshold: Override for MOTION_THRESHOLD.
+        min_area: Override for MOTION_MIN_AREA.
+        cooldown: Override for NOTIFICATION_COOLDOWN_SECONDS.
+        encode_clips: Deliver with clips as NOTIFICATION_DELIVERY does,
+            instead of contact sheets only.
+        cache_dir: Directory kept with the replay's event index, sheets and
+            clips; by default a temporary directory removed afterwards.
+
+    Returns:
+        The replay report.
+    """
+    if cache_dir is None:
+        with tempfile.TemporaryDirectory(prefix="kdx-replay-") as scratch_dir:
+            return await replay(sources, threshold, min_area, cooldown, encode_clips, scratch_dir)
+
+    overrides: Dict[str, Any] = {}
+    if threshold is not None:
+        overrides["motion_threshold"] = threshold
+    if min_area is not None:
+        overrides["motion_min_area"] = min_area
+    if cooldown is not None:
+        overrides["notification_cooldown_seconds"] = cooldown
+    delivery = get_config().notification_delivery
+    if not encode_clips:
+        overrides["notification_delivery"] = "sheet"
+    elif not delivery.endswith("clip"):
+        overrides["notification_delivery"] = f"{delivery}_then_clip"
+
+    metrics = get_metrics()
+    metrics.reset()
+    with scratch_environment(cache_dir, **overrides):
+        from bot_handler import BotHandler
+        from event_store import get_event_store
+
+        handler = BotHandler()
+        bot = StubBot()
+        handler.application = SimpleNamespace(bot=bot)
+        await handler._ensure_components()
+        processor = handler.video_processor
+        handler.motion_detector.reset_tracking()
+        handler._frame_seq = processor.frame_seq
+
+        report = ReplayReport(sources=sources)
+        # Video offsets are mapped onto a clock starting now, so events get plausible timestamps
+        clock = time.time()
+        base_offset = 0.0
+        next_check = CHECK_INTERVAL
+        started = time.perf_counter()
+
+        for source in sources:
+            cap = cv2.VideoCapture(source)
+            if not cap.isOpened():
+                logger.error(f"Failed to open video file: {source}")
+                continue
+            source_fps = cap.get(cv2.CAP_PROP_FPS) or CAPTURE_FPS
+            # Keep roughly the live capture rate so detection windows match production
+            step = max(int(round(source_fps / CAPTURE_FPS)), 1)
+            index = 0
+            offset = base_offset
+            try:
+                while True:
+                    with metrics.timer('frame_capture'):
+                        if index % step:
+                            ok, frame = cap.grab(), None
+                        else:
+                            ok, frame = cap.read()
+                    if not ok:
+                        break
+                    report.frames_decoded += 1
+                    offset = base_offset + index / source_fps
+                    index += 1
+                    if frame is None:
+                        continue
+
+                    processor.feed_frame(frame, now=offset)
+                    report.frames_buffered += 1
+
+                    if offset < next_check:
+                        continue
+                    next_check = offset + CHECK_INTERVAL
+                    if not handler._detect(now=clock + offset):
+                        continue
+                    event_id = await handler._handle_motion(now=clock + offset)
+                    record = get_event_store().get_event(event_id)
+                    report.events.append(ReplayEvent(
+                        index=len(report.events) + 1,
+                        source=os.path.basename(source),
+                        offset=offset,
+                        timestamp=format_offset(offset),
+                        event_id=event_id,
+                        labels=record.labels if record else {},
+                        sheet_path=record.thumbnail_path if record else None,
+                        clip_path=record.clip_path if record else None,
+                    ))
+            finally:
+                cap.release()
+            base_offset = offset + 1.0 / source_fps
+
+        report.video_seconds = base_offset
+        report.wall_seconds = time.perf_counter() - started
+        report.sent = bot.sent
+    report.stages = {
+        stage: {
+            "count": histogram.count,
+            "total_s": histogram.sum,
+            "mean_ms": histogram.mean * 1000,
+        }
+        for stage, histogram in metrics.histograms.items()
+    }
+    return report
+
+
+def print_report(report: ReplayReport) -> None:
+    """Print a human-readable replay summary."""
+    print(f"Sources: {len(report.sources)}")
+    print(f"Video duration: {format_offset(report.video_seconds)}")
+    print(f"Frames decoded: {report.frames_decoded} ({report.frames_buffered} buffered)")
+    print(f"Throughput: {report.fps:.1f} frames/s, {report.speedup:.1f}x real time")
+    print(f"Events: {len(report.events)}")
+    for event in report.events:
+        labels = f" {', '.join(event.labels)}" if event.labels else ""
+        clip = f" clip={event.clip_path}" if event.clip_path else ""
+        print(f"  #{event.index} {event.timestamp} {event.source} event={event.event_id}{labels}{clip}")
+    print(f"Messages sent (stubbed): {len(report.sent)}")
+    print("Stage timings:")
+    for stage, stats in sorted(report.stages.items()):
+        print(f"  {stage}: n={stats['count']} total={stats['total_s']:.2f}s mean={stats['mean_ms']:.2f}ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Replay recorded video through the motion pipeline.")
+    parser.add_argument("path", help="Video file or directory of segments")
+    parser.add_argument("--threshold", type=int, help="Override MOTION_THRESHOLD")
+    parser.add_argument("--min-area", type=int, help="Override MOTION_MIN_AREA")
+    parser.add_argument("--cooldown", type=float, help="Override NOTIFICATION_COOLDOWN_SECONDS")
+    parser.add_argument("--encode", action="store_true", help="Deliver clips as NOTIFICATION_DELIVERY does")
+    parser.add_argument("--cache-dir", help="Keep the event index, sheets and clips here (default: temporary)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    for key, value in OFFLINE_ENV.items():
+        os.environ.setdefault(key, value)
+    reset_config()
+
+    try:
+        sources = find_sources(args.path)
+        report = asyncio.run(replay(
+            sources,
+            threshold=args.threshold,
+            min_area=args.min_area,
+            cooldown=args.cooldown,
+            encode_clips=args.encode,
+            cache_dir=args.cache_dir,
+        ))
+    except (ConfigError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        data = asdict(report)
+        data.update(fps=report.fps, speedup=report.speedup)
+        print(json.dumps(data, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""RTSP connection management for kdx-pi-cam.
+
+This module opens and reads the camera stream in background threads with
+timeouts, so a dead camera never blocks the event loop while FFmpeg waits.
+Failed opens are retried with exponential backoff and jitter, stalls are
+detected when no frame arrives for a while, and a standby capture can be
+opened while the stream is still up but failing reads, so that the
+reconnect after a stall only has to swap it in.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import get_config
+from logging_utils import HOT_PATH
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Relative jitter applied to every backoff delay
+BACKOFF_JITTER = 0.2
+
+# Extra seconds granted to OpenCV's own open timeout before giving up on it
+OPEN_GRACE_SECONDS = 2.0
+
+# Weight of the newest read in the stream health moving average
+HEALTH_SMOOTHING = 0.1
+
+# Consecutive failed reads after which a standby capture is opened
+STANDBY_FAILED_READS = 3
+
+# Stream health at which an unused standby capture is released again
+STANDBY_RELEASE_HEALTH = 0.9
+
+
+def _release(cap: Optional[cv2.VideoCapture]) -> None:
+    """Release a capture, ignoring errors from a dead stream."""
+    if cap is not None:
+        try:
+            cap.release()
+        except Exception as e:
+            logger.debug(f"Failed to release capture: {e}")
+
+
+def _release_when_done(future: "asyncio.Future") -> None:
+    """Release the capture an abandoned open returns once it finishes."""
+    def done(fut: "asyncio.Future") -> None:
+        if not fut.cancelled() and fut.exception() is None:
+            _release(fut.result())
+    future.add_done_callback(done)
+
+
+class RTSPConnection:
+    """Opens, reads and reconnects an RTSP stream off the event loop."""
+
+    def __init__(self, url: str, open_timeout: float = 10.0, read_timeout: float = 5.0,
+                 backoff_initial: float = 1.0, backoff_max: float = 30.0, stall_seconds: float = 3.0,
+                 standby: bool = False):
+        """Initialize the connection.
+
+        Args:
+            url: RTSP stream URL.
+            open_timeout: Seconds allowed for opening the stream.
+            read_timeout: Seconds a single frame read may take before the
+                stream is considered stalled.
+            backoff_initial: Delay before the second reconnect attempt; each
+                further failure doubles it.
+            backoff_max: Maximum reconnect delay.
+            stall_seconds: Seconds without a frame after which the stream is
+                dropped and reconnected.
+            standby: Open a second capture once reads start failing on a
+                stream that delivered frames, to swap in if it then stalls.
+        """
+        self.url = url
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.stall_seconds = stall_seconds
+        self.standby = standby
+        self.cap: Optional[cv2.VideoCapture] = None
+        self.failures = 0  # Consecutive failed opens
+        self.health = 0.0  # Moving average of successful reads, 0..1
+        self.last_frame_at: Optional[float] = None
+        self._open_started: Optional[float] = None
+        self._pending_read: Optional[asyncio.Future] = None
+        self._standby: Optional[asyncio.Future] = None
+        self._failed_reads = 0  # Consecutive failed reads on the active capture
+        self._had_frame = False  # Whether the active capture delivered a frame
+        # Opens, reads and a standby open may all be in flight at once;
+        # started on first use and again after release()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def is_opened(self) -> bool:
+        """Whether a capture is open."""
+        return self.cap is not None and self.cap.isOpened()
+
+    def _worker(self) -> ThreadPoolExecutor:
+        """The worker pool, started if needed."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rtsp")
+        return self._executor
+
+    def _create_capture(self) -> Optional[cv2.VideoCapture]:
+        """Open a capture with OpenCV's FFmpeg timeouts; runs in a worker thread."""
+        cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.open_timeout * 1000),
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self.read_timeout * 1000),
+        ])
+        if not cap.isOpened():
+            _release(cap)
+            return None
+        return cap
+
+    def backoff_delay(self) -> float:
+        """Delay before the next open attempt, 0 right after a healthy stream."""
+        if self.failures == 0:
+            return 0.0
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** (self.failures - 1))
+        return delay * random.uniform(1 - BACKOFF_JITTER, 1 + BACKOFF_JITTER)
+
+    def _update_health(self, ok: bool) -> None:
+        self.health += HEALTH_SMOOTHING * ((1.0 if ok else 0.0) - self.health)
+        get_metrics().set_gauge('stream_health', self.health)
+
+    async def _await_open(self, future: "asyncio.Future") -> Optional[cv2.VideoCapture]:
+        """Wait for an open running in a worker thread, abandoning it on timeout."""
+        done, _ = await asyncio.wait({future}, timeout=self.open_timeout + OPEN_GRACE_SECONDS)
+        if not done:
+            _release_when_done(future)
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"Error opening RTSP stream: {e}")
+            return None
+
+    async def open(self) -> bool:
+        """Open the stream, replacing any current capture.
+
+        Returns:
+            True if the stream opened.
+        """
+        self.drop()
+        loop = asyncio.get_running_loop()
+        self._open_started = time.monotonic()
+        with get_metrics().timer('rtsp_open'):
+            cap = await self._await_open(loop.run_in_executor(self._worker(), self._create_capture))
+        return self._activate(cap)
+
+    def _activate(self, cap: Optional[cv2.VideoCapture]) -> bool:
+        """Make a freshly opened capture the active one."""
+        if cap is None:
+            self.failures += 1
+            self._update_health(False)
+            return False
+        self.cap = cap
+        self.failures = 0
+        self._failed_reads = 0
+        self._had_frame = False
+        self.last_frame_at = time.monotonic()  # Stall timer starts at open
+        return True
+
+    async def reconnect(self) -> bool:
+        """Reopen the stream, swapping in the standby capture if one was opened.
+
+        Otherwise waits for the backoff delay first after failed attempts.
+
+        Returns:
+            True if a capture is open afterwards.
+        """
+        self.drop()
+        if self._standby is not None:
+            standby, self._standby = self._standby, None
+            cap = await self._await_open(standby)
+            if cap is not None:
+                get_metrics().inc('standby_swaps_total')
+                logger.info("Swapped in standby RTSP capture")
+                self._open_started = time.monotonic()
+                return self._activate(cap)
+            self.failures += 1
+        delay = self.backoff_delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return await self.open()
+
+    def _start_standby(self) -> None:
+        """Begin opening a standby capture if none is pending.
+
+        Only a capture that delivered frames gets a standby, so a camera that
+        opens but never streams is retried with backoff instead.
+        """
+        if self.standby and self._standby is None and self._had_frame:
+            logger.info("RTSP reads failing, opening standby capture")
+            self._standby = asyncio.get_running_loop().run_in_executor(self._worker(), self._create_capture)
+
+    def _cancel_standby(self) -> None:
+        """Release the standby capture."""
+        if self._standby is not None:
+            _release_when_done(self._standby)
+            self._standby = None
+
+    def _stalled(self) -> bool:
+        """Whether no frame arrived for stall_seconds."""
+        return self.last_frame_at is not None and time.monotonic() - self.last_frame_at >= self.stall_seconds
+
+    async def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Read a frame in a worker thread.
+
+        A read that takes longer than read_timeout, or failed reads lasting
+        stall_seconds, count as a stall: the capture is dropped so the
+        caller reconnects. After STANDBY_FAILED_READS failed reads in a row
+        the standby capture starts opening while this one stays active.
+
+        Returns:
+            Tuple of (success, frame).
+        """
+        cap = self.cap
+        if cap is None:
+            return False, None
+        metrics = get_metrics()
+        future = asyncio.get_running_loop().run_in_executor(self._worker(), cap.read)
+        self._pending_read = future
+        done, _ = await asyncio.wait({future}, timeout=self.read_timeout)
+        if not done:
+            metrics.inc('stream_stalls_total')
+            logger.warning("RTSP read timed out after %.1fs, dropping stream", self.read_timeout, extra=HOT_PATH)
+            self.drop()
+            self._update_health(False)
+            return False, None
+        self._pending_read = None
+        try:
+            ret, frame = future.result()
+        except Exception as e:
+            logger.error("Error reading RTSP stream: %s", e, extra=HOT_PATH)
+            ret, frame = False, None
+        self._update_health(ret)
+
+        if ret:
+            self._failed_reads = 0
+            self._had_frame = True
+            self.last_frame_at = time.monotonic()
+            if self._open_started is not None:
+                metrics.observe('rtsp_first_frame', self.last_frame_at - self._open_started)
+                self._open_started = None
+            if self.health >= STANDBY_RELEASE_HEALTH:
+                self._cancel_standby()
+            return True, frame
+
+        # A single failed read is often a glitch; a run of them warrants a second session
+        self._failed_reads += 1
+        if self._failed_reads >= STANDBY_FAILED_READS:
+            self._start_standby()
+        if self._stalled():
+            metrics.inc('stream_stalls_total')
+            logger.warning("No RTSP frame for %.1fs, dropping stream", self.stall_seconds, extra=HOT_PATH)
+            self.drop()
+        return False, None
+
+    def drop(self) -> None:
+        """Release the active capture, after any read still running on it."""
+        cap, self.cap = self.cap, None
+        if cap is None:
+            return
+        pending, self._pending_read = self._pending_read, None
+        if pending is not None and not pending.done():
+            # Releasing under a running read can crash the FFmpeg backend
+            pending.add_done_callback(lambda _: _release(cap))
+        else:
+            _release(cap)
+
+    def release(self) -> None:
+        """Release the active and standby captures and stop the worker threads."""
+        self.drop()
+        self._cancel_standby()
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_rtsp_connection(url: str) -> RTSPConnection:
+    """Create a connection with the configured timeouts and backoff."""
+    config = get_config()
+    return RTSPConnection(
+        url,
+        open_timeout=config.rtsp_open_timeout,
+        read_timeout=config.rtsp_read_timeout,
+        backoff_initial=config.rtsp_backoff_initial,
+        backoff_max=config.rtsp_backoff_max,
+        stall_seconds=config.rtsp_stall_seconds,
+        standby=config.rtsp_standby,
+    )
@@ -0,0 +1,148 @@
+"""Supervised application runtime for kdx-pi-cam.
+
+This module runs every long-lived part of the application (bot polling,
+capture and detection, cache maintenance, the metrics endpoint and the
+encoder pool) on one event loop. Services start in a fixed order and stop
+in reverse order on SIGINT/SIGTERM, each with a time limit, so in-flight
+alerts can drain before capture and encoders go away.
+"""
+
+import asyncio
+import logging
+import signal
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Optional
+
+from config import get_config
+from metrics import get_startup_timer
+
+if TYPE_CHECKING:
+    from bot_handler import BotHandler
+
+logger = logging.getLogger(__name__)
+
+
+async def _noop() -> None:
+    """Start or stop step of a service that needs none."""
+
+
+@dataclass
+class Service:
+    """A named part of the application with start and stop steps."""
+
+    name: str
+    start: Callable[[], Awaitable[None]]
+    stop: Callable[[], Awaitable[None]]
+
+
+class Runtime:
+    """Starts services in order and stops them in reverse order."""
+
+    def __init__(self, stop_timeout: float = 15.0):
+        """Initialize the runtime.
+
+        Args:
+            stop_timeout: Seconds each service may take to stop.
+        """
+        self.stop_timeout = stop_timeout
+        self.services: List[Service] = []
+        self._started: List[Service] = []
+        self._stop_event: Optional[asyncio.Event] = None
+
+    def add(self, name: str, start: Optional[Callable[[], Awaitable[None]]] = None,
+            stop: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+        """Register a service; services start in the order they are added."""
+        self.services.append(Service(name, start or _noop, stop or _noop))
+
+    async def start(self) -> None:
+        """Start all services in order.
+
+        Raises:
+            Exception: The first start failure, after the services already
+                started have been stopped.
+        """
+        for service in self.services:
+            try:
+                await service.start()
+            except Exception:
+                logger.error(f"Failed to start {service.name}, stopping started services")
+                await self.stop()
+                raise
+            self._started.append(service)
+            logger.info(f"Started {service.name}")
+
+    async def stop(self) -> None:
+        """Stop the started services in reverse order, each within stop_timeout."""
+        while self._started:
+            service = self._started.pop()
+            try:
+                await asyncio.wait_for(service.stop(), self.stop_timeout)
+                logger.info(f"Stopped {service.name}")
+            except asyncio.TimeoutError:
+                logger.error(f"Timed out stopping {service.name}")
+            except Exception as e:
+                logger.error(f"Error stopping {service.name}: {e}")
+
+    def request_stop(self) -> None:
+        """Ask run() to stop the services and return."""
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def run(self) -> None:
+        """Start the services, wait for a stop request or signal, then stop them."""
+        self._stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not supported on this platform or thread
+        try:
+            await self.start()
+            get_startup_timer().mark('services')
+            await self._stop_event.wait()
+            logger.info("Shutting down...")
+        finally:
+            await self.stop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.remove_signal_handler(sig)
+                except (NotImplementedError, RuntimeError):
+                    pass
+
+
+def create_runtime(bot_handler: "BotHandler") -> Runtime:
+    """Build the application runtime around a bot handler.
+
+    Start order: encoder pool, bot polling, cache maintenance, metrics
+    endpoint, config watcher. Polling starts before the other services so
+    the bot answers as early as possible; the encoder pool is stopped last
+    because pending alerts may still be encoding while the bot drains.
+    """
+    from cache_manager import get_cache_manager
+    from config_reload import get_config_reloader
+    from metrics import create_metrics_server
+
+    config = get_config()
+    runtime = Runtime(stop_timeout=config.shutdown_drain_timeout + 5)
+
+    async def stop_encoders() -> None:
+        from encoder import get_encoder_pool
+        await asyncio.get_running_loop().run_in_executor(None, get_encoder_pool().shutdown)
+
+    runtime.add("encoder pool", stop=stop_encoders)
+    runtime.add("Telegram bot", bot_handler.start, lambda: bot_handler.stop(config.shutdown_drain_timeout))
+
+    cache_manager = get_cache_manager()
+    runtime.add("cache maintenance", cache_manager.start_cleanup, cache_manager.stop_cleanup)
+
+    metrics_server = create_metrics_server()
+    if metrics_server:
+        runtime.add("metrics endpoint", metrics_server.start, metrics_server.stop)
+
+    reloader = get_config_reloader()
+    reloader.add_listener(bot_handler.apply_config)
+    reloader.add_listener(cache_manager.apply_config)
+    if reloader.watch_interval > 0:
+        runtime.add("config watcher", reloader.start, reloader.stop)
+    return runtime
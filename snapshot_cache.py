@@ -0,0 +1,146 @@
+"""Encoded snapshot cache for kdx-pi-cam.
+
+This module caches JPEG encodings of buffered frames keyed by frame sequence
+number and output size/quality, so one encode serves every requester of the
+same frame, and memoizes Telegram file_ids so repeat sends skip the upload.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import get_config
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+SnapshotKey = Tuple[int, int, int]
+
+
+def encode_jpeg(frame: np.ndarray, width: int = 0, quality: int = 85) -> bytes:
+    """Encode a BGR frame as JPEG, optionally downscaled.
+
+    Args:
+        frame: BGR frame.
+        width: Output width, 0 keeps the frame size.
+        quality: JPEG quality.
+
+    Returns:
+        The JPEG bytes.
+
+    Raises:
+        ValueError: If encoding fails.
+    """
+    if width and frame.shape[1] > width:
+        height = max(int(frame.shape[0] * width / frame.shape[1]), 1)
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return encoded.tobytes()
+
+
+class SnapshotCache:
+    """LRU cache of encoded snapshots and Telegram file_ids."""
+
+    def __init__(self, max_entries: int = 16, max_file_ids: int = 256):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Encoded snapshots kept in memory.
+            max_file_ids: Telegram file_ids remembered.
+        """
+        self.max_entries = max_entries
+        self.max_file_ids = max_file_ids
+        self._entries: "OrderedDict[SnapshotKey, bytes]" = OrderedDict()
+        self._pending: Dict[SnapshotKey, asyncio.Future] = {}
+        self._file_ids: "OrderedDict[str, str]" = OrderedDict()
+
+    async def get_jpeg(self, seq: int, frame: np.ndarray, width: int = 0, quality: int = 85) -> bytes:
+        """Get the JPEG encoding of a frame, encoding it at most once.
+
+        Concurrent requests for the same key wait for the encode already in
+        flight instead of starting their own.
+
+        Args:
+            seq: Sequence number of the frame in the capture buffer.
+            frame: The frame, used only on a cache miss.
+            width: Output width, 0 keeps the frame size.
+            quality: JPEG quality.
+
+        Returns:
+            The JPEG bytes.
+        """
+        metrics = get_metrics()
+        key = (seq, width, quality)
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            metrics.inc('snapshot_cache_hits_total')
+            return data
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            metrics.inc('snapshot_cache_hits_total')
+            return await asyncio.shield(pending)
+
+        metrics.inc('snapshot_cache_misses_total')
+        future = asyncio.get_event_loop().create_future()
+        self._pending[key] = future
+        try:
+            with metrics.timer('photo_encode'):
+                data = await asyncio.get_event_loop().run_in_executor(None, encode_jpeg, frame, width, quality)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure without waiters is not reported as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+        future.set_result(data)
+        self._entries[key] = data
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return data
+
+    @staticmethod
+    def snapshot_artifact(seq: int, width: int = 0, quality: int = 85) -> str:
+        """Artifact key used to memoize the file_id of a snapshot."""
+        return f"snapshot:{seq}:{width}:{quality}"
+
+    def get_file_id(self, artifact: str) -> Optional[str]:
+        """Get the Telegram file_id of a previously uploaded artifact."""
+        file_id = self._file_ids.get(artifact)
+        if file_id is not None:
+            self._file_ids.move_to_end(artifact)
+            get_metrics().inc('upload_reuse_total')
+        return file_id
+
+    def remember_file_id(self, artifact: str, file_id: str) -> None:
+        """Memoize the Telegram file_id returned for an uploaded artifact."""
+        self._file_ids[artifact] = file_id
+        self._file_ids.move_to_end(artifact)
+        while len(self._file_ids) > self.max_file_ids:
+            self._file_ids.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached snapshots and file_ids."""
+        self._entries.clear()
+        self._file_ids.clear()
+
+
+# Global snapshot cache instance
+_snapshot_cache: SnapshotCache = None
+
+
+def get_snapshot_cache() -> SnapshotCache:
+    """Get the global snapshot cache instance."""
+    global _snapshot_cache
+    if _snapshot_cache is None:
+        _snapshot_cache = SnapshotCache(get_config().snapshot_cache_entries)
+    return _snapshot_cache
@@ -0,0 +1,179 @@
+"""Notification subscribers for kdx-pi-cam.
+
+This module keeps the registry of chats that receive motion alerts, each
+with optional quiet hours and camera filters, persisted as a JSON file.
+"""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Subscriber:
+    """A chat receiving motion alerts."""
+
+    chat_id: int
+    quiet_start: Optional[int] = None  # None uses the global quiet hours
+    quiet_end: Optional[int] = None
+    cameras: List[str] = field(default_factory=list)  # Empty means all cameras
+
+    def is_quiet(self, hour: int, default_start: int, default_end: int) -> bool:
+        """Check whether an hour falls in this subscriber's quiet hours."""
+        start = default_start if self.quiet_start is None else self.quiet_start
+        end = default_end if self.quiet_end is None else self.quiet_end
+        if start == end:
+            return False
+        if start < end:
+            return start <= hour < end
+        # Overnight quiet hours
+        return hour >= start or hour < end
+
+    def wants(self, camera: str) -> bool:
+        """Check whether this subscriber follows a camera."""
+        return not self.cameras or camera in self.cameras
+
+
+def parse_chat_ids(value: str) -> List[int]:
+    """Parse a comma-separated CHAT_ID value.
+
+    Args:
+        value: e.g. '123' or '123,-100456'.
+
+    Returns:
+        The chat ids; invalid entries are skipped with a warning.
+    """
+    chat_ids = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            chat_ids.append(int(part))
+        except ValueError:
+            logger.warning(f"Ignoring invalid chat id: {part}")
+    return chat_ids
+
+
+class SubscriberRegistry:
+    """Persistent set of alert subscribers."""
+
+    def __init__(self, path: str, quiet_start: int, quiet_end: int, initial_chat_ids: Optional[List[int]] = None):
+        """Load the registry.
+
+        Args:
+            path: JSON file the registry is stored in.
+            quiet_start: Global quiet hours start, used when a subscriber has none.
+            quiet_end: Global quiet hours end.
+            initial_chat_ids: Chats subscribed while no registry file exists
+                yet, e.g. from CHAT_ID. Once saved, the file is authoritative,
+                so an unsubscribed seed chat stays unsubscribed.
+        """
+        self.path = path
+        self.quiet_start = quiet_start
+        self.quiet_end = quiet_end
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Subscriber] = {}
+        if os.path.exists(path):
+            self._load()
+        else:
+            for chat_id in initial_chat_ids or []:
+                self._subscribers[chat_id] = Subscriber(chat_id)
+
+    def _load(self) -> None:
+        """Read subscribers from disk."""
+        try:
+            with open(self.path, 'r') as f:
+                for item in json.load(f):
+                    subscriber = Subscriber(**item)
+                    self._subscribers[subscriber.chat_id] = subscriber
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Failed to load subscribers from {self.path}: {e}")
+
+    def save(self) -> None:
+        """Write subscribers to disk atomically; blocking, so async callers use an executor."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            data = [asdict(subscriber) for subscriber in self._subscribers.values()]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, chat_id: int) -> Subscriber:
+        """Subscribe a chat, keeping existing settings if already subscribed."""
+        with self._lock:
+            subscriber = self._subscribers.setdefault(chat_id, Subscriber(chat_id))
+        self.save()
+        return subscriber
+
+    def remove(self, chat_id: int) -> bool:
+        """Unsubscribe a chat.
+
+        Returns:
+            True if the chat was subscribed.
+        """
+        with self._lock:
+            removed = self._subscribers.pop(chat_id, None) is not None
+        if removed:
+            self.save()
+        return removed
+
+    def get(self, chat_id: int) -> Optional[Subscriber]:
+        """Get a subscriber by chat id."""
+        with self._lock:
+            return self._subscribers.get(chat_id)
+
+    def update(self, chat_id: int, **changes) -> Optional[Subscriber]:
+        """Change quiet hours or cameras of a subscriber.
+
+        Returns:
+            The updated subscriber, or None if the chat is not subscribed.
+        """
+        with self._lock:
+            subscriber = self._subscribers.get(chat_id)
+            if subscriber is None:
+                return None
+            for name, value in changes.items():
+                setattr(subscriber, name, value)
+        self.save()
+        return subscriber
+
+    def all(self) -> List[Subscriber]:
+        """List all subscribers."""
+        with self._lock:
+            return list(self._subscribers.values())
+
+    def recipients(self, camera: str, hour: int) -> List[Subscriber]:
+        """Subscribers that should receive an alert from a camera at an hour."""
+        return [
+            subscriber for subscriber in self.all()
+            if subscriber.wants(camera) and not subscriber.is_quiet(hour, self.quiet_start, self.quiet_end)
+        ]
+
+
+# Global subscriber registry instance
+_subscriber_registry: SubscriberRegistry = None
+
+
+def get_subscriber_registry() -> SubscriberRegistry:
+    """Get the global subscriber registry instance."""
+    global _subscriber_registry
+    if _subscriber_registry is None:
+        config = get_config()
+        _subscriber_registry = SubscriberRegistry(
+            config.subscribers_path,
+            config.notification_quiet_hours_start,
+            config.notification_quiet_hours_end,
+            parse_chat_ids(config.chat_id),
+        )
+    return _subscriber_registry
@@ -0,0 +1,46 @@
+"""Tests for animation module."""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from animation import MIN_ANIMATION_WIDTH, encode_gif
+
+
+def moving_frames(count=20, shape=(240, 320)):
+    """Noisy frames with a moving square."""
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        frame = rng.integers(0, 255, (*shape, 3), dtype=np.uint8)
+        frame[50:90, 10 + i * 10:50 + i * 10] = (0, 0, 255)
+        frames.append(frame)
+    return frames
+
+
+def test_encode_gif_decimates_and_downscales():
+    """Test frames are decimated to the animation rate and resized to the width."""
+    data = encode_gif(moving_frames(), source_fps=10, fps=5, width=160, max_bytes=10 * 1024 * 1024)
+    image = Image.open(io.BytesIO(data))
+    assert image.format == "GIF"
+    assert image.size == (160, 120)
+    assert image.n_frames == 10
+    assert image.info["duration"] == 200
+
+
+def test_encode_gif_shrinks_to_budget():
+    """Test the width is reduced until the GIF fits the size budget."""
+    frames = moving_frames()
+    full = encode_gif(frames, 10, 10, 320, 10 * 1024 * 1024)
+    budget = len(full) // 3
+    data = encode_gif(frames, 10, 10, 320, budget)
+    assert len(data) <= budget
+    assert MIN_ANIMATION_WIDTH <= Image.open(io.BytesIO(data)).size[0] < 320
+
+
+def test_encode_gif_requires_frames():
+    """Test an empty window raises ValueError."""
+    with pytest.raises(ValueError):
+        encode_gif([], 10, 5, 320, 1024)
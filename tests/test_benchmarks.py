@@ -0,0 +1,43 @@
+"""Tests for the benchmark helpers."""
+
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.run_benchmarks import summarize
+from benchmarks.synthetic import MOTION_PATTERNS, build_cache_tree, generate_frames
+
+
+@pytest.mark.parametrize("pattern", MOTION_PATTERNS)
+def test_generate_frames_reproducible(pattern):
+    """Test synthetic frames have the right shape and are seeded."""
+    frames = generate_frames(64, 48, 3, pattern, seed=1)
+    again = generate_frames(64, 48, 3, pattern, seed=1)
+    assert len(frames) == 3
+    assert frames[0].shape == (48, 64, 3)
+    assert frames[0].dtype == np.uint8
+    assert all(np.array_equal(a, b) for a, b in zip(frames, again))
+
+
+def test_generate_frames_unknown_pattern():
+    """Test unknown patterns are rejected."""
+    with pytest.raises(ValueError):
+        generate_frames(64, 48, 2, "earthquake")
+
+
+def test_build_cache_tree(tmp_path):
+    """Test synthetic cache tree creation."""
+    total = build_cache_tree(str(tmp_path), 20, file_size=10, subdirs=4)
+    files = [os.path.join(root, f) for root, _, names in os.walk(tmp_path) for f in names]
+    assert total == 200
+    assert len(files) == 20
+
+
+def test_summarize():
+    """Test timing summary statistics."""
+    stats = summarize([0.001, 0.002, 0.003])
+    assert stats["samples"] == 3
+    assert stats["min_ms"] == pytest.approx(1.0)
+    assert stats["mean_ms"] == pytest.approx(2.0)
+    assert stats["ops_per_sec"] == pytest.approx(500.0)
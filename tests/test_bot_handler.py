@@ -1,9 +1,20 @@
 """Tests for bot_handler module."""
 
+import asyncio
+import threading
+
+import numpy as np
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from bot_handler import BotHandler
+# Camera components are imported lazily by BotHandler; import them here so they
+# bind the real get_config rather than a mock patched in by an earlier test
+import motion_detector
+import object_classifier
+import subscribers
+import video_processor
+from bot_handler import NOT_SUBSCRIBED_MESSAGE, BotHandler
+from subscribers import SubscriberRegistry
 
 
 @pytest.fixture(autouse=True)
@@ -38,6 +49,14 @@ def set_env_vars(monkeypatch):
         monkeypatch.setenv(key, value)
 
 
+@pytest.fixture(autouse=True)
+def subscriber_registry(monkeypatch, tmp_path):
+    """Use a scratch subscriber registry so tests do not write to ./data."""
+    registry = SubscriberRegistry(str(tmp_path / "subscribers.json"), 22, 7, [123])
+    monkeypatch.setattr(subscribers, "_subscriber_registry", registry)
+    return registry
+
+
 @pytest.mark.asyncio
 async def test_bot_handler_init():
     """Test BotHandler initialization."""
@@ -48,10 +67,31 @@ async def test_bot_handler_init():
         mock_config.return_value.motion_threshold = 30
 
         handler = BotHandler()
+        # Camera components are only created on first use
+        assert handler._video_processor is None
         assert handler.video_processor is not None
         assert handler.motion_detector is not None
 
 
+@pytest.mark.asyncio
+async def test_components_load_off_the_event_loop():
+    """Test components are created in a worker thread and loaded only once."""
+    handler = BotHandler()
+    threads = []
+
+    def load():
+        threads.append(threading.get_ident())
+        handler.motion_detector = MagicMock()
+        handler.video_processor = MagicMock()
+        handler.classifier = None
+
+    handler._load_components = load
+    await asyncio.gather(handler._ensure_components(), handler._ensure_components())
+    await handler._ensure_components()
+
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
+
+
 @pytest.mark.asyncio
 async def test_start_command():
     """Test /start command."""
@@ -91,4 +131,241 @@ async def test_stop_command():
 
         await handler.stop_command(update, None)
         assert not handler.monitoring
-        update.message.reply_text.assert_called_with("Monitoring stopped.")
\ No newline at end of file
+        update.message.reply_text.assert_called_with("Monitoring stopped.")
+
+
+@pytest.mark.asyncio
+async def test_handle_motion_sheet_only(tmp_path):
+    """Test sheet-only delivery sends the contact sheet and skips the clip."""
+    handler = BotHandler()
+    handler.application = MagicMock()
+    handler.application.bot = AsyncMock()
+    handler.delivery = "sheet"
+    sheet_path = tmp_path / "1.jpg"
+    sheet_path.write_bytes(b"jpeg")
+    handler._record_event = AsyncMock(return_value=(1, str(sheet_path)))
+    handler._recipients = MagicMock(return_value=[123])
+    handler.video_processor.generate_clip = AsyncMock()
+
+    await handler._handle_motion()
+
+    handler.application.bot.send_photo.assert_called_once()
+    handler.application.bot.send_video.assert_not_called()
+    handler.video_processor.generate_clip.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_handle_motion_animation_only(tmp_path):
+    """Test animation delivery sends a GIF preview and skips the clip."""
+    handler = BotHandler()
+    handler.application = MagicMock()
+    handler.application.bot = AsyncMock()
+    handler.delivery = "animation"
+    animation_path = tmp_path / "preview.gif"
+    animation_path.write_bytes(b"GIF89a")
+    handler._record_event = AsyncMock(return_value=(1, None))
+    handler._recipients = MagicMock(return_value=[123])
+    handler.video_processor.generate_animation = AsyncMock(return_value=str(animation_path))
+    handler.video_processor.generate_clip = AsyncMock()
+
+    await handler._handle_motion()
+
+    handler.application.bot.send_animation.assert_called_once()
+    handler.video_processor.generate_clip.assert_not_called()
+    assert not animation_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_uploads_once(tmp_path):
+    """Test a broadcast uploads the media once and reuses its file_id."""
+    handler = BotHandler()
+    handler.application = MagicMock()
+    handler.application.bot = AsyncMock()
+    handler.application.bot.send_video.return_value = MagicMock(photo=[], video=MagicMock(file_id="vid-1"))
+    handler.send_interval = 0
+    clip_path = tmp_path / "1.mp4"
+    clip_path.write_bytes(b"mp4")
+
+    await handler._broadcast([1, 2, 3], "video", str(clip_path), "clip")
+
+    calls = handler.application.bot.send_video.call_args_list
+    assert len(calls) == 3
+    assert not isinstance(calls[0].args[1], str)
+    assert [call.args[1] for call in calls[1:]] == ["vid-1", "vid-1"]
+
+
+@pytest.mark.asyncio
+async def test_subscribe_commands(subscriber_registry):
+    """Test /subscribe and /unsubscribe update the registry."""
+    handler = BotHandler()
+    update = MagicMock()
+    update.effective_chat.id = 456
+    update.message = AsyncMock()
+
+    await handler.subscribe_command(update, None)
+    assert subscriber_registry.get(456) is not None
+    await handler.unsubscribe_command(update, None)
+    assert subscriber_registry.get(456) is None
+
+
+@pytest.mark.asyncio
+async def test_error_messages_reach_admins_or_subscribers(subscriber_registry):
+    """Test errors go to the admin chats, or to every subscriber without admins."""
+    handler = BotHandler()
+    handler.application = MagicMock()
+    handler.application.bot = AsyncMock()
+    handler.send_interval = 0
+    subscriber_registry.add(456)
+
+    await handler._send_error_message("Stream down")
+    sent = [call.args for call in handler.application.bot.send_message.call_args_list]
+    assert sent == [(123, "Stream down"), (456, "Stream down")]
+
+    handler.application.bot.send_message.reset_mock()
+    handler.admin_chat_ids = {789}
+    await handler._send_error_message("Stream down")
+    handler.application.bot.send_message.assert_awaited_once_with(789, "Stream down")
+
+
+@pytest.mark.asyncio
+async def test_settings_commands_refuse_unsubscribed_chat(subscriber_registry):
+    """Test /quiet and /cameras reply with an error instead of subscribing the chat."""
+    handler = BotHandler()
+    update = MagicMock()
+    update.effective_chat.id = 456
+    update.message = AsyncMock()
+
+    for command, args in ((handler.quiet_command, ["9", "17"]), (handler.quiet_command, ["default"]),
+                          (handler.cameras_command, ["garage"])):
+        await command(update, MagicMock(args=args))
+        update.message.reply_text.assert_awaited_with(NOT_SUBSCRIBED_MESSAGE)
+    assert subscriber_registry.get(456) is None
+
+    await handler.subscribe_command(update, None)
+    await handler.quiet_command(update, MagicMock(args=["9", "17"]))
+    await handler.cameras_command(update, MagicMock(args=["garage"]))
+    subscriber = subscriber_registry.get(456)
+    assert (subscriber.quiet_start, subscriber.quiet_end, subscriber.cameras) == (9, 17, ["garage"])
+
+
+@pytest.mark.asyncio
+async def test_handle_motion_skips_unmatched_classes(tmp_path):
+    """Test events without a configured object class are not notified."""
+    handler = BotHandler()
+    handler.application = MagicMock()
+    handler.application.bot = AsyncMock()
+    handler._record_event = AsyncMock(return_value=(1, None))
+    handler.classifier = MagicMock()
+    handler.classifier.classify_event = AsyncMock(return_value=[])
+    handler.classifier.matches.return_value = False
+    handler.video_processor.generate_clip = AsyncMock()
+
+    with patch('bot_handler.get_event_store') as get_store:
+        await handler._handle_motion()
+
+    get_store.return_value.update_labels.assert_called_once_with(1, {})
+    handler.video_processor.generate_clip.assert_not_called()
+    handler.application.bot.send_message.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_record_event_stores_every_tracked_object(tmp_path):
+    """Test two objects confirmed together are recorded as one event each."""
+    from event_store import EventStore
+    from tracker import CentroidTracker
+
+    detector = motion_detector.MotionDetector()
+    detector.cooldown = 0
+    detector.tracker = CentroidTracker(min_hits=3)
+    frames = []
+    for i in range(5):
+        # Two squares blinking in opposite corners: each frame pair shows both as single blobs
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        if i % 2:
+            frame[20:80, 20:80] = 255
+            frame[160:220, 200:260] = 255
+        frames.append(frame)
+    assert detector.process_frames(frames, now=10.0, fps=10.0) is True
+    assert len(detector.last_tracks) == 2
+
+    handler = BotHandler()
+    handler.motion_detector = detector
+    handler.video_processor = MagicMock()
+    handler.video_processor.get_recent_frames.return_value = frames
+    handler.events_dir = str(tmp_path / "events")
+    store = EventStore(str(tmp_path / "events.db"))
+    try:
+        with patch('bot_handler.get_event_store', return_value=store):
+            event_id, sheet_path = await handler._record_event(5.0, now=10.0)
+
+        records = [store.get_event(track.event_id) for track in detector.last_tracks]
+        assert event_id == records[0].id
+        assert records[0].id != records[1].id
+        assert sorted(record.boxes[0][1] for record in records) == [20, 160]
+        assert all(record.trajectory for record in records)
+        assert all(record.thumbnail_path == sheet_path for record in records)
+    finally:
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_stop_monitoring_drains_pending_alert():
+    """Test shutdown lets an alert in progress finish instead of cancelling it."""
+    handler = BotHandler()
+    sent = []
+
+    async def monitor():
+        while handler.monitoring:
+            await asyncio.sleep(0.05)  # An upload in progress
+            sent.append(1)
+
+    handler.monitoring = True
+    handler.monitoring_task = asyncio.create_task(monitor())
+    await asyncio.sleep(0.01)
+    await handler.stop_monitoring(drain_timeout=1.0)
+
+    assert sent == [1]
+    assert not handler.monitoring_task.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_profile_command_admin_only():
+    """Test /profile is refused outside ADMIN_CHAT_IDS and sends a report to admins."""
+    handler = BotHandler()
+    handler.admin_chat_ids = {999}
+    handler.application = MagicMock()
+    handler.application.bot = AsyncMock()
+    update = MagicMock()
+    update.message = AsyncMock()
+    context = MagicMock()
+    context.args = ["1"]
+
+    update.effective_chat.id = 123
+    await handler.profile_command(update, context)
+    assert handler._profile_task is None
+
+    update.effective_chat.id = 999
+    await handler.profile_command(update, context)
+    await handler._profile_task
+    handler.application.bot.send_message.assert_called_once()
+    assert handler.application.bot.send_message.call_args.args[1].startswith("Profile (sample, 1s)")
+    handler.application.bot.send_document.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_apply_config_keeps_detector_state():
+    """Test live settings reach the running detector without replacing it."""
+    handler = BotHandler()
+    detector = handler.motion_detector
+    detector.last_detection = 42.0
+    config = MagicMock()
+    config.motion_threshold = 55
+    config.notification_delivery = "sheet"
+    config.notification_quiet_hours_start = 23
+
+    handler.apply_config(config)
+
+    assert handler.motion_detector is detector
+    assert detector.threshold == 55 and detector.last_detection == 42.0
+    assert handler.delivery == "sheet"
+    assert handler.subscribers.quiet_start == 23
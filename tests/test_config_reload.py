@@ -0,0 +1,98 @@
+"""Tests for config_reload module."""
+
+import os
+
+import pytest
+
+import config
+from config import ConfigError, get_config
+from config_reload import ConfigReloader
+from metrics import get_metrics
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    """Set required env vars and restore the global config afterwards."""
+    env_vars = {
+        "RTSP_URL": "rtsp://test",
+        "BOT_TOKEN": "token",
+        "CHAT_ID": "123",
+        "MOTION_THRESHOLD": "30",
+        "MOTION_SENSITIVITY": "0.5",
+        "MOTION_MIN_AREA": "1000",
+        "CACHE_DIR": "./cache",
+        "CACHE_MAX_SIZE_MB": "500",
+        "CACHE_COMPRESSION_ENABLED": "true",
+        "CACHE_CLEANUP_INTERVAL": "3600",
+        "STORAGE_BACKEND": "local",
+        "VIDEO_BUFFER_SECONDS": "30",
+        "VIDEO_MAX_DURATION": "60",
+        "VIDEO_QUALITY": "medium",
+        "NOTIFICATION_COOLDOWN_SECONDS": "300",
+        "NOTIFICATION_QUIET_HOURS_START": "22",
+        "NOTIFICATION_QUIET_HOURS_END": "7",
+        "LOG_LEVEL": "INFO",
+        "LOG_TO_FILE": "true",
+        "LOG_FILE_PATH": "./cache/logs/kdx-pi-cam.log",
+        "LOG_ROTATION_ENABLED": "true",
+        "LOG_MAX_FILE_SIZE_MB": "10",
+        "LOG_BACKUP_COUNT": "7"
+    }
+    for key, value in env_vars.items():
+        monkeypatch.setenv(key, value)
+    original = get_config()
+    yield
+    config.set_config(original)
+
+
+def test_apply_validates_and_notifies_listeners():
+    """Test a change swaps the config, reaches listeners and is recorded."""
+    reloader = ConfigReloader()
+    applied = []
+    reloader.add_listener(applied.append)
+    threshold = get_config().motion_threshold
+
+    changes = reloader.apply({"MOTION_THRESHOLD": str(threshold + 10)}, "/set")
+
+    assert changes == {"motion_threshold": (threshold, threshold + 10)}
+    assert get_config().motion_threshold == threshold + 10
+    assert applied == [get_config()]
+    assert reloader.apply({"motion_threshold": threshold + 10}, "/set") == {}
+    get_metrics().inc('motion_events_total')
+    (line,) = reloader.describe_history()
+    assert f"motion_threshold {threshold} -> {threshold + 10}" in line and "/h" in line
+
+
+def test_apply_rejects_fixed_and_invalid_settings():
+    """Test settings that need a restart and bad values leave the config unchanged."""
+    reloader = ConfigReloader()
+    before = get_config()
+    with pytest.raises(ConfigError):
+        reloader.apply({"rtsp_url": "rtsp://other"}, "/set")
+    with pytest.raises(ConfigError):
+        reloader.apply({"motion_min_area": "lots"}, "/set")
+    with pytest.raises(ConfigError):
+        reloader.apply({"notification_delivery": "gif"}, "/set")
+    assert get_config() is before
+    assert reloader.history == []
+
+
+@pytest.mark.asyncio
+async def test_check_file_applies_edited_lines(tmp_path):
+    """Test only settings edited in the env file after start are applied."""
+    env_file = tmp_path / ".env"
+    env_file.write_text("MOTION_MIN_AREA=1000\nCACHE_MAX_SIZE_MB=500\n")
+    reloader = ConfigReloader(str(env_file), watch_interval=60)
+    await reloader.start()
+    try:
+        reloader.apply({"cache_max_size_mb": 200}, "/set")
+        env_file.write_text("MOTION_MIN_AREA=2500\nCACHE_MAX_SIZE_MB=500\nRTSP_URL=rtsp://other\n")
+        os.utime(env_file, (0, 12345))
+
+        changes = reloader.check_file()
+    finally:
+        await reloader.stop()
+
+    assert changes == {"motion_min_area": (1000, 2500)}
+    assert get_config().cache_max_size_mb == 200  # /set value kept, file line unchanged
+    assert get_config().rtsp_url == "rtsp://test"
@@ -0,0 +1,117 @@
+"""Tests for encoder module."""
+
+import io
+import shutil
+import time
+from unittest.mock import MagicMock, patch
+
+import ffmpeg
+import numpy as np
+import pytest
+
+from encoder import (
+    ENCODER_PROFILES,
+    TELEGRAM_MAX_UPLOAD_BYTES,
+    EncoderPool,
+    EncoderWorker,
+    encoder_key,
+    ffmpeg_output_args,
+    frame_step,
+    get_encoder_profile,
+    max_clip_bytes,
+    output_size,
+    target_bitrate,
+)
+from metrics import MetricsRegistry
+
+
+def test_get_encoder_profile():
+    """Test quality names map to profiles, unknown falls back to medium."""
+    assert get_encoder_profile("HIGH") is ENCODER_PROFILES["high"]
+    assert get_encoder_profile("ultra") is ENCODER_PROFILES["medium"]
+
+
+def test_output_size_downscales_and_keeps_even():
+    """Test output size respects max height and even dimensions."""
+    low = ENCODER_PROFILES["low"]
+    assert output_size(1920, 1080, low) == (640, 360)
+    assert output_size(641, 361, ENCODER_PROFILES["high"]) == (640, 360)
+    assert output_size(320, 240, low) == (320, 240)
+
+
+def test_frame_step():
+    """Test decimation step from capture rate to profile rate."""
+    assert frame_step(10, ENCODER_PROFILES["low"]) == 2
+    assert frame_step(10, ENCODER_PROFILES["medium"]) == 1
+
+
+def test_max_clip_bytes_capped_by_telegram():
+    """Test the byte budget never exceeds Telegram's limit."""
+    assert max_clip_bytes(0) == TELEGRAM_MAX_UPLOAD_BYTES
+    assert max_clip_bytes(2) == 2 * 1024 * 1024
+    assert max_clip_bytes(500) == TELEGRAM_MAX_UPLOAD_BYTES
+
+
+def test_target_bitrate_fits_budget():
+    """Test the bitrate cap keeps the clip under the budget."""
+    bitrate = target_bitrate(1024 * 1024, 5.0)
+    assert bitrate * 5.0 / 8 < 1024 * 1024
+
+
+def test_ffmpeg_output_args_compile():
+    """Test generated arguments produce a valid ffmpeg command line."""
+    args = ffmpeg_output_args(ENCODER_PROFILES["medium"], 1920, 1080, 5.0, max_bytes=1024 * 1024)
+    cmd = ffmpeg.input('pipe:', format='rawvideo').output('out.mp4', **args).compile()
+    assert cmd[cmd.index('-preset') + 1] == 'veryfast'
+    assert cmd[cmd.index('-crf') + 1] == '27'
+    assert cmd[cmd.index('-vf') + 1] == 'scale=1280:720'
+    assert '-maxrate' in cmd and '-bufsize' in cmd
+    assert 'vf' not in ffmpeg_output_args(ENCODER_PROFILES["high"], 1920, 1080, 5.0)
+
+
+def test_encoder_pool_reuses_warm_worker_and_retries():
+    """Test warm workers are reused and a failed job is retried on a fresh worker."""
+    frames = [np.zeros((48, 64, 3), dtype=np.uint8)]
+    warm = MagicMock(alive=True)
+    warm.run.side_effect = RuntimeError("broken pipe")
+    fresh = MagicMock()
+    fresh.run.return_value = b"mp4"
+
+    pool = EncoderPool(size=0)
+    with patch('encoder.EncoderWorker', return_value=fresh) as worker_cls:
+        key = ("key",)
+        with patch('encoder.encoder_key', return_value=key):
+            pool._idle[key] = [warm]
+            assert pool.encode(frames, 10, {}) == b"mp4"
+
+    warm.run.assert_called_once()
+    worker_cls.assert_called_once_with(key)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg binary not found")
+def test_encoder_pool_encodes_with_ffmpeg():
+    """Test a real encode through a warm worker produces an MP4."""
+    frames = [np.full((48, 64, 3), i * 10, dtype=np.uint8) for i in range(10)]
+    args = ffmpeg_output_args(ENCODER_PROFILES["medium"], 64, 48, 1.0)
+    pool = EncoderPool(size=1)
+    pool.prewarm(encoder_key(64, 48, 10, args))
+    try:
+        data = pool.encode(frames, 10, args)
+    finally:
+        pool.shutdown()
+    assert data[4:8] == b"ftyp"
+
+
+def test_encoder_startup_measured_to_first_output():
+    """Test encoder_startup covers the time until the first encoded bytes."""
+    worker = EncoderWorker.__new__(EncoderWorker)
+    worker.process = MagicMock()
+    worker.process.stdout = io.BufferedReader(io.BytesIO(b"ftyp" + b"\0" * 100))
+    registry = MetricsRegistry()
+    chunks = []
+    with patch('encoder.get_metrics', return_value=registry):
+        worker._drain(chunks, time.perf_counter() - 0.5)
+
+    assert b"".join(chunks) == b"ftyp" + b"\0" * 100
+    startup = registry.histograms['encoder_startup']
+    assert startup.count == 1 and startup.sum >= 0.5
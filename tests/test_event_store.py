@@ -0,0 +1,83 @@
+"""Tests for event_store module."""
+
+from datetime import datetime
+
+import pytest
+
+from event_store import EventStore, parse_since
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Create an event store in a temporary directory."""
+    store = EventStore(str(tmp_path / "data" / "events.db"))
+    yield store
+    store.close()
+
+
+def test_add_and_get_event(store):
+    """Test inserting and fetching an event."""
+    event_id = store.add_event("porch", 1000.0, 1005.0, 0.25, [(1, 2, 30, 40)])
+    store.update_paths(event_id, thumbnail_path="/tmp/1.jpg", clip_path="/tmp/1.mp4")
+
+    event = store.get_event(event_id)
+    assert event.camera == "porch"
+    assert event.peak_score == 0.25
+    assert event.boxes == [(1, 2, 30, 40)]
+    assert event.thumbnail_path == "/tmp/1.jpg"
+    assert event.clip_path == "/tmp/1.mp4"
+    assert store.get_event(event_id + 1) is None
+
+
+def test_query_time_range(store):
+    """Test range queries return newest first and honour filters."""
+    for i in range(10):
+        store.add_event("porch" if i % 2 else "yard", 100.0 * i, 100.0 * i + 5, 0.1, [])
+
+    events = store.query(since=300.0, until=700.0)
+    assert [e.start_ts for e in events] == [600.0, 500.0, 400.0, 300.0]
+    assert [e.start_ts for e in store.query(300.0, 700.0, camera="porch")] == [500.0, 300.0]
+    assert len(store.query(0.0, 1000.0, limit=3)) == 3
+    assert store.count(300.0, 700.0) == 4
+
+
+def test_parse_since():
+    """Test /events range parsing."""
+    now = datetime(2024, 5, 1, 15, 30).timestamp()
+    assert parse_since("today", now) == datetime(2024, 5, 1).timestamp()
+    assert parse_since(None, now) == datetime(2024, 5, 1).timestamp()
+    assert parse_since("2h", now) == now - 7200
+    assert parse_since("30m", now) == now - 1800
+    with pytest.raises(ValueError):
+        parse_since("yesterday", now)
+
+
+def test_labels_column_added_to_existing_database(tmp_path):
+    """Test databases without the labels column are migrated in place."""
+    import sqlite3
+
+    db_path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, camera TEXT NOT NULL, "
+        "start_ts REAL NOT NULL, end_ts REAL NOT NULL, peak_score REAL NOT NULL, boxes TEXT NOT NULL, "
+        "thumbnail_path TEXT, clip_path TEXT)"
+    )
+    conn.execute("INSERT INTO events (camera, start_ts, end_ts, peak_score, boxes) VALUES ('a', 1, 2, 0.1, '[]')")
+    conn.commit()
+    conn.close()
+
+    store = EventStore(db_path)
+    assert store.get_event(1).labels == {}
+    store.update_labels(1, {"person": 0.9})
+    assert store.get_event(1).labels == {"person": 0.9}
+    store.close()
+
+
+def test_update_trajectory_extends_event(store):
+    """Test trajectories are stored and can extend the event end."""
+    event_id = store.add_event("porch", 1000.0, 1005.0, 0.25, [])
+    store.update_trajectory(event_id, [(1000.0, 10, 20), (1008.0, 30, 20)], end_ts=1008.0)
+    event = store.get_event(event_id)
+    assert event.trajectory == [(1000.0, 10, 20), (1008.0, 30, 20)]
+    assert event.end_ts == 1008.0
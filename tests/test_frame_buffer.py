@@ -0,0 +1,105 @@
+"""Tests for frame_buffer module."""
+
+import numpy as np
+import pytest
+
+from frame_buffer import FrameBuffer
+
+
+def make_frames(count, shape=(48, 64, 3)):
+    """Build distinct frames with a gradient so they compress realistically."""
+    base = np.tile(np.arange(shape[1], dtype=np.uint8), (shape[0], 1))[..., None].repeat(3, axis=2)
+    return [(base + i * 10).astype(np.uint8) for i in range(count)]
+
+
+def test_frame_and_byte_limits():
+    """Test the buffer honours both the frame count and the byte budget."""
+    frames = make_frames(6)
+    buffer = FrameBuffer(max_frames=4)
+    buffer.extend(frames)
+    assert len(buffer) == 4
+    assert buffer.recent(10) == frames[2:]
+
+    buffer = FrameBuffer(max_frames=100, max_bytes=frames[0].nbytes * 3)
+    buffer.extend(frames)
+    assert len(buffer) == 3
+    assert buffer.nbytes == frames[0].nbytes * 3
+    assert buffer.latest() is frames[-1]
+
+
+@pytest.mark.parametrize("mode", ["jpeg", "zlib"])
+def test_compressed_frames_shrink_and_decode(mode):
+    """Test older frames are compressed in the worker and decoded on demand."""
+    frames = make_frames(10)
+    buffer = FrameBuffer(max_frames=100, compression=mode, raw_frames=2)
+    buffer.extend(frames)
+    buffer.shutdown(wait=True)
+
+    assert buffer.nbytes < sum(frame.nbytes for frame in frames) / 2
+    decoded = buffer.recent(10)
+    assert [frame.shape for frame in decoded] == [frame.shape for frame in frames]
+    assert decoded[-1] is frames[-1]
+    if mode == "zlib":
+        assert all(np.array_equal(a, b) for a, b in zip(decoded, frames))
+    else:
+        assert np.abs(decoded[0].astype(int) - frames[0]).mean() < 3
+
+
+@pytest.mark.parametrize("mode", ["none", "jpeg"])
+def test_duplicates_stored_as_references(mode):
+    """Test near-identical frames cost no memory and expand back for clips."""
+    frames = make_frames(2)
+    noisy = frames[0].copy()
+    noisy[0, 0] += 3  # Sensor noise averages out in the signature
+    sequence = [frames[0], noisy, frames[0], frames[1], frames[1]]
+    buffer = FrameBuffer(max_frames=4, compression=mode, raw_frames=1, dedup_threshold=8)
+    stored = [buffer.append(frame) for frame in sequence]
+    buffer.shutdown(wait=True)
+
+    assert stored == [False, True, True, False, True]
+    # The oldest frame was evicted and its duplicates took over its data
+    assert len(buffer) == 4
+    decoded = buffer.recent(4)
+    assert decoded[0] is decoded[1]
+    assert decoded[2] is decoded[3]
+    assert np.array_equal(buffer.latest(), decoded[3])
+    assert np.abs(decoded[0].astype(int) - frames[0]).mean() < 3
+    assert len(buffer.recent(1)) == 1
+    if mode == "none":
+        assert buffer.nbytes == frames[0].nbytes * 2
+
+
+def test_clear_with_compressed_duplicates_and_restart():
+    """Test clearing a buffer whose cold frames include duplicates, then reusing it after shutdown."""
+    frame = make_frames(1)[0]
+    buffer = FrameBuffer(100, compression="jpeg", raw_frames=2, dedup_threshold=5)
+    buffer.extend([frame] * 6)
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.nbytes == 0
+
+    buffer.shutdown(wait=True)
+    buffer.extend(make_frames(5))
+    buffer.shutdown(wait=True)
+    assert len(buffer.recent(5)) == 5
+    assert buffer.nbytes < sum(f.nbytes for f in make_frames(5))
+
+
+@pytest.mark.parametrize("mode", ["jpeg", "zlib"])
+def test_evicting_cold_frame_keeps_encoded_data_for_duplicate(mode, monkeypatch):
+    """Test a compressed frame followed by its duplicate is not decoded on eviction."""
+    frames = make_frames(2)
+    buffer = FrameBuffer(max_frames=2, compression=mode, raw_frames=2, dedup_threshold=5)
+    buffer.extend([frames[0], frames[1], frames[1]])
+    buffer.shutdown(wait=True)
+    decoded = []
+    decode = buffer._decode
+    monkeypatch.setattr(buffer, "_decode", lambda entry: decoded.append(entry) or decode(entry))
+
+    # frames[1] goes cold, then is evicted while its duplicate heads the raw window
+    buffer.append(frames[0])
+    assert decoded == []
+    assert len(buffer) == 2
+    buffer.shutdown(wait=True)
+    recent = buffer.recent(2)
+    assert np.abs(recent[0].astype(int) - frames[1]).mean() < 3
+    assert recent[1] is frames[0]
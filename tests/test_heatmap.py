@@ -0,0 +1,57 @@
+"""Tests for heatmap module."""
+
+import numpy as np
+
+from heatmap import MotionHeatmap
+
+
+def test_accumulate_in_place_and_decay():
+    """Test masks accumulate into the same buffer and old motion decays."""
+    heatmap = MotionHeatmap(width=16, half_life_hours=1.0)
+    mask = np.zeros((90, 160), dtype=np.uint8)
+    mask[:, :80] = 255
+    heatmap.accumulate(mask, now=0.0)
+    buffer = heatmap.heat
+    heatmap.accumulate(mask, now=1800.0)
+    assert heatmap.heat is buffer
+    assert heatmap.heat.shape == (9, 16)
+    assert heatmap.heat[:, :8].min() > 0
+    assert heatmap.heat[:, 8:].max() == 0
+
+    peak = float(heatmap.heat.max())
+    heatmap.accumulate(np.zeros_like(mask), now=1800.0 + 3600.0)
+    assert np.isclose(float(heatmap.heat.max()), peak / 2, rtol=1e-3)
+
+
+def test_save_load_and_render(tmp_path):
+    """Test the heatmap survives a restart and renders over a frame."""
+    path = str(tmp_path / "heatmap.npz")
+    heatmap = MotionHeatmap(width=16, path=path)
+    assert heatmap.render(np.zeros((90, 160, 3), dtype=np.uint8)) is None
+    mask = np.zeros((90, 160), dtype=np.uint8)
+    mask[40:60, 40:60] = 255
+    heatmap.accumulate(mask)
+    heatmap.save()
+
+    restored = MotionHeatmap(width=16, path=path)
+    np.testing.assert_array_equal(restored.heat, heatmap.heat)
+    frame = np.full((90, 160, 3), 50, dtype=np.uint8)
+    overlay = restored.render(frame)
+    assert overlay.shape == frame.shape
+    assert not np.array_equal(overlay[50, 50], frame[50, 50])
+    assert np.array_equal(overlay[0, 0], frame[0, 0])
+
+
+def test_maybe_save_writes_a_snapshot_in_the_background(tmp_path):
+    """Test periodic saves write a copy of the heatmap on a worker thread."""
+    path = str(tmp_path / "heatmap.npz")
+    heatmap = MotionHeatmap(width=16, path=path, save_interval=0.0)
+    mask = np.zeros((90, 160), dtype=np.uint8)
+    mask[40:60, 40:60] = 255
+    heatmap.accumulate(mask, now=0.0)
+    heatmap._pending_save.result()
+    saved = heatmap.heat.copy()
+    heatmap.heat[:] = 0
+
+    restored = MotionHeatmap(width=16, path=path)
+    np.testing.assert_array_equal(restored.heat, saved)
@@ -0,0 +1,73 @@
+"""Tests for logging_utils module."""
+
+import logging
+
+from logging_utils import HOT_PATH, RateLimitFilter, start_queue_logging
+
+
+def make_record(msg, *args, level=logging.WARNING, hot=True):
+    """Build a log record as a logger call would, marked as hot path by default."""
+    record = logging.LogRecord("capture", level, __file__, 1, msg, args, None)
+    if hot:
+        record.__dict__.update(HOT_PATH)
+    return record
+
+
+def test_rate_limit_collapses_repeats(monkeypatch):
+    """Test repeats within the interval are dropped and then summarised."""
+    clock = [100.0]
+    monkeypatch.setattr("logging_utils.time.monotonic", lambda: clock[0])
+    log_filter = RateLimitFilter(interval=60)
+
+    assert log_filter.filter(make_record("Failed to read frame: %d", 1))
+    assert not log_filter.filter(make_record("Failed to read frame: %d", 2))
+    assert not log_filter.filter(make_record("Failed to read frame: %d", 3))
+    # Other messages and levels are limited independently
+    assert log_filter.filter(make_record("Failed to read frame: %d", 4, level=logging.ERROR))
+
+    clock[0] += 61
+    record = make_record("Failed to read frame: %d", 5)
+    assert log_filter.filter(record)
+    assert record.getMessage() == "Failed to read frame: 5 (2 similar messages suppressed)"
+    assert RateLimitFilter(interval=0).filter(make_record("x"))
+    # Messages not logged from a hot path are never limited
+    assert all(log_filter.filter(make_record("Started", hot=False)) for _ in range(3))
+
+
+def test_rate_limit_flush_reports_repeats_after_they_stop(monkeypatch):
+    """Test the timer summary reports repeats even if the message never comes back."""
+    clock = [100.0]
+    monkeypatch.setattr("logging_utils.time.monotonic", lambda: clock[0])
+    log_filter = RateLimitFilter(interval=60)
+    for i in range(4):
+        log_filter.filter(make_record("Failed to read frame: %d", i))
+
+    assert log_filter.flush() == []
+    clock[0] += 61
+    (summary,) = log_filter.flush()
+    assert summary.getMessage() == "Failed to read frame: 3 (3 similar messages in the last 60s)"
+    assert log_filter.filter(summary)
+    clock[0] += 61
+    assert log_filter.flush() == []
+
+
+def test_queue_logging_writes_on_listener_thread(tmp_path):
+    """Test records reach the target handler through the listener."""
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    path = tmp_path / "app.log"
+    handler = logging.FileHandler(path)
+    listener = start_queue_logging([handler], logging.INFO, "%(levelname)s %(message)s")
+    try:
+        logging.getLogger("test").info("frame %d", 7)
+        for _ in range(3):
+            logging.getLogger("test").warning("stalled", extra=HOT_PATH)
+    finally:
+        listener.stop()
+        handler.close()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+    # Pending repeats are summarised when the listener stops
+    assert path.read_text() == (
+        "INFO frame 7\nWARNING stalled\nWARNING stalled (2 similar messages in the last 60s)\n"
+    )
@@ -0,0 +1,97 @@
+"""Tests for metrics module."""
+
+import asyncio
+import time
+
+import pytest
+
+from metrics import Histogram, MetricsRegistry, MetricsServer, StartupTimer, get_metrics
+
+
+def test_histogram_observe_and_quantile():
+    """Test histogram bucketing and quantile estimate."""
+    histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.95) == 10.0
+    assert histogram.mean == pytest.approx(5.6 / 4)
+
+
+def test_histogram_overflow_bucket():
+    """Test values above the last bound land in the +Inf bucket and keep quantiles finite."""
+    registry = MetricsRegistry()
+    for value in (0.5, 75.0, 90.0):
+        registry.observe('upload', value)
+    histogram = registry.histograms['upload']
+
+    assert histogram.overflow == 2
+    assert sum(histogram.counts) == 1
+    assert histogram.quantile(0.95) == 90.0
+    assert 'kdx_stage_duration_seconds_bucket{stage="upload",le="60"} 1' in registry.render_prometheus()
+    assert 'kdx_stage_duration_seconds_bucket{stage="upload",le="+Inf"} 3' in registry.render_prometheus()
+    summary = registry.summary()
+    assert "upload: n=3" in summary and "p95<=90000ms (2 over 60s)" in summary
+    assert "inf" not in summary
+
+
+def test_registry_render_prometheus():
+    """Test Prometheus text rendering of counters, gauges and histograms."""
+    registry = MetricsRegistry()
+    registry.inc('frames_captured_total', 3)
+    registry.set_gauge('capture_fps', 9.5)
+    with registry.timer('detection'):
+        pass
+
+    text = registry.render_prometheus()
+    assert "# TYPE kdx_frames_captured_total counter" in text
+    assert "kdx_frames_captured_total 3" in text
+    assert "kdx_capture_fps 9.5" in text
+    assert 'kdx_stage_duration_seconds_count{stage="detection"} 1' in text
+    assert 'kdx_stage_duration_seconds_bucket{stage="detection",le="+Inf"} 1' in text
+
+
+def test_registry_summary():
+    """Test the /stats summary text."""
+    registry = MetricsRegistry()
+    registry.inc('frames_dropped_total', 2)
+    registry.observe('clip_encode', 0.3)
+
+    summary = registry.summary()
+    assert "Frames dropped: 2" in summary
+    assert "clip_encode: n=1" in summary
+
+
+@pytest.mark.asyncio
+async def test_metrics_server_serves_metrics():
+    """Test the HTTP endpoint returns the rendered registry."""
+    registry = MetricsRegistry()
+    registry.inc('reconnects_total')
+    server = MetricsServer(registry, "127.0.0.1", 0)
+    await server.start()
+    port = server.server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    finally:
+        await server.stop()
+
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert b"kdx_reconnects_total 1" in response
+
+
+def test_startup_timer_milestones():
+    """Test startup milestones are measured from process start and exported."""
+    timer = StartupTimer(started_at=time.perf_counter() - 1.0)
+    timer.mark('polling')
+    timer.mark('components')
+
+    assert 1.0 <= timer.milestones['polling'] <= timer.milestones['components']
+    assert timer.summary().startswith("polling 1.")
+    assert get_metrics().gauges['startup_components_seconds'] == timer.milestones['components']
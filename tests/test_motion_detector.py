@@ -1,5 +1,9 @@
 """Tests for motion_detector module."""
 
+import threading
+from unittest.mock import MagicMock
+
+import cv2
 import numpy as np
 import pytest
 
@@ -73,4 +77,129 @@ def test_detect_in_buffer_cooldown(monkeypatch):
     assert detector.detect_in_buffer(frames)
 
     # Second should be blocked by cooldown
-    assert not detector.detect_in_buffer(frames)
\ No newline at end of file
+    assert not detector.detect_in_buffer(frames)
+
+
+def test_analyze_reports_score_and_boxes():
+    """Test analyze returns a score and bounding boxes."""
+    detector = MotionDetector()
+    frame1 = np.zeros((100, 100, 3), dtype=np.uint8)
+    frame2 = frame1.copy()
+    frame2[10:60, 20:70] = 255
+
+    result = detector.analyze(frame1, frame2)
+    assert result.detected
+    assert result.score == pytest.approx(0.25)
+    assert result.boxes == [(20, 10, 50, 50)]
+
+
+def test_build_contact_sheet_picks_peak_frames():
+    """Test the contact sheet tiles the highest-motion frames in order."""
+    detector = MotionDetector()
+    frames = [np.zeros((60, 80, 3), dtype=np.uint8) for _ in range(8)]
+    frames[3] = np.full((60, 80, 3), 200, dtype=np.uint8)
+    frames[6] = np.full((60, 80, 3), 100, dtype=np.uint8)
+
+    scores = detector.frame_scores(frames)
+    assert scores[0] == 0
+    assert scores[3] == pytest.approx(1.0)
+
+    sheet = detector.build_contact_sheet(frames, count=4, columns=2, tile_width=40)
+    assert sheet.shape == (60, 80, 3)
+    # Frames 3, 4, 6 and 7 changed most and are tiled in chronological order
+    assert sheet[:30, :40].min() == 200
+    assert sheet[:30, 40:].max() == 0
+    assert sheet[30:, :40].min() == 100
+    assert detector.build_contact_sheet([]) is None
+
+
+@pytest.mark.asyncio
+async def test_generate_contact_sheet_encodes_off_the_event_loop(monkeypatch, tmp_path):
+    """Test the contact sheet is built and encoded in a worker thread."""
+    detector = MotionDetector()
+    threads = []
+    encode = detector.encode_contact_sheet
+
+    def record_thread(*args):
+        threads.append(threading.get_ident())
+        return encode(*args)
+
+    monkeypatch.setattr(detector, "encode_contact_sheet", record_thread)
+    monkeypatch.setattr("motion_detector.get_cache_manager", lambda: MagicMock(cache_dir=str(tmp_path)))
+    frames = [np.full((60, 80, 3), i * 20, dtype=np.uint8) for i in range(6)]
+
+    path = await detector.generate_contact_sheet(frames)
+    assert threads and threads[0] != threading.get_ident()
+    assert cv2.imread(path) is not None
+    assert await detector.generate_contact_sheet([]) is None
+
+
+def test_process_frames_one_event_per_track():
+    """Test tracked detection fires once per persistent object."""
+    from tracker import CentroidTracker
+
+    detector = MotionDetector()
+    detector.cooldown = 0
+    detector.tracker = CentroidTracker(min_hits=3)
+    frames = []
+    for i in range(8):
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        frame[80:160, 20 + i * 20:80 + i * 20] = 255
+        frames.append(frame)
+
+    assert detector.process_frames(frames[:2], now=1.0) is False
+    assert detector.process_frames(frames[2:5], now=2.0) is True
+    assert detector.last_tracks[0].hits >= 3
+    assert detector.process_frames(frames[5:], now=3.0) is False
+
+
+def test_illumination_change_suppressed():
+    """Test a global brightness change is normalised out while local motion is kept."""
+    from metrics import get_metrics
+
+    detector = MotionDetector()
+    detector.illumination_compensation = True
+    rng = np.random.default_rng(0)
+    scene = rng.integers(0, 120, (120, 160, 3), dtype=np.uint8)
+    brighter = np.clip(scene.astype(np.int16) * 1.5 + 40, 0, 255).astype(np.uint8)
+
+    before = get_metrics().get_counter('illumination_suppressed_total')
+    assert not detector.detect_in_buffer([scene, brighter])
+    assert get_metrics().get_counter('illumination_suppressed_total') == before + 1
+
+    moved = brighter.copy()
+    moved[20:80, 20:80] = 255
+    result = detector.analyze(scene, moved)
+    assert result.detected and not result.suppressed
+
+
+def test_duplicate_frames_skipped(monkeypatch):
+    """Test deduplicated frames are not analysed again."""
+    detector = MotionDetector()
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    calls = []
+    analyze = detector.analyze
+    monkeypatch.setattr(detector, "analyze", lambda a, b: calls.append(1) or analyze(a, b))
+
+    assert not detector.detect_in_buffer([frame, frame, frame, frame.copy()])
+    assert len(calls) == 1
+
+
+def test_detection_pass_updates_heatmap_once():
+    """Test a pass over several frame pairs adds all their motion in one heatmap update."""
+    detector = MotionDetector()
+    detector.cooldown = 0
+    detector.heatmap = MagicMock()
+    frames = []
+    for i in range(4):
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        frame[80:160, 20 + i * 80:80 + i * 80] = 255
+        frames.append(frame)
+
+    detector.detect_in_buffer(frames, now=10.0)
+
+    detector.heatmap.accumulate.assert_called_once()
+    mask, now = detector.heatmap.accumulate.call_args.args
+    assert now == 10.0
+    assert mask[120, 30] == 255
+    assert mask[120, 270] == 255
@@ -0,0 +1,64 @@
+"""Tests for object_classifier module."""
+
+from unittest.mock import MagicMock, patch
+
+import cv2
+import numpy as np
+import pytest
+
+from object_classifier import Detection, ObjectClassifier, crop_box, summarize_labels
+
+
+def test_crop_box_pads_and_clips():
+    """Test crops are padded around the box and clipped to the frame."""
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    crop, offset = crop_box(frame, (0, 40, 40, 40))
+    assert offset == (0, 30)
+    assert crop.shape == (60, 50, 3)
+
+
+@pytest.mark.skipif(not hasattr(cv2, 'HOGDescriptor'), reason="OpenCV build without HOG")
+def test_hog_backend_runs_on_small_crops():
+    """Test the HOG backend upscales crops smaller than its window."""
+    classifier = ObjectClassifier("hog")
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    assert classifier.classify(frame, [(10, 10, 20, 20)]) == []
+    classifier.shutdown()
+
+
+def test_dnn_backend_maps_detections_to_frame(tmp_path):
+    """Test SSD output rows become labelled detections in frame coordinates."""
+    labels_path = tmp_path / "labels.txt"
+    labels_path.write_text("background\ncat\nperson\n")
+    net = MagicMock()
+    net.forward.return_value = np.array([[[
+        [0, 2, 0.9, 0.0, 0.0, 0.5, 0.5],
+        [0, 1, 0.2, 0.0, 0.0, 1.0, 1.0],
+    ]]], dtype=np.float32)
+    with patch('object_classifier.cv2.dnn.readNet', return_value=net):
+        classifier = ObjectClassifier("dnn", model_path="model.caffemodel", labels_path=str(labels_path))
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+        detections = classifier.classify_crop(frame, (50, 50, 100, 100))
+    assert detections == [Detection("person", pytest.approx(0.9), (25, 25, 75, 75))]
+    assert classifier.matches(detections)
+    classifier.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_classify_event_runs_once_per_event():
+    """Test an event is classified once and the result reused."""
+    classifier = ObjectClassifier("dnn", classes=["person"], model_path="model.onnx")
+    frame = np.zeros((100, 100, 3), dtype=np.uint8)
+    found = [Detection("person", 1.2, (0, 0, 10, 20))]
+    with patch.object(classifier, 'classify_crop', return_value=found) as classify_crop:
+        first = await classifier.classify_event(1, frame, [(0, 0, 50, 50)])
+        second = await classifier.classify_event(1, frame, [(0, 0, 50, 50)])
+    assert first == second == found
+    assert classify_crop.call_count == 1
+    classifier.shutdown()
+
+
+def test_summarize_labels_keeps_peak_confidence():
+    """Test labels are reduced to their highest confidence."""
+    detections = [Detection("person", 0.6, (0, 0, 1, 1)), Detection("person", 0.8, (0, 0, 1, 1))]
+    assert summarize_labels(detections) == {"person": 0.8}
@@ -0,0 +1,78 @@
+"""Tests for preview_server module."""
+
+import asyncio
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from preview_server import BOUNDARY, PreviewServer
+from snapshot_cache import SnapshotCache
+
+
+class FakeProcessor:
+    """Frame source returning a fixed frame."""
+
+    def __init__(self, frame=None):
+        self.seq = 1
+        self.frame = frame
+
+    def get_latest_frame(self):
+        return self.seq, self.frame
+
+
+async def request(port, path, until=None):
+    """Send a GET request and read the response, or read up to a marker."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    if until:
+        data = await asyncio.wait_for(reader.readuntil(until), timeout=5)
+    else:
+        data = await asyncio.wait_for(reader.read(), timeout=5)
+    writer.close()
+    return data
+
+
+@pytest.fixture
+def cache():
+    """Use an isolated snapshot cache."""
+    cache = SnapshotCache()
+    with patch('preview_server.get_snapshot_cache', return_value=cache):
+        yield cache
+
+
+@pytest.mark.asyncio
+async def test_snapshot_without_frames(cache):
+    """Test /snapshot.jpg reports no frames before capture starts."""
+    server = PreviewServer(FakeProcessor(), "127.0.0.1", 0)
+    await server.start()
+    port = server.server.sockets[0].getsockname()[1]
+    try:
+        response = await request(port, "/snapshot.jpg")
+    finally:
+        await server.stop()
+    assert response.startswith(b"HTTP/1.1 503")
+
+
+@pytest.mark.asyncio
+async def test_mjpeg_fans_out_single_encode(cache):
+    """Test two viewers receive the same frame encoded once."""
+    processor = FakeProcessor(np.zeros((48, 64, 3), dtype=np.uint8))
+    server = PreviewServer(processor, "127.0.0.1", 0, fps=50)
+    await server.start()
+    port = server.server.sockets[0].getsockname()[1]
+    try:
+        with patch('snapshot_cache.encode_jpeg', return_value=b"\xff\xd8jpeg\xff\xd9") as encode:
+            first, second = await asyncio.gather(
+                request(port, "/mjpeg", until=b"\xff\xd9"),
+                request(port, "/mjpeg", until=b"\xff\xd9"),
+            )
+    finally:
+        await server.stop()
+
+    for response in (first, second):
+        assert b"multipart/x-mixed-replace" in response
+        assert f"--{BOUNDARY}".encode() in response
+        assert b"\xff\xd8jpeg\xff\xd9" in response
+    assert encode.call_count == 1
@@ -0,0 +1,49 @@
+"""Tests for profiler module."""
+
+import asyncio
+import marshal
+import time
+
+import pytest
+
+from profiler import Profiler
+
+
+async def block_loop(seconds):
+    """Hold the event loop without yielding."""
+    await asyncio.sleep(0.05)
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_sample_profile_attributes_blocking_to_task():
+    """Test a loop stall is reported with the task that caused it."""
+    asyncio.create_task(block_loop(0.3), name="blocker")
+    report = await Profiler("sample", block_threshold=0.1).run(0.6)
+
+    assert "Loop blocked over 100 ms: 1 time(s)" in report.summary
+    assert "blocker (block_loop)" in report.summary
+    assert "block_loop (test_profiler.py" in report.summary
+    (name, data), = report.files.items()
+    assert name.endswith(".txt")
+    assert b"Thread stacks at end:" in data
+
+
+@pytest.mark.asyncio
+async def test_cprofile_writes_pstats_file():
+    """Test cProfile mode ranks functions and exports pstats data."""
+    asyncio.create_task(block_loop(0.05))
+    report = await Profiler("cprofile").run(0.2)
+
+    prof = next(data for name, data in report.files.items() if name.endswith(".prof"))
+    stats = marshal.loads(prof)
+    assert any(func[2] == "block_loop" for func in stats)
+    assert "calls function" in report.summary
+
+
+def test_unknown_mode_rejected():
+    """Test an unknown profile mode raises ValueError."""
+    with pytest.raises(ValueError):
+        Profiler("perf")
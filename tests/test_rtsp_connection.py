@@ -0,0 +1,105 @@
+"""Tests for rtsp_connection module."""
+
+import threading
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+
+from metrics import get_metrics
+from rtsp_connection import BACKOFF_JITTER, STANDBY_FAILED_READS, RTSPConnection
+
+
+def make_capture(opened=True, read=None):
+    """Build a mock capture returning a frame, or running a custom read."""
+    cap = MagicMock()
+    cap.isOpened.return_value = opened
+    cap.read.side_effect = read or (lambda: (True, np.zeros((4, 4, 3), dtype=np.uint8)))
+    return cap
+
+
+def test_backoff_grows_with_jitter_up_to_max():
+    """Test reconnect delays double per failure and stay within the cap."""
+    connection = RTSPConnection("rtsp://test", backoff_initial=1.0, backoff_max=8.0)
+    assert connection.backoff_delay() == 0.0
+    for failures, base in ((1, 1.0), (2, 2.0), (3, 4.0), (6, 8.0)):
+        connection.failures = failures
+        delay = connection.backoff_delay()
+        assert base * (1 - BACKOFF_JITTER) <= delay <= base * (1 + BACKOFF_JITTER)
+
+
+@pytest.mark.asyncio
+async def test_failed_open_counts_and_lowers_health():
+    """Test a failed open is counted and leaves no capture."""
+    connection = RTSPConnection("rtsp://test")
+    with patch('rtsp_connection.cv2.VideoCapture', return_value=make_capture(opened=False)):
+        assert not await connection.open()
+    assert connection.failures == 1
+    assert connection.cap is None
+    assert connection.health == 0.0
+
+
+@pytest.mark.asyncio
+async def test_hung_read_drops_stream_and_reopens():
+    """Test a hung read drops the stream and a reconnect without a standby opens a new capture."""
+    release = threading.Event()
+    hung = make_capture(read=lambda: (release.wait(5), None))
+    fresh = make_capture()
+    connection = RTSPConnection("rtsp://test", read_timeout=0.05, standby=True)
+    stalls = get_metrics().get_counter('stream_stalls_total')
+    swaps = get_metrics().get_counter('standby_swaps_total')
+
+    with patch('rtsp_connection.cv2.VideoCapture', side_effect=[hung, fresh]):
+        assert await connection.open()
+        assert await connection.read() == (False, None)
+        assert connection.cap is None
+        assert connection._standby is None
+        assert get_metrics().get_counter('stream_stalls_total') == stalls + 1
+        # The hung capture is only released once its read returns
+        hung.release.assert_not_called()
+
+        assert await connection.reconnect()
+        assert connection.cap is fresh
+        assert get_metrics().get_counter('standby_swaps_total') == swaps
+        ok, frame = await connection.read()
+        assert ok and frame.shape == (4, 4, 3)
+
+    release.set()
+    connection.release()
+    fresh.release.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_standby_opens_on_failing_reads_and_swaps_in_on_stall():
+    """Test the standby opens while the failing stream stays up and replaces it only on a stall."""
+    reads = iter([True] + [False] * 10)
+    flaky = make_capture(read=lambda: (next(reads), np.zeros((4, 4, 3), dtype=np.uint8)))
+    standby = make_capture()
+    connection = RTSPConnection("rtsp://test", stall_seconds=60.0, standby=True)
+    swaps = get_metrics().get_counter('standby_swaps_total')
+
+    with patch('rtsp_connection.cv2.VideoCapture', side_effect=[flaky, standby]) as capture:
+        assert await connection.open()
+        assert (await connection.read())[0]
+        for _ in range(STANDBY_FAILED_READS - 1):
+            assert (await connection.read())[0] is False
+        assert connection._standby is None
+
+        # A run of failed reads opens the standby ahead of need; the primary stays active
+        assert (await connection.read())[0] is False
+        assert connection._standby is not None
+        await connection._standby
+        assert capture.call_count == 2
+        assert connection.cap is flaky
+
+        # Once no frame arrived for stall_seconds the stream is dropped and the standby swapped in
+        connection.last_frame_at -= 60.0
+        assert (await connection.read())[0] is False
+        assert connection.cap is None
+        assert await connection.reconnect()
+        assert connection.cap is standby
+        assert get_metrics().get_counter('standby_swaps_total') == swaps + 1
+
+    executor = connection._executor
+    connection.release()
+    assert connection._executor is None and executor._shutdown
@@ -0,0 +1,52 @@
+"""Tests for runtime module."""
+
+import asyncio
+
+import pytest
+
+from runtime import Runtime
+
+
+def recorder(log, event):
+    """Build a step that records its name."""
+    async def step():
+        log.append(event)
+    return step
+
+
+@pytest.mark.asyncio
+async def test_services_start_in_order_and_stop_in_reverse():
+    """Test run() starts services in order and stops them in reverse on request."""
+    log = []
+    runtime = Runtime()
+    for name in ("encoders", "bot", "cache"):
+        runtime.add(name, recorder(log, f"start {name}"), recorder(log, f"stop {name}"))
+
+    task = asyncio.create_task(runtime.run())
+    while len(log) < 3:
+        await asyncio.sleep(0)
+    runtime.request_stop()
+    await task
+
+    assert log == ["start encoders", "start bot", "start cache", "stop cache", "stop bot", "stop encoders"]
+
+
+@pytest.mark.asyncio
+async def test_start_failure_stops_started_services():
+    """Test a failing service stops the ones already started, and slow stops time out."""
+    log = []
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    runtime = Runtime(stop_timeout=0.05)
+    runtime.add("encoders", recorder(log, "start encoders"), recorder(log, "stop encoders"))
+    runtime.add("bot", stop=hang)
+    runtime.add("cache", fail, recorder(log, "stop cache"))
+
+    with pytest.raises(RuntimeError):
+        await runtime.start()
+    assert log == ["start encoders", "stop encoders"]
@@ -0,0 +1,57 @@
+"""Tests for snapshot_cache module."""
+
+import asyncio
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+
+from snapshot_cache import SnapshotCache, encode_jpeg
+
+
+def test_encode_jpeg_downscales():
+    """Test JPEG encoding with an output width."""
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    data = encode_jpeg(frame, width=50)
+    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == (25, 50, 3)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_encode():
+    """Test many requesters of the same frame trigger a single encode."""
+    cache = SnapshotCache()
+    frame = np.zeros((40, 40, 3), dtype=np.uint8)
+    with patch('snapshot_cache.encode_jpeg', return_value=b"jpeg") as encode:
+        results = await asyncio.gather(*(cache.get_jpeg(7, frame) for _ in range(5)))
+        assert await cache.get_jpeg(7, frame) == b"jpeg"
+    assert results == [b"jpeg"] * 5
+    assert encode.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction():
+    """Test the least recently used snapshot is evicted."""
+    cache = SnapshotCache(max_entries=2)
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    with patch('snapshot_cache.encode_jpeg', return_value=b"jpeg") as encode:
+        await cache.get_jpeg(1, frame)
+        await cache.get_jpeg(2, frame)
+        await cache.get_jpeg(1, frame)
+        await cache.get_jpeg(3, frame)
+        await cache.get_jpeg(1, frame)
+        assert encode.call_count == 3
+        await cache.get_jpeg(2, frame)
+        assert encode.call_count == 4
+
+
+def test_file_id_memo():
+    """Test Telegram file_ids are memoized per artifact."""
+    cache = SnapshotCache(max_file_ids=1)
+    artifact = cache.snapshot_artifact(3)
+    assert cache.get_file_id(artifact) is None
+    cache.remember_file_id(artifact, "abc")
+    assert cache.get_file_id(artifact) == "abc"
+    cache.remember_file_id("file:/tmp/1.mp4", "def")
+    assert cache.get_file_id(artifact) is None
@@ -0,0 +1,54 @@
+"""Tests for subscribers module."""
+
+from subscribers import Subscriber, SubscriberRegistry, parse_chat_ids
+
+
+def test_parse_chat_ids():
+    """Test comma-separated CHAT_ID parsing skips invalid entries."""
+    assert parse_chat_ids("123, -100456,,abc") == [123, -100456]
+
+
+def test_subscriber_quiet_hours():
+    """Test per-subscriber quiet hours override the defaults."""
+    default = Subscriber(1)
+    assert default.is_quiet(23, 22, 7)
+    assert not default.is_quiet(12, 22, 7)
+    custom = Subscriber(2, quiet_start=9, quiet_end=17)
+    assert custom.is_quiet(12, 22, 7)
+    assert not custom.is_quiet(23, 22, 7)
+    assert not Subscriber(3, quiet_start=0, quiet_end=0).is_quiet(5, 22, 7)
+
+
+def test_registry_persists_and_filters(tmp_path):
+    """Test subscribers persist to disk and recipients honour cameras and quiet hours."""
+    path = str(tmp_path / "subscribers.json")
+    registry = SubscriberRegistry(path, 22, 7, [100])
+    for chat_id in (200, 300, 400):
+        registry.add(chat_id)
+    registry.update(300, cameras=["garage"])
+    registry.update(400, quiet_start=9, quiet_end=17)
+    # Settings never subscribe a chat on their own
+    assert registry.update(500, cameras=["garage"]) is None
+    assert registry.get(500) is None
+
+    reloaded = SubscriberRegistry(path, 22, 7)
+    assert reloaded.get(300).cameras == ["garage"]
+    assert [s.chat_id for s in reloaded.recipients("front", 12)] == [100, 200]
+    assert [s.chat_id for s in reloaded.recipients("garage", 23)] == [400]
+
+    assert reloaded.remove(200)
+    assert not reloaded.remove(200)
+    assert SubscriberRegistry(path, 22, 7).get(200) is None
+
+
+def test_initial_chats_seed_only_a_new_registry(tmp_path):
+    """Test CHAT_ID seeds a new registry but does not resubscribe a chat that left."""
+    path = str(tmp_path / "subscribers.json")
+    registry = SubscriberRegistry(path, 22, 7, [100])
+    assert registry.get(100) is not None
+    registry.add(200)
+    assert registry.remove(100)
+
+    restarted = SubscriberRegistry(path, 22, 7, [100])
+    assert restarted.get(100) is None
+    assert restarted.get(200) is not None
@@ -0,0 +1,65 @@
+"""Tests for timelapse module."""
+
+import os
+import shutil
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from timelapse import TimelapseRecorder
+
+
+def fake_popen(command, **kwargs):
+    """Mock FFmpeg process that writes its output file on exit."""
+    process = MagicMock()
+    process.written = 0
+
+    def write(data):
+        process.written += len(data)
+
+    def wait(timeout=None):
+        output = next(arg for arg in command if arg.endswith('.part'))
+        with open(output, 'wb') as f:
+            f.write(b"mp4")
+        return 0
+
+    process.stdin.write.side_effect = write
+    process.wait.side_effect = wait
+    return process
+
+
+def test_sample_downscales_and_rolls_over_at_midnight(tmp_path):
+    """Test frames are resized to even dimensions and a new day starts a new file."""
+    recorder = TimelapseRecorder(str(tmp_path), "cam", width=100)
+    frame = np.zeros((75, 201, 3), dtype=np.uint8)
+    day1 = datetime(2024, 5, 1, 23, 59, 50).timestamp()
+    day2 = datetime(2024, 5, 2, 0, 0, 0).timestamp()
+    with patch('timelapse.subprocess.Popen', side_effect=fake_popen) as popen:
+        recorder.sample(frame, day1)
+        recorder.sample(frame, day1 + 5)
+        first = recorder.segment
+        assert first.size == (100, 36)
+        assert first.process.written == 2 * 100 * 36 * 3
+
+        recorder.sample(frame, day2)
+        assert popen.call_count == 2
+        assert os.path.exists(tmp_path / "cam-20240501-235950.mp4")
+        assert not os.path.exists(first.part_path)
+
+        path = recorder.finalize()
+    assert path == str(tmp_path / "cam-20240502-000000.mp4")
+    assert recorder.finalize() is None
+    assert recorder.latest_file() in (path, str(tmp_path / "cam-20240501-235950.mp4"))
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg binary not found")
+def test_timelapse_encodes_with_ffmpeg(tmp_path):
+    """Test a real low-priority encode produces an MP4."""
+    recorder = TimelapseRecorder(str(tmp_path), "cam", width=64)
+    for i in range(10):
+        recorder.sample(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+    path = recorder.finalize()
+    with open(path, 'rb') as f:
+        assert f.read(8)[4:8] == b"ftyp"
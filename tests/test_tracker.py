@@ -0,0 +1,46 @@
+"""Tests for tracker module."""
+
+import numpy as np
+
+from tracker import CentroidTracker, iou_matrix
+
+
+def test_iou_matrix():
+    """Test pairwise IoU of (x, y, w, h) boxes."""
+    ious = iou_matrix([(0, 0, 10, 10)], [(0, 0, 10, 10), (5, 0, 10, 10), (50, 50, 5, 5)])
+    np.testing.assert_allclose(ious, [[1.0, 50 / 150, 0.0]], rtol=1e-5)
+
+
+def test_track_confirmed_after_min_hits():
+    """Test a moving box keeps one id and is confirmed once it persists."""
+    tracker = CentroidTracker(min_hits=3, max_misses=1)
+    assert tracker.update([(0, 0, 40, 40)], 0.0) == []
+    assert tracker.update([(10, 0, 40, 40)], 0.1) == []
+    confirmed = tracker.update([(20, 0, 40, 40)], 0.2)
+    assert [track.id for track in confirmed] == [1]
+    assert tracker.update([(30, 0, 40, 40)], 0.3) == []
+    assert [point[1] for point in tracker.tracks[0].trajectory] == [20, 30, 40, 50]
+
+
+def test_flicker_never_confirmed():
+    """Test boxes appearing for a single frame at different places do not fire."""
+    tracker = CentroidTracker(min_hits=3, max_misses=0, max_distance=20)
+    confirmed = []
+    for i, box in enumerate([(0, 0, 10, 10), (200, 200, 10, 10), (0, 300, 10, 10), (300, 0, 10, 10)]):
+        confirmed += tracker.update([box], float(i))
+    assert confirmed == []
+
+
+def test_finished_tracks_keep_trajectory():
+    """Test confirmed tracks are reported once they disappear."""
+    tracker = CentroidTracker(min_hits=2, max_misses=1)
+    tracker.update([(0, 0, 20, 20)], 0.0)
+    tracker.update([(5, 0, 20, 20)], 0.1)
+    tracker.update([], 0.2)
+    assert tracker.pop_finished() == []
+    tracker.update([], 0.3)
+    finished = tracker.pop_finished()
+    assert len(finished) == 1
+    assert finished[0].duration == 0.1
+    assert len(finished[0].trajectory) == 2
+    assert tracker.tracks == []
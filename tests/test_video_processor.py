@@ -87,4 +87,76 @@ async def test_capture_photo():
 
     photo = await processor.capture_photo()
     assert photo is not None
-    assert isinstance(photo, np.ndarray)
\ No newline at end of file
+    assert isinstance(photo, np.ndarray)
+
+
+@pytest.mark.asyncio
+async def test_get_latest_frame_sequence():
+    """Test sequence numbers advance with every appended frame."""
+    processor = VideoProcessor("rtsp://test")
+    assert processor.get_latest_frame() == (0, None)
+
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    processor.feed_frame(frame)
+    processor.feed_frame(frame)
+    seq, latest = processor.get_latest_frame()
+    assert seq == 2
+    assert latest is frame
+
+
+@pytest.mark.asyncio
+async def test_get_frames_since():
+    """Test only frames newer than a sequence number are returned."""
+    processor = VideoProcessor("rtsp://test")
+    processor.buffer_size = 3
+    frames = [np.full((2, 2, 3), i, dtype=np.uint8) for i in range(5)]
+    for frame in frames[:2]:
+        processor.feed_frame(frame)
+    seq, new = processor.get_frames_since(0)
+    assert seq == 2 and new == frames[:2]
+    for frame in frames[2:]:
+        processor.feed_frame(frame)
+    seq, new = processor.get_frames_since(seq)
+    assert seq == 5 and new == frames[2:]
+    assert processor.get_frames_since(seq) == (5, [])
+
+
+@pytest.mark.asyncio
+async def test_generate_animation(tmp_path):
+    """Test a GIF preview is written from the buffered frames."""
+    processor = VideoProcessor("rtsp://test")
+    for i in range(20):
+        processor.feed_frame(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+
+    with patch('video_processor.get_cache_manager') as get_cache:
+        get_cache.return_value.cache_dir = str(tmp_path)
+        path = await processor.generate_animation(2.0)
+
+    with open(path, 'rb') as f:
+        assert f.read(6) == b"GIF89a"
+
+
+@pytest.mark.asyncio
+async def test_clips_of_any_length_match_the_prewarmed_encoder(tmp_path):
+    """Test clip encoder arguments do not depend on the clip length, so warm workers are reused."""
+    from encoder import encoder_key
+
+    processor = VideoProcessor("rtsp://test")
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    pool = MagicMock()
+    pool.encode.return_value = b"mp4"
+    with patch('video_processor.get_encoder_pool', return_value=pool), \
+            patch('video_processor.get_cache_manager') as get_cache:
+        get_cache.return_value.cache_dir = str(tmp_path)
+        processor._prewarm_encoder(frame)
+        await processor._prewarm_future
+        for _ in range(12):
+            processor.feed_frame(frame)
+        await processor.generate_clip(1.0)
+        for _ in range(40):
+            processor.feed_frame(frame)
+        await processor.generate_clip(5.0)
+
+    (prewarm_key,), _ = pool.prewarm.call_args
+    keys = [encoder_key(64, 48, fps, args) for (_, fps, args), _ in pool.encode.call_args_list]
+    assert keys == [prewarm_key, prewarm_key]
@@ -0,0 +1,255 @@
+"""Daily time-lapse recording for kdx-pi-cam.
+
+This module samples the newest captured frame at a fixed interval and
+streams it into a long-running, low-priority FFmpeg process writing a
+fragmented MP4, so no footage is kept in memory or on disk beyond the
+encoded time-lapse itself. A segment is finalised at midnight, when the
+frame size changes, or on demand by /timelapse.
+"""
+
+import asyncio
+import glob
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Callable, Optional, Tuple
+
+import cv2
+import ffmpeg
+import numpy as np
+
+from config import get_config
+from logging_utils import HOT_PATH
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Niceness added to the time-lapse encoder so capture and clips always win
+ENCODER_NICE_INCREMENT = 19
+
+TIMELAPSE_DIRNAME = "timelapse"
+
+
+def _lower_priority() -> None:
+    """Run in the child before exec to lower its CPU priority."""
+    os.nice(ENCODER_NICE_INCREMENT)
+
+
+class TimelapseSegment:
+    """One FFmpeg process appending frames to a time-lapse file."""
+
+    def __init__(self, path: str, width: int, height: int, fps: int, crf: int):
+        """Start the encoder.
+
+        Frames go to a '.part' file until the segment is closed. The MP4 is
+        fragmented, so a crash leaves a playable file.
+
+        Args:
+            path: Final output path.
+            width: Frame width.
+            height: Frame height.
+            fps: Playback frame rate.
+            crf: x264 constant rate factor.
+        """
+        self.path = path
+        self.part_path = f"{path}.part"
+        self.size = (width, height)
+        self.day = date.today()
+        self.frames = 0
+        command = (
+            ffmpeg
+            .input('pipe:', format='rawvideo', pix_fmt='bgr24', s=f'{width}x{height}', framerate=fps)
+            .output(
+                self.part_path, format='mp4', vcodec='libx264', pix_fmt='yuv420p', preset='veryfast',
+                crf=crf, threads=1, movflags='frag_keyframe+empty_moov',
+            )
+            .global_args('-loglevel', 'error', '-y')
+            .compile()
+        )
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            preexec_fn=_lower_priority if os.name == 'posix' else None,
+        )
+
+    def write(self, frame: np.ndarray) -> bool:
+        """Append a frame.
+
+        Returns:
+            False if the encoder has died.
+        """
+        try:
+            self.process.stdin.write(frame.tobytes())
+        except (OSError, ValueError) as e:
+            logger.error(f"Time-lapse encoder failed: {e}")
+            return False
+        self.frames += 1
+        return True
+
+    def close(self, timeout: float = 60.0) -> Optional[str]:
+        """Finish encoding and move the file to its final path.
+
+        Returns:
+            The final path, or None if nothing usable was written.
+        """
+        try:
+            self.process.stdin.close()
+            returncode = self.process.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.error(f"Time-lapse encoder did not finish: {e}")
+            self.process.kill()
+            self.process.wait()
+            returncode = -1
+        if returncode != 0 or not self.frames or not os.path.exists(self.part_path):
+            logger.warning(f"Discarding time-lapse segment {self.path} (exit code {returncode}, {self.frames} frames)")
+            if os.path.exists(self.part_path):
+                os.remove(self.part_path)
+            return None
+        os.replace(self.part_path, self.path)
+        return self.path
+
+
+class TimelapseRecorder:
+    """Samples frames at a fixed interval into daily time-lapse segments.
+
+    Sampling, encoding and finalising run on one worker thread. A sample
+    is skipped while the previous one is still being written, so at most
+    one frame is ever held however slow the encoder is.
+    """
+
+    def __init__(self, output_dir: str, camera: str, interval: float = 10.0, fps: int = 25,
+                 width: int = 1280, crf: int = 30):
+        """Initialize the recorder.
+
+        Args:
+            output_dir: Directory time-lapse files are written to.
+            camera: Camera name used in file names.
+            interval: Seconds between sampled frames.
+            fps: Playback frame rate of the time-lapse.
+            width: Maximum output width; frames are only downscaled.
+            crf: x264 constant rate factor.
+        """
+        self.output_dir = output_dir
+        self.camera = camera
+        self.interval = interval
+        self.fps = fps
+        self.width = width
+        self.crf = crf
+        self.segment: Optional[TimelapseSegment] = None
+        self.task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="timelapse")
+        self._pending: Optional[Future] = None
+        self._last_seq = -1
+
+    def _output_size(self, frame: np.ndarray) -> Tuple[int, int]:
+        """Even output size no wider than the configured width."""
+        height, width = frame.shape[:2]
+        if width > self.width:
+            height, width = height * self.width / width, self.width
+        return max(int(width) // 2 * 2, 2), max(int(height) // 2 * 2, 2)
+
+    def sample(self, frame: np.ndarray, now: Optional[float] = None) -> None:
+        """Append a frame, starting or rolling over the segment as needed.
+
+        Runs on the worker thread.
+        """
+        now = time.time() if now is None else now
+        size = self._output_size(frame)
+        if self.segment and (self.segment.day != date.fromtimestamp(now) or self.segment.size != size):
+            self.finalize()
+        if self.segment is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stamp = datetime.fromtimestamp(now).strftime('%Y%m%d-%H%M%S')
+            path = os.path.join(self.output_dir, f"{self.camera}-{stamp}.mp4")
+            self.segment = TimelapseSegment(path, *size, fps=self.fps, crf=self.crf)
+            self.segment.day = date.fromtimestamp(now)
+            logger.info(f"Started time-lapse segment {path}")
+        if size != frame.shape[1::-1]:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if self.segment.write(frame):
+            get_metrics().inc('timelapse_frames_total')
+        else:
+            self.finalize()
+
+    def finalize(self) -> Optional[str]:
+        """Close the current segment.
+
+        Runs on the worker thread.
+
+        Returns:
+            Path of the finished file, or None if no segment was recording.
+        """
+        segment, self.segment = self.segment, None
+        if segment is None:
+            return None
+        path = segment.close()
+        if path:
+            logger.info(f"Finished time-lapse {path} ({segment.frames} frames)")
+        return path
+
+    def latest_file(self) -> Optional[str]:
+        """Most recent finished time-lapse file."""
+        files = glob.glob(os.path.join(self.output_dir, f"{self.camera}-*.mp4"))
+        return max(files, key=os.path.getmtime) if files else None
+
+    async def finalize_now(self) -> Optional[str]:
+        """Finalise the current segment on the worker thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.finalize)
+
+    async def _run(self, latest_frame: Callable[[], Tuple[int, Optional[np.ndarray]]]) -> None:
+        """Sample the newest frame every interval and roll over at midnight."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                segment = self.segment
+                if segment and segment.day != date.today():
+                    await loop.run_in_executor(self._executor, self.finalize)
+                if self._pending is not None and not self._pending.done():
+                    get_metrics().inc('timelapse_skipped_total')
+                    continue
+                seq, frame = latest_frame()
+                if frame is None or seq == self._last_seq:
+                    continue  # Capture is not running
+                self._last_seq = seq
+                self._pending = self._executor.submit(self.sample, frame)
+            except Exception as e:
+                logger.error("Error in time-lapse sampling: %s", e, extra=HOT_PATH)
+
+    def start(self, latest_frame: Callable[[], Tuple[int, Optional[np.ndarray]]]) -> None:
+        """Start sampling.
+
+        Args:
+            latest_frame: Returns (sequence number, frame) of the newest
+                captured frame, e.g. VideoProcessor.get_latest_frame.
+        """
+        if self.task is None:
+            self.task = asyncio.create_task(self._run(latest_frame))
+
+    async def stop(self) -> None:
+        """Stop sampling and finalise the current segment."""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.finalize_now()
+
+
+def create_timelapse_recorder() -> Optional[TimelapseRecorder]:
+    """Create the time-lapse recorder if enabled in configuration."""
+    config = get_config()
+    if not config.timelapse_enabled:
+        return None
+    return TimelapseRecorder(
+        os.path.join(config.cache_dir, TIMELAPSE_DIRNAME),
+        config.camera_name,
+        interval=config.timelapse_interval,
+        fps=config.timelapse_fps,
+        width=config.timelapse_width,
+        crf=config.timelapse_crf,
+    )
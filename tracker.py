@@ -0,0 +1,173 @@
+"""Multi-frame object tracking for kdx-pi-cam.
+
+This module links motion boxes across frames into tracks with a greedy
+IoU/centroid matcher. A track only counts as a real object once it has been
+seen in min_hits frames, and its trajectory is kept until it disappears.
+"""
+
+import itertools
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]
+
+# Trajectory point: (timestamp, centre x, centre y)
+TrajectoryPoint = Tuple[float, int, int]
+
+
+def centroid(box: Box) -> Tuple[int, int]:
+    """Centre of an (x, y, w, h) box."""
+    x, y, w, h = box
+    return x + w // 2, y + h // 2
+
+
+def iou_matrix(boxes_a: Sequence[Box], boxes_b: Sequence[Box]) -> np.ndarray:
+    """Intersection over union of every pair of (x, y, w, h) boxes.
+
+    Returns:
+        Array of shape (len(boxes_a), len(boxes_b)).
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ax1, ay1, ax2, ay2 = a[:, 0:1], a[:, 1:2], a[:, 0:1] + a[:, 2:3], a[:, 1:2] + a[:, 3:4]
+    bx1, by1, bx2, by2 = b[:, 0], b[:, 1], b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+    inter_w = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    inter_h = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = inter_w * inter_h
+    union = a[:, 2:3] * a[:, 3:4] + b[:, 2] * b[:, 3] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+@dataclass
+class Track:
+    """An object followed across frames."""
+
+    id: int
+    box: Box
+    first_seen: float
+    last_seen: float
+    hits: int = 1
+    misses: int = 0
+    confirmed: bool = False
+    event_id: Optional[int] = None  # Event fired for this track, if any
+    trajectory: List[TrajectoryPoint] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        """Seconds between the first and last sighting."""
+        return self.last_seen - self.first_seen
+
+
+class CentroidTracker:
+    """Greedy IoU/centroid tracker for motion boxes."""
+
+    def __init__(self, min_hits: int = 3, max_misses: int = 5, iou_threshold: float = 0.1,
+                 max_distance: float = 100.0):
+        """Initialize the tracker.
+
+        Args:
+            min_hits: Frames a track must be seen in before it is confirmed.
+            max_misses: Consecutive frames a track may be missing before it ends.
+            iou_threshold: Minimum overlap for a box to continue a track.
+            max_distance: Maximum centroid distance in pixels for a box to
+                continue a track it does not overlap.
+        """
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.tracks: List[Track] = []
+        self.finished: List[Track] = []
+        self._ids = itertools.count(1)
+
+    def _match(self, boxes: Sequence[Box]) -> List[Tuple[int, int]]:
+        """Pair existing tracks with new boxes, best overlaps first.
+
+        Returns:
+            List of (track index, box index) pairs.
+        """
+        if not self.tracks or not boxes:
+            return []
+        ious = iou_matrix([track.box for track in self.tracks], boxes)
+        track_centres = np.array([centroid(track.box) for track in self.tracks], dtype=np.float32)
+        box_centres = np.array([centroid(box) for box in boxes], dtype=np.float32)
+        distances = np.linalg.norm(track_centres[:, None, :] - box_centres[None, :, :], axis=2)
+
+        # Overlapping pairs rank above merely close ones
+        eligible = (ious >= self.iou_threshold) | (distances <= self.max_distance)
+        cost = np.where(ious >= self.iou_threshold, -ious, distances / max(self.max_distance, 1e-6))
+        pairs = []
+        used_tracks, used_boxes = set(), set()
+        for flat in np.argsort(cost, axis=None):
+            t, b = (int(i) for i in np.unravel_index(flat, cost.shape))
+            if not eligible[t, b] or t in used_tracks or b in used_boxes:
+                continue
+            pairs.append((t, b))
+            used_tracks.add(t)
+            used_boxes.add(b)
+        return pairs
+
+    def update(self, boxes: Sequence[Box], timestamp: float) -> List[Track]:
+        """Advance the tracker by one frame.
+
+        Tracks missing for more than max_misses frames are moved to finished.
+
+        Args:
+            boxes: Motion boxes (x, y, w, h) found in the frame.
+            timestamp: Time of the frame.
+
+        Returns:
+            Tracks confirmed by this frame.
+        """
+        pairs = self._match(boxes)
+        matched_tracks = {t for t, _ in pairs}
+        matched_boxes = {b for _, b in pairs}
+
+        confirmed = []
+        for t, b in pairs:
+            track = self.tracks[t]
+            track.box = tuple(boxes[b])
+            track.hits += 1
+            track.misses = 0
+            track.last_seen = timestamp
+            track.trajectory.append((timestamp, *centroid(track.box)))
+            if not track.confirmed and track.hits >= self.min_hits:
+                track.confirmed = True
+                confirmed.append(track)
+
+        alive = []
+        for index, track in enumerate(self.tracks):
+            if index not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    if track.confirmed:
+                        self.finished.append(track)
+                    continue
+            alive.append(track)
+
+        for index, box in enumerate(boxes):
+            if index in matched_boxes:
+                continue
+            box = tuple(box)
+            track = Track(next(self._ids), box, timestamp, timestamp, trajectory=[(timestamp, *centroid(box))])
+            if self.min_hits <= 1:
+                track.confirmed = True
+                confirmed.append(track)
+            alive.append(track)
+        self.tracks = alive
+        return confirmed
+
+    def pop_finished(self) -> List[Track]:
+        """Take the confirmed tracks that ended since the last call."""
+        finished, self.finished = self.finished, []
+        return finished
+
+    def reset(self) -> None:
+        """Forget all tracks, e.g. after a stream reconnect."""
+        self.tracks = []
+        self.finished = []
@@ -1,25 +1,51 @@
 """Video processor for RTSP stream capture and clip generation.
 
 This module handles capturing frames from an RTSP stream using OpenCV,
-buffering them, and generating video clips using FFmpeg.
+buffering them, and generating video clips using FFmpeg. Opening and
+reconnecting the stream is delegated to rtsp_connection.
 """
 
 import asyncio
 import logging
 import os
 import tempfile
-from typing import List, Optional
+import time
+from typing import List, Optional, Tuple
 
 import cv2
-import ffmpeg
 import numpy as np
 import psutil
 
+from animation import encode_gif
 from cache_manager import get_cache_manager
 from config import get_config
+from encoder import (
+    encoder_key,
+    ffmpeg_output_args,
+    frame_step,
+    get_encoder_pool,
+    get_encoder_profile,
+    max_clip_bytes,
+)
+from frame_buffer import FrameBuffer, auto_budget_bytes
+from logging_utils import HOT_PATH
+from metrics import get_metrics
+from rtsp_connection import create_rtsp_connection
 
 logger = logging.getLogger(__name__)
 
+# Frame rate the capture loop throttles to
+CAPTURE_FPS = 10
+
+# Length of motion and /clip5 clips
+DEFAULT_CLIP_SECONDS = 5.0
+
+
+def _log_prewarm_failure(future: "asyncio.Future") -> None:
+    """Log an encoder prewarm that failed in the background."""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Failed to prewarm encoder: {future.exception()}")
+
 
 class VideoProcessor:
     """Handles RTSP stream capture and video processing."""
@@ -33,37 +59,82 @@ class VideoProcessor:
         """
         config = get_config()
         self.rtsp_url = rtsp_url
-        # Assuming 10 FPS, buffer for VIDEO_BUFFER_SECONDS
-        self.buffer_size = config.video_buffer_seconds * 10
+        # Assuming 10 FPS, buffer for VIDEO_BUFFER_SECONDS within the byte budget
+        budget_mb = config.video_buffer_max_mb
+        self._frames = FrameBuffer(
+            config.video_buffer_seconds * CAPTURE_FPS,
+            max_bytes=int(budget_mb * 1024 * 1024) if budget_mb > 0 else auto_budget_bytes(),
+            compression=config.video_buffer_compression,
+            raw_frames=int(config.video_buffer_raw_seconds * CAPTURE_FPS),
+            jpeg_quality=config.video_buffer_jpeg_quality,
+            dedup_threshold=config.video_buffer_dedup_threshold,
+        )
         self.max_clip_duration = config.video_max_duration
-        self.frame_buffer: List[np.ndarray] = []
-        self.cap: Optional[cv2.VideoCapture] = None
+        self.encoder_profile = get_encoder_profile(config.video_quality)
+        self.max_clip_bytes = max_clip_bytes(config.video_max_clip_mb)
+        self.animation_width = config.animation_width
+        self.animation_fps = config.animation_fps
+        self.animation_max_bytes = config.animation_max_kb * 1024
+        self.connection = create_rtsp_connection(rtsp_url)
         self.running = False
         self.task: Optional[asyncio.Task] = None
+        self._prewarm_future: Optional[asyncio.Future] = None
         self.error_callback = error_callback
         self.consecutive_failures = 0
+        self.fps = 0.0
+        self.frame_seq = 0
+        self._last_frame_time: Optional[float] = None
+        self._has_connected = False
+
+    @property
+    def frame_buffer(self) -> FrameBuffer:
+        """Buffered frames, oldest first."""
+        return self._frames
+
+    @frame_buffer.setter
+    def frame_buffer(self, frames: List[np.ndarray]) -> None:
+        """Replace the buffered frames, e.g. with frames loaded from elsewhere."""
+        self._frames.clear()
+        self._frames.extend(frames)
+
+    @property
+    def buffer_size(self) -> int:
+        """Maximum number of buffered frames."""
+        return self._frames.max_frames
+
+    @buffer_size.setter
+    def buffer_size(self, max_frames: int) -> None:
+        self._frames.max_frames = max_frames
 
     def _mask_url(self, url: str) -> str:
         """Mask credentials in RTSP URL for logging."""
         import re
         return re.sub(r'://([^:]+):([^@]+)@', r'://***:***@', url)
 
+    @property
+    def cap(self) -> Optional[cv2.VideoCapture]:
+        """The active capture, None while disconnected."""
+        return self.connection.cap
+
     async def start_capture(self) -> None:
-        """Start capturing frames from the RTSP stream."""
+        """Start capturing frames from the RTSP stream.
+
+        The stream is opened in a worker thread. If that fails, capture
+        still starts and keeps reconnecting with backoff.
+        """
         if self.running:
             return
-        self.cap = cv2.VideoCapture(self.rtsp_url)
-        if not self.cap.isOpened():
-            logger.error(f"Failed to open RTSP stream: {self._mask_url(self.rtsp_url)}. OpenCV error code: {self.cap.get(cv2.CAP_PROP_POS_FRAMES) if self.cap else 'N/A'}")
-            self.cap = None
-            return
+        if await self.connection.open():
+            self._has_connected = True
+        else:
+            logger.error(f"Failed to open RTSP stream: {self._mask_url(self.rtsp_url)}, retrying in the background")
         self.running = True
         self.task = asyncio.create_task(self._capture_loop())
 
     @property
     def is_connected(self) -> bool:
         """Check if RTSP stream is currently connected."""
-        return self.cap is not None and self.cap.isOpened()
+        return self.connection.is_opened
 
     async def stop_capture(self) -> None:
         """Stop capturing frames."""
@@ -74,35 +145,46 @@ class VideoProcessor:
                 await self.task
             except asyncio.CancelledError:
                 pass
-        if self.cap:
-            self.cap.release()
+        self.connection.release()
+        self._frames.shutdown()
 
     async def _capture_loop(self) -> None:
         """Main capture loop."""
+        metrics = get_metrics()
         while self.running:
             try:
-                if not self.cap or not self.cap.isOpened():
-                    self.cap = cv2.VideoCapture(self.rtsp_url)
-                    if not self.cap.isOpened():
-                        logger.error(f"Failed to open RTSP stream: {self._mask_url(self.rtsp_url)}. OpenCV error code: {self.cap.get(cv2.CAP_PROP_POS_FRAMES) if self.cap else 'N/A'}")
+                if not self.connection.is_opened:
+                    # Waits for the backoff delay, or swaps in a standby capture
+                    if not await self.connection.reconnect():
+                        # Hot-path messages use %-style and HOT_PATH so repeats are rate limited
+                        logger.error(
+                            "Failed to open RTSP stream: %s (attempt %d)",
+                            self._mask_url(self.rtsp_url), self.connection.failures, extra=HOT_PATH,
+                        )
                         self.consecutive_failures += 1
                         if self.consecutive_failures >= 3 and self.error_callback:
                             await self.error_callback("Warning: Unable to connect to RTSP stream. Monitoring may not work properly.")
                             self.consecutive_failures = 0  # Reset to avoid spam
-                        await asyncio.sleep(5)  # Retry after 5 seconds
                         continue
-                    else:
-                        logger.info(f"Successfully opened RTSP stream: {self._mask_url(self.rtsp_url)}")
-                else:
-                    self.consecutive_failures = 0  # Reset on success
+                    logger.info(f"Successfully opened RTSP stream: {self._mask_url(self.rtsp_url)}")
+                    if self._has_connected:
+                        metrics.inc('reconnects_total')
+                self.consecutive_failures = 0  # Reset on success
+                self._has_connected = True
 
-                ret, frame = await asyncio.get_event_loop().run_in_executor(None, self.cap.read)
+                start = time.perf_counter()
+                ret, frame = await self.connection.read()
+                metrics.observe('frame_capture', time.perf_counter() - start)
                 if ret:
-                    self.frame_buffer.append(frame)
-                    if len(self.frame_buffer) > self.buffer_size:
-                        self.frame_buffer.pop(0)
+                    if not self.frame_buffer:
+                        self._prewarm_encoder(frame)
+                    self.feed_frame(frame)
                 else:
-                    logger.warning(f"Failed to read frame from RTSP stream: {self._mask_url(self.rtsp_url)}. Frame buffer size: {len(self.frame_buffer)}")
+                    metrics.inc('frames_dropped_total')
+                    logger.warning(
+                        "Failed to read frame from RTSP stream: %s. Frame buffer size: %d",
+                        self._mask_url(self.rtsp_url), len(self.frame_buffer), extra=HOT_PATH,
+                    )
                     await asyncio.sleep(1)
 
                 # Throttle to ~10 FPS
@@ -111,13 +193,50 @@ class VideoProcessor:
                 # Check CPU usage
                 cpu_percent = psutil.cpu_percent()
                 if cpu_percent > 80:
-                    logger.warning(f"High CPU usage: {cpu_percent}%")
+                    logger.warning("High CPU usage: %s%%", cpu_percent, extra=HOT_PATH)
                     await asyncio.sleep(0.5)  # Slow down
 
             except Exception as e:
-                logger.error(f"Error in capture loop: {e}. RTSP URL: {self._mask_url(self.rtsp_url)}")
+                logger.error(
+                    "Error in capture loop: %s. RTSP URL: %s", e, self._mask_url(self.rtsp_url), extra=HOT_PATH
+                )
                 await asyncio.sleep(5)
 
+    def feed_frame(self, frame: np.ndarray, now: Optional[float] = None) -> None:
+        """Append a captured frame to the buffer and update capture metrics.
+
+        The capture loop feeds every frame read from the stream; offline
+        replay feeds decoded recording frames the same way.
+
+        Args:
+            frame: The captured frame.
+            now: Capture time in seconds used for the frame rate, defaults to
+                the monotonic clock; replay passes the video timestamp.
+        """
+        duplicate = self._frames.append(frame)
+        self.frame_seq += 1
+
+        now = time.monotonic() if now is None else now
+        if self._last_frame_time is not None:
+            interval = now - self._last_frame_time
+            if interval > 0:
+                # Exponential moving average to smooth jitter between reads
+                self.fps = 0.9 * self.fps + 0.1 / interval if self.fps else 1.0 / interval
+        self._last_frame_time = now
+
+        metrics = get_metrics()
+        metrics.inc('frames_captured_total')
+        if duplicate:
+            metrics.inc('frames_deduplicated_total')
+        metrics.set_gauge('capture_fps', self.fps)
+        metrics.set_gauge('buffer_frames', len(self._frames))
+        metrics.set_gauge('buffer_bytes', self.buffer_bytes)
+
+    @property
+    def buffer_bytes(self) -> int:
+        """Memory held by the frame buffer in bytes."""
+        return self._frames.nbytes
+
     def get_recent_frames(self, count: int) -> List[np.ndarray]:
         """Get the most recent frames from the buffer.
 
@@ -127,11 +246,60 @@ class VideoProcessor:
         Returns:
             List of frames.
         """
-        return self.frame_buffer[-count:] if len(self.frame_buffer) >= count else self.frame_buffer.copy()
+        return self._frames.recent(count)
+
+    def get_frames_since(self, seq: int) -> Tuple[int, List[np.ndarray]]:
+        """Get the frames captured after a sequence number.
 
-    async def generate_clip(self, duration: float = 5.0) -> Optional[str]:
+        Frames that already left the buffer are skipped.
+
+        Args:
+            seq: Sequence number returned by a previous call, 0 for all frames.
+
+        Returns:
+            Tuple of (sequence number of the newest frame, new frames in order).
+        """
+        count = min(self.frame_seq - seq, len(self._frames))
+        if count <= 0:
+            return self.frame_seq, []
+        return self.frame_seq, self._frames.recent(count)
+
+    def _clip_job(self, width: int, height: int) -> Tuple[int, dict]:
+        """Compute the encoder frame step and output arguments for a clip.
+
+        The bitrate cap is sized for the longest allowed clip, so it keeps
+        every clip under the byte budget and the arguments do not depend on
+        the clip length: warm encoders match any /video duration and a
+        partly filled buffer.
+
+        Args:
+            width: Frame width.
+            height: Frame height.
+
+        Returns:
+            Tuple of (frame step, ffmpeg output arguments).
+        """
+        step = frame_step(CAPTURE_FPS, self.encoder_profile)
+        output_args = ffmpeg_output_args(
+            self.encoder_profile, width, height, self.max_clip_duration, self.max_clip_bytes
+        )
+        return step, output_args
+
+    def _prewarm_encoder(self, frame: np.ndarray) -> None:
+        """Start warm encoder workers for clips of this stream in the background."""
+        height, width = frame.shape[:2]
+        _, output_args = self._clip_job(width, height)
+        key = encoder_key(width, height, self.encoder_profile.fps, output_args)
+        self._prewarm_future = asyncio.get_event_loop().run_in_executor(None, get_encoder_pool().prewarm, key)
+        self._prewarm_future.add_done_callback(_log_prewarm_failure)
+
+    async def generate_clip(self, duration: float = DEFAULT_CLIP_SECONDS) -> Optional[str]:
         """Generate a video clip from recent frames.
 
+        The clip is encoded by a warm worker from the encoder pool with the
+        VIDEO_QUALITY profile, and its bitrate is capped to fit
+        VIDEO_MAX_CLIP_MB and Telegram's upload limit.
+
         Args:
             duration: Clip duration in seconds.
 
@@ -140,28 +308,32 @@ class VideoProcessor:
         """
         # Cap duration to max_clip_duration
         duration = min(duration, self.max_clip_duration)
-        frames = self.get_recent_frames(int(duration * 10))  # Assuming 10 FPS
+        # Compressed frames are decoded off the event loop
+        frames = await asyncio.get_event_loop().run_in_executor(
+            None, self.get_recent_frames, int(duration * CAPTURE_FPS)
+        )
         if not frames:
             return None
 
+        height, width = frames[0].shape[:2]
+        step, output_args = self._clip_job(width, height)
+        # Decimate in Python so dropped frames are never piped to FFmpeg
+        frames = frames[::step]
+
         cache_manager = get_cache_manager()
         with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False, dir=cache_manager.cache_dir) as tmp_file:
             output_path = tmp_file.name
 
         try:
-            # Use FFmpeg to create clip from frames
-            process = (
-                ffmpeg
-                .input('pipe:', format='rawvideo', pix_fmt='bgr24', s=f'{frames[0].shape[1]}x{frames[0].shape[0]}')
-                .output(output_path, vcodec='libx264', pix_fmt='yuv420p', r=10)
-                .run_async(pipe_stdin=True)
-            )
-
-            for frame in frames:
-                process.stdin.write(frame.tobytes())
-            process.stdin.close()
-            process.wait()
+            with get_metrics().timer('clip_encode'):
+                data = await asyncio.get_event_loop().run_in_executor(
+                    None, get_encoder_pool().encode, frames, self.encoder_profile.fps, output_args
+                )
+            with open(output_path, 'wb') as f:
+                f.write(data)
 
+            if len(data) > self.max_clip_bytes:
+                logger.warning(f"Clip is {len(data)} bytes, over the {self.max_clip_bytes} byte budget")
             return output_path
         except Exception as e:
             logger.error(f"Failed to generate clip: {e}")
@@ -169,12 +341,54 @@ class VideoProcessor:
                 os.remove(output_path)
             return None
 
+    async def generate_animation(self, duration: float = DEFAULT_CLIP_SECONDS) -> Optional[str]:
+        """Generate a small GIF preview from recent frames.
+
+        Frames are decimated to ANIMATION_FPS and downscaled to fit
+        ANIMATION_MAX_KB in a worker thread; no FFmpeg process is involved.
+
+        Args:
+            duration: Preview duration in seconds.
+
+        Returns:
+            Path to the generated GIF file, or None if failed.
+        """
+        duration = min(duration, self.max_clip_duration)
+        loop = asyncio.get_event_loop()
+        frames = await loop.run_in_executor(None, self.get_recent_frames, int(duration * CAPTURE_FPS))
+        if not frames:
+            return None
+
+        try:
+            with get_metrics().timer('animation_encode'):
+                data = await loop.run_in_executor(
+                    None, encode_gif, frames, CAPTURE_FPS, self.animation_fps, self.animation_width,
+                    self.animation_max_bytes,
+                )
+            cache_manager = get_cache_manager()
+            with tempfile.NamedTemporaryFile(suffix='.gif', delete=False, dir=cache_manager.cache_dir) as tmp_file:
+                tmp_file.write(data)
+                return tmp_file.name
+        except Exception as e:
+            logger.error(f"Failed to generate animation: {e}")
+            return None
+
+    def get_latest_frame(self) -> Tuple[int, Optional[np.ndarray]]:
+        """Get the newest buffered frame with its sequence number.
+
+        The sequence number increases by one for every captured frame, so
+        consumers can cache work done on a frame.
+
+        Returns:
+            Tuple of (sequence number, frame), frame is None if the buffer is empty.
+        """
+        return self.frame_seq, self._frames.latest()
+
     async def capture_photo(self) -> Optional[np.ndarray]:
         """Capture a single photo frame.
 
         Returns:
             The captured frame, or None if failed.
         """
-        if self.frame_buffer:
-            return self.frame_buffer[-1].copy()
-        return None
\ No newline at end of file
+        frame = self._frames.latest()
+        return frame.copy() if frame is not None else None
\ No newline at end of file